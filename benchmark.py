@@ -0,0 +1,423 @@
+"""
+Benchmarks of the hot paths of the application.
+
+Synthetic bookmark profiles of the requested sizes are generated in a
+temporary directory and the following operations are timed on each:
+
+- ``load_db``: ``bookmark_manager.load_bookmarks`` without a snapshot
+- ``load_snapshot``: ``bookmark_manager.load_bookmarks`` from the snapshot
+- ``search``: ``search_bookmarks`` for a fixed set of queries
+- ``update``, ``remove``: ``update_bookmark`` and ``remove_bookmark`` with the database attached
+- ``cli_search``: ``main.py --search`` in a new process, from the snapshot
+- ``setup_bookmarks``, ``filter_bookmarks``, ``refresh_category``: the main
+  window on Qt's offscreen platform, up to ``--window-max`` bookmarks
+
+``--store compact`` runs everything on ``CompactBookmarkStore`` instead of
+``BookmarkStore``.
+
+Every operation is run ``--repeat`` times and the fastest run is kept. Peak
+memory is measured in one more run under ``tracemalloc``, so it only covers
+Python allocations; the peak resident size of the process is recorded per
+profile as well where the platform reports it.
+
+Results are written as JSON. When a baseline file exists, every result is
+compared with it and the process exits with status 1 if anything got slower
+or bigger by more than ``--threshold`` (timing differences under
+``MIN_REGRESSION_SECONDS`` are ignored as noise). The process also exits with
+status 1 if a command-line query on a profile of up to ``CLI_BUDGET_MAX_SIZE``
+bookmarks takes more than ``--cli-budget-ms`` on top of the bare interpreter
+startup.
+
+Usage:
+    python benchmark.py --sizes 1000,10000 --save-baseline
+    python benchmark.py --sizes 1000,10000
+"""
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import sity_list
+from sity_list import Bookmark, BookmarkStore, remove_bookmark, search_bookmarks, update_bookmark
+from bookmark_manager import DATABASE_NAME, SNAPSHOT_NAME, close_bookmarks, load_bookmarks
+from bookmark_storage import BookmarkDatabase
+from compact_store import CompactBookmarkStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_WINDOW_MAX = 100000
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+# Timing differences below this are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.002
+RESULTS_PATH = Path("benchmark_results.json")
+BASELINE_PATH = Path("benchmark_baseline.json")
+CATEGORY_SIZE = 100
+MUTATIONS = 100
+# Startup budget of command-line queries, for profiles up to CLI_BUDGET_MAX_SIZE
+DEFAULT_CLI_BUDGET_MS = 50
+CLI_BUDGET_MAX_SIZE = 1000
+MAIN_PATH = Path(__file__).resolve().with_name("main.py")
+STORES = {"indexed": BookmarkStore, "compact": CompactBookmarkStore}
+
+_SYLLABLES = ["ka", "ro", "mi", "te", "zu", "la", "no", "vi", "sha", "pe", "do", "ri",
+              "go", "be", "xo", "fa", "ny", "qu", "st", "ar", "en", "or", "ul", "im"]
+
+def generate_profile(size: int, seed: int = 1) -> Dict[str, List[Bookmark]]:
+    """
+    Generate ``size`` bookmarks with unique names and URLs.
+
+    Categories hold ``CATEGORY_SIZE`` bookmarks each; names are made of
+    pseudo-words so substring and fuzzy searches behave realistically.
+    """
+    rng = random.Random(seed)
+    profile: Dict[str, List[Bookmark]] = {}
+    for i in range(size):
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        category = f"Категория {i // CATEGORY_SIZE}"
+        profile.setdefault(category, []).append(
+            Bookmark(name=f"{word.capitalize()} {i}", url=f"https://{word}{i}.example.com/"))
+    return profile
+
+def sample_queries(profile: Dict[str, List[Bookmark]], seed: int = 2) -> List[str]:
+    """Return search queries: short and long prefixes, inner substrings and a miss."""
+    rng = random.Random(seed)
+    names = [bookmark.name for bookmarks in profile.values() for bookmark in bookmarks]
+    picks = [rng.choice(names) for _ in range(6)]
+    return ([name[:2] for name in picks[:2]] + [name[:5] for name in picks[2:4]]
+            + [name.split()[0][1:4] for name in picks[4:]] + ["zzqx"])
+
+def measure(run: Callable[[], Any], repeat: int, ops: int = 1, memory: bool = True,
+            setup: Optional[Callable[[], None]] = None,
+            teardown: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Time ``run`` and keep the fastest of ``repeat`` runs.
+
+    Args:
+        run: Operation to measure
+        repeat: Number of timed runs
+        ops: Number of operations one run performs
+        memory: Also measure the peak of Python allocations in an extra run
+        setup: Called before every run, outside the measurement
+        teardown: Called after every run, outside the measurement
+
+    Returns:
+        ``seconds`` of the fastest run, ``ops`` and, with ``memory``, ``peak_kb``
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+        if teardown is not None:
+            teardown()
+    result = {"seconds": best, "ops": ops}
+    if memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+            if teardown is not None:
+                teardown()
+    return result
+
+def peak_rss_kb() -> Optional[int]:
+    """Return the peak resident size of the process in KB, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def bench_store(size: int, directory: Path, repeat: int, memory: bool,
+                store_class: type = BookmarkStore) -> Dict[str, Dict[str, Any]]:
+    """Benchmark loading, searching and mutating a profile of ``size`` bookmarks."""
+    results: Dict[str, Dict[str, Any]] = {}
+    profile = generate_profile(size)
+    db_path = directory / str(size) / DATABASE_NAME
+    db_path.parent.mkdir()
+    db = BookmarkDatabase(db_path)
+    db.migrate(profile)
+    db.close()
+    snapshot_path = db_path.with_name(SNAPSHOT_NAME)
+    stores: List[BookmarkStore] = []
+
+    def load():
+        stores.append(load_bookmarks(store_class({}), db_path))
+
+    def unload():
+        close_bookmarks(stores.pop())
+
+    results["load_db"] = measure(load, repeat, memory=memory,
+                                 setup=lambda: snapshot_path.unlink() if snapshot_path.exists() else None,
+                                 teardown=unload)
+    if not snapshot_path.exists():
+        load()
+        unload()
+    results["load_snapshot"] = measure(load, repeat, memory=memory, teardown=unload)
+
+    store = load_bookmarks(store_class({}), db_path)
+    sity_list.bookmarks = store
+    queries = sample_queries(profile)
+    results["search"] = measure(lambda: [search_bookmarks(query) for query in queries],
+                                repeat, ops=len(queries), memory=memory)
+
+    rng = random.Random(3)
+    targets = [(category, bookmark) for category in rng.sample(list(profile), min(len(profile), MUTATIONS))
+               for bookmark in profile[category][:1]]
+    version = iter(range(1 << 30))
+
+    def update():
+        suffix = f"?v={next(version)}"
+        for category, bookmark in targets:
+            update_bookmark(category, bookmark.name, new_url=bookmark.url + suffix)
+
+    results["update"] = measure(update, repeat, ops=len(targets), memory=memory)
+
+    remaining: Iterator[Tuple[str, Bookmark]] = iter(
+        [(category, bookmark) for category, bookmarks in profile.items() for bookmark in bookmarks[1:]])
+
+    def remove():
+        for _ in range(len(targets)):
+            category, bookmark = next(remaining)
+            remove_bookmark(category, bookmark.name)
+
+    results["remove"] = measure(remove, repeat, ops=len(targets), memory=memory)
+    close_bookmarks(store)
+
+    command = [sys.executable, str(MAIN_PATH), "--search", queries[0], "--data-dir", str(db_path.parent)]
+    results["cli_search"] = measure(lambda: subprocess.run(command, stdout=subprocess.DEVNULL, check=False),
+                                    repeat, memory=False)
+    return results
+
+def interpreter_seconds(repeat: int) -> float:
+    """Return the startup time of a bare interpreter process."""
+    command = [sys.executable, "-c", "pass"]
+    return measure(lambda: subprocess.run(command, check=True), repeat, memory=False)["seconds"]
+
+def bench_window(size: int, config: Dict[str, Any], repeat: int, memory: bool,
+                 store_class: type = BookmarkStore) -> Dict[str, Dict[str, Any]]:
+    """Benchmark the main window on a profile of ``size`` bookmarks."""
+    from PyQt5.QtCore import QEvent
+    from PyQt5.QtWidgets import QApplication
+    from bookmark_main_window import BookmarkMainWindow
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results: Dict[str, Dict[str, Any]] = {}
+    profile = generate_profile(size)
+    queries = sample_queries(profile)
+    categories = list(profile)[:10]
+    windows: List[Any] = []
+
+    def setup_bookmarks():
+        store = store_class(profile)
+        sity_list.bookmarks = store
+        windows.append(BookmarkMainWindow(store, config))
+        app.processEvents()
+
+    def close_window():
+        window = windows.pop()
+        window.stop_favicons()
+        window.close()
+        window.deleteLater()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    # Time only setup_bookmarks inside the window constructor
+    original = BookmarkMainWindow.setup_bookmarks
+    timings: List[float] = []
+
+    def timed_setup(self):
+        start = time.perf_counter()
+        original(self)
+        timings.append(time.perf_counter() - start)
+
+    BookmarkMainWindow.setup_bookmarks = timed_setup
+    try:
+        setup = measure(setup_bookmarks, repeat, memory=memory, teardown=close_window)
+    finally:
+        BookmarkMainWindow.setup_bookmarks = original
+    setup["seconds"] = min(timings[:repeat])
+    results["setup_bookmarks"] = setup
+
+    setup_bookmarks()
+    window = windows[0]
+
+    def filter_all():
+        for query in queries:
+            window.filter_bookmarks(query)
+        window.filter_bookmarks("")
+
+    results["filter_bookmarks"] = measure(filter_all, repeat, ops=len(queries) + 1, memory=memory)
+    results["refresh_category"] = measure(
+        lambda: [window.refresh_category(category) for category in categories],
+        repeat, ops=len(categories), memory=memory)
+    close_window()
+    return results
+
+def run_benchmarks(sizes: List[int], window_max: int, config: Dict[str, Any],
+                   repeat: int, memory: bool, store: str = "indexed") -> Dict[str, Any]:
+    """Run all benchmarks and return the report."""
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": repeat,
+            "render_mode": config.get("render_mode"),
+            "search_mode": config.get("search_mode"),
+            "store": store,
+        },
+        "results": {},
+        "peak_rss_kb": {},
+    }
+    report["meta"]["interpreter_seconds"] = interpreter_seconds(max(repeat, 5))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            results = bench_store(size, Path(directory), repeat, memory, STORES[store])
+            if size <= window_max:
+                results.update(bench_window(size, config, repeat, memory, STORES[store]))
+            for name, result in results.items():
+                report["results"][f"{name}/{size}"] = result
+                print(format_result(f"{name}/{size}", result), flush=True)
+            report["peak_rss_kb"][str(size)] = peak_rss_kb()
+    return report
+
+def format_result(key: str, result: Dict[str, Any]) -> str:
+    per_op = result["seconds"] / result["ops"] * 1000
+    memory = f"{result['peak_kb']:>10} KB" if "peak_kb" in result else ""
+    return f"{key:<28} {result['seconds']:>10.4f} s {per_op:>10.3f} ms/op {memory}"
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare a report with a baseline.
+
+    Returns:
+        Descriptions of the results that are worse than the baseline by more than ``threshold``
+    """
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, result in report["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if old is None:
+            continue
+        for field, unit in (("seconds", "s"), ("peak_kb", "KB")):
+            if field not in result or not old.get(field):
+                continue
+            change = result[field] / old[field] - 1
+            marker = ""
+            if change > threshold and (field != "seconds"
+                                       or result[field] - old[field] > MIN_REGRESSION_SECONDS):
+                marker = "  <-- regression"
+                regressions.append(f"{key} {field}: {old[field]:.4g} -> {result[field]:.4g} ({change:+.0%})")
+            label = key if field == "seconds" else f"{key} memory"
+            print(f"{label:<28} {old[field]:>10.4g} {result[field]:>10.4g} {change:>+8.0%}{marker}")
+    return regressions
+
+def check_cli_budget(report: Dict[str, Any], budget: float) -> List[str]:
+    """
+    Check command-line query startup against a budget.
+
+    Returns:
+        Descriptions of the ``cli_search`` results on profiles of up to
+        ``CLI_BUDGET_MAX_SIZE`` bookmarks that exceed ``budget`` seconds above
+        the bare interpreter startup
+    """
+    interpreter = report["meta"]["interpreter_seconds"]
+    violations = []
+    for key, result in report["results"].items():
+        name, size = key.split("/")
+        if name == "cli_search" and int(size) <= CLI_BUDGET_MAX_SIZE:
+            overhead = result["seconds"] - interpreter
+            if overhead > budget:
+                violations.append(f"{key}: {overhead * 1000:.1f} ms over the interpreter startup "
+                                  f"(budget {budget * 1000:.0f} ms)")
+    return violations
+
+def load_window_config(render_mode: Optional[str], search_mode: Optional[str],
+                       start_collapsed: bool) -> Dict[str, Any]:
+    """Read config.json and adapt it for unattended benchmarking."""
+    with open("config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config.update(minimize_to_tray=False, fetch_favicons=False, start_collapsed=start_collapsed)
+    if render_mode:
+        config["render_mode"] = render_mode
+    if search_mode:
+        config["search_mode"] = search_mode
+    return config
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark loading, searching, mutating and rendering bookmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated profile sizes (default: %(default)s)")
+    parser.add_argument("--window-max", type=int, default=DEFAULT_WINDOW_MAX,
+                        help="Largest profile the window benchmarks run on (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark")
+    parser.add_argument("--render-mode", choices=["widgets", "model"], help="Override render_mode")
+    parser.add_argument("--search-mode", choices=["substring", "ranked"], help="Override search_mode")
+    parser.add_argument("--store", choices=list(STORES), default="indexed", help="Bookmark store to benchmark")
+    parser.add_argument("--start-collapsed", action="store_true", help="Start with collapsed categories")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH, help="Where to write the results")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    parser.add_argument("--cli-budget-ms", type=float, default=DEFAULT_CLI_BUDGET_MS,
+                        help="Allowed command-line query startup on top of the interpreter (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    config = load_window_config(args.render_mode, args.search_mode, args.start_collapsed)
+    report = run_benchmarks(sizes, args.window_max, config, args.repeat, not args.no_memory,
+                            args.store)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    over_budget = check_cli_budget(report, args.cli_budget_ms / 1000)
+    if over_budget:
+        print("\nOver budget:\n  " + "\n  ".join(over_budget))
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if over_budget else 0
+    if not args.baseline.exists():
+        return 1 if over_budget else 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions")
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
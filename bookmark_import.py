@@ -0,0 +1,460 @@
+"""
+Import of bookmarks exported from web browsers.
+
+Supported sources:
+    - Netscape bookmark files (``bookmarks.html``), exported by every browser
+    - Chrome/Chromium/Edge ``Bookmarks`` JSON profile files
+    - Firefox ``places.sqlite`` profile databases
+
+All readers are incremental: HTML and JSON are read in fixed-size chunks and
+Firefox rows are fetched in pages, so memory use does not grow with the size
+of the export. Bookmarks without a valid URL are skipped, and duplicates are
+detected by a short digest of the normalized URL, covering both the existing
+bookmarks and the entries seen earlier in the same import.
+
+Example:
+    >>> stats = import_file('bookmarks.html', bookmarks)
+    >>> stats.added, stats.duplicates
+    (1250, 37)
+"""
+
+import codecs
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit, urlunsplit
+from sity_list import Bookmark, BookmarkStore, validate_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = "Импорт"
+CHUNK_SIZE = 1 << 16
+FETCH_SIZE = 1000
+BATCH_SIZE = 5000
+MAX_NAME_LENGTH = 200
+
+# Titles of the Firefox root folders as stored in places.sqlite
+FIREFOX_ROOTS = {
+    'menu': "Меню закладок",
+    'toolbar': "Панель закладок",
+    'unfiled': "Другие закладки",
+    'mobile': "Мобильные закладки",
+}
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+ProgressCallback = Callable[[int, int], None]
+RawEntry = Tuple[str, str, str]
+
+class ImportStats:
+    """Counters of one import run."""
+
+    def __init__(self):
+        self.added = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    def __repr__(self) -> str:
+        return f"ImportStats(added={self.added}, duplicates={self.duplicates}, invalid={self.invalid})"
+
+def normalize_url(url: str) -> str:
+    """
+    Return a canonical form of a URL for duplicate detection.
+
+    Scheme and host are lowercased, default ports, fragments and trailing
+    slashes are dropped.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    port = parts.port
+    if port is not None and (scheme, port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{port}"
+    if parts.username or parts.password:
+        host = f"{parts.username or ''}:{parts.password or ''}@{host}"
+    path = parts.path.rstrip('/')
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+class UrlDeduplicator:
+    """Set of normalized URLs, stored as 8-byte digests to keep memory small."""
+
+    def __init__(self, urls: Iterable[str] = ()):
+        self._seen: Set[bytes] = set()
+        for url in urls:
+            self.add(url)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, url: str) -> bool:
+        """Remember a URL. Returns False if an equivalent URL was already seen."""
+        digest = hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=8).digest()
+        if digest in self._seen:
+            return False
+        self._seen.add(digest)
+        return True
+
+def detect_format(path: Union[str, Path]) -> str:
+    """
+    Guess the format of an export file from its content.
+
+    Returns:
+        ``'firefox'``, ``'chrome'`` or ``'html'``
+    """
+    with open(path, 'rb') as f:
+        head = f.read(512)
+    if head.startswith(b'SQLite format 3\0'):
+        return 'firefox'
+    if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'{'):
+        return 'chrome'
+    return 'html'
+
+def _read_text_chunks(path: Union[str, Path], progress: Optional[ProgressCallback]) -> Iterator[str]:
+    """Yield decoded UTF-8 chunks of a file, reporting the bytes read."""
+    total = os.path.getsize(path)
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                yield text
+            if progress is not None:
+                progress(f.tell(), total)
+            if not data:
+                return
+
+class _NetscapeParser(HTMLParser):
+    """Collects (folder, title, url) entries from Netscape bookmark HTML."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.entries: List[RawEntry] = []
+        self._folders: List[Optional[str]] = []
+        self._pending_folder: Optional[str] = None
+        self._tag: Optional[str] = None
+        self._text: List[str] = []
+        self._href = ''
+
+    def _category(self) -> str:
+        for folder in reversed(self._folders):
+            if folder:
+                return folder
+        return DEFAULT_CATEGORY
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'dl':
+            self._folders.append(self._pending_folder)
+            self._pending_folder = None
+        elif tag in ('h3', 'a'):
+            self._tag = tag
+            self._text = []
+            if tag == 'a':
+                self._href = dict(attrs).get('href') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'dl':
+            if self._folders:
+                self._folders.pop()
+        elif tag == self._tag:
+            title = ''.join(self._text).strip()
+            if tag == 'h3':
+                self._pending_folder = title
+            else:
+                self.entries.append((self._category(), title, self._href))
+            self._tag = None
+
+    def handle_data(self, data):
+        if self._tag is not None:
+            self._text.append(data)
+
+def iter_netscape_html(path: Union[str, Path],
+                       progress: Optional[ProgressCallback] = None) -> Iterator[RawEntry]:
+    """Yield (folder, title, url) entries of a Netscape bookmark file."""
+    parser = _NetscapeParser()
+    for text in _read_text_chunks(path, progress):
+        parser.feed(text)
+        yield from parser.entries
+        parser.entries = []
+    parser.close()
+    yield from parser.entries
+
+class _JsonStream:
+    """
+    Pull reader over a JSON file that keeps only a window of the text in memory.
+
+    Structural characters are consumed one by one; complete values are decoded
+    by ``json`` in C, refilling the window when a value crosses its end.
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._mark: Optional[int] = None
+        self._eof = False
+
+    def _fill(self, size: int = 0) -> bool:
+        """Append at least one chunk, and more until ``size`` characters are buffered."""
+        if self._eof:
+            return False
+        keep = self._pos if self._mark is None else min(self._pos, self._mark)
+        parts = [self._buffer[keep:]]
+        length = len(parts[0])
+        while True:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                break
+            parts.append(chunk)
+            length += len(chunk)
+            if length >= size:
+                break
+        self._buffer = ''.join(parts)
+        self._pos -= keep
+        if self._mark is not None:
+            self._mark -= keep
+        return len(parts) > 1
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at the end)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Invalid bookmarks JSON: expected {chars!r}, got {char!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode and consume the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Grow geometrically so that a large value is not re-decoded per chunk
+                if self._fill(2 * (len(self._buffer) - self._pos)):
+                    continue
+                raise ValueError("Invalid bookmarks JSON: truncated or malformed value")
+            if end < len(self._buffer) or self._eof:
+                self._pos = end
+                return value
+            # A number may continue in the next chunk
+            if not self._fill():
+                self._pos = end
+                return value
+
+    def next_key(self) -> Optional[str]:
+        """
+        Return the first key of the object starting at the current position
+        without consuming anything, or None if it is empty or not an object.
+        """
+        if self.peek() != '{':
+            return None
+        self._mark = self._pos
+        self._pos += 1
+        try:
+            if self.peek() != '"':
+                return None
+            return self.value()
+        finally:
+            self._pos = self._mark
+            self._mark = None
+
+def _walk_chrome_node(node, folder: str) -> Iterator[RawEntry]:
+    """Yield the entries of an already decoded Chrome bookmark node."""
+    if not isinstance(node, dict):
+        return
+    if node.get('type') == 'url':
+        yield folder, node.get('name', ''), node.get('url', '')
+    children = node.get('children')
+    if isinstance(children, list):
+        name = node.get('name') or folder
+        for child in children:
+            yield from _walk_chrome_node(child, name)
+
+def _chrome_node(stream: _JsonStream, folder: str) -> Iterator[RawEntry]:
+    """
+    Read one Chrome bookmark node from the stream.
+
+    Chrome writes object keys in sorted order, so folders start with their
+    ``children`` key and their ``name`` only follows the children. Folders are
+    therefore walked structurally, buffering only their direct bookmarks until
+    the name is known; everything else is decoded as a whole.
+    """
+    if stream.next_key() != 'children':
+        yield from _walk_chrome_node(stream.value(), folder)
+        return
+    stream.expect('{')
+    pending: List[Tuple[str, str]] = []
+    name = ''
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'children' and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    if stream.next_key() == 'children':
+                        yield from _chrome_node(stream, folder)
+                    else:
+                        child = stream.value()
+                        if isinstance(child, dict) and child.get('type') == 'url':
+                            pending.append((child.get('name', ''), child.get('url', '')))
+                        else:
+                            yield from _walk_chrome_node(child, folder)
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            value = stream.value()
+            if key == 'name' and isinstance(value, str):
+                name = value
+        if stream.expect(',}') == '}':
+            break
+    category = name or folder
+    for title, url in pending:
+        yield category, title, url
+
+def iter_chrome_json(path: Union[str, Path],
+                     progress: Optional[ProgressCallback] = None) -> Iterator[RawEntry]:
+    """Yield (folder, title, url) entries of a Chrome ``Bookmarks`` file."""
+    stream = _JsonStream(_read_text_chunks(path, progress))
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'roots' and stream.peek() == '{':
+            stream.expect('{')
+            if stream.peek() != '}':
+                while True:
+                    stream.value()
+                    stream.expect(':')
+                    yield from _chrome_node(stream, DEFAULT_CATEGORY)
+                    if stream.expect(',}') == '}':
+                        break
+            else:
+                stream.expect('}')
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            break
+
+def iter_firefox_places(path: Union[str, Path],
+                        progress: Optional[ProgressCallback] = None) -> Iterator[RawEntry]:
+    """Yield (folder, title, url) entries of a Firefox ``places.sqlite`` database."""
+    # immutable=1 allows reading the database while Firefox holds its lock
+    uri = Path(path).resolve().as_uri() + '?immutable=1'
+    connection = sqlite3.connect(uri, uri=True)
+    try:
+        total = connection.execute("SELECT COUNT(*) FROM moz_bookmarks WHERE type = 1").fetchone()[0]
+        cursor = connection.execute(
+            "SELECT parent.title, parent.guid, b.title, p.url FROM moz_bookmarks b "
+            "JOIN moz_places p ON p.id = b.fk "
+            "LEFT JOIN moz_bookmarks parent ON parent.id = b.parent "
+            "WHERE b.type = 1 ORDER BY b.parent, b.position")
+        done = 0
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for folder, folder_guid, title, url in rows:
+                if folder_guid and folder_guid.endswith('_____'):
+                    folder = FIREFOX_ROOTS.get(folder, folder)
+                yield folder or DEFAULT_CATEGORY, title or '', url or ''
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+    finally:
+        connection.close()
+
+READERS = {
+    'html': iter_netscape_html,
+    'chrome': iter_chrome_json,
+    'firefox': iter_firefox_places,
+}
+
+def read_bookmarks(path: Union[str, Path], known_urls: Iterable[str] = (),
+                   progress: Optional[ProgressCallback] = None,
+                   stats: Optional[ImportStats] = None) -> Iterator[Tuple[str, Bookmark]]:
+    """
+    Yield the new bookmarks of an export file.
+
+    Args:
+        path: Export file in any supported format
+        known_urls: URLs that already exist and must not be imported again
+        progress: Called with (done, total) while reading
+        stats: Counters to update
+
+    Raises:
+        OSError, ValueError, sqlite3.Error: If the file cannot be read
+    """
+    stats = stats if stats is not None else ImportStats()
+    seen = UrlDeduplicator(known_urls)
+    for folder, title, url in READERS[detect_format(path)](path, progress):
+        url = url.strip()
+        if not validate_url(url):
+            stats.invalid += 1
+            continue
+        if not seen.add(url):
+            stats.duplicates += 1
+            continue
+        name = ' '.join(title.split())[:MAX_NAME_LENGTH] or urlsplit(url).netloc
+        category = ' '.join(folder.split())[:MAX_NAME_LENGTH] or DEFAULT_CATEGORY
+        stats.added += 1
+        yield category, Bookmark(name=name, url=url)
+
+def add_imported(store: BookmarkStore, entries: Iterable[Tuple[str, Bookmark]]) -> None:
+    """
+    Add imported bookmarks to the store in one batch.
+
+    Names already used in a category get a numeric suffix, so an import never
+    replaces an existing bookmark.
+    """
+    with store.batch():
+        for category, bookmark in entries:
+            name = bookmark.name
+            number = 2
+            while store.find(category, name) is not None:
+                name = f"{bookmark.name} ({number})"
+                number += 1
+            store.add(category, bookmark._replace(name=name))
+
+def import_file(path: Union[str, Path], store: BookmarkStore, batch_size: int = BATCH_SIZE,
+                progress: Optional[ProgressCallback] = None) -> ImportStats:
+    """
+    Import an export file into the store, writing ``batch_size`` bookmarks per batch.
+
+    Returns:
+        Counters of added, duplicate and invalid entries
+    """
+    stats = ImportStats()
+    known_urls = [bookmark.url for category in store for bookmark in store[category]]
+    batch: List[Tuple[str, Bookmark]] = []
+    for entry in read_bookmarks(path, known_urls, progress, stats):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            add_imported(store, batch)
+            batch = []
+    if batch:
+        add_imported(store, batch)
+    logger.info(f"Imported {path}: {stats}")
+    return stats
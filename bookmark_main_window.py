@@ -5,39 +5,83 @@ Provides a user interface for displaying and managing bookmarks.
 
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QPushButton, QLabel, QScrollArea, QMessageBox,
-                           QMenu, QSystemTrayIcon, QLineEdit, QFrame)
-from PyQt5.QtCore import QUrl, Qt, pyqtSignal
-from PyQt5.QtGui import QDesktopServices, QIcon, QCloseEvent
+                           QMenu, QSystemTrayIcon, QLineEdit, QFrame,
+                           QFileDialog, QProgressDialog, QDialog, QGridLayout)
+from PyQt5.QtCore import Qt, QTimer, QPoint, QByteArray, pyqtSignal
+from PyQt5.QtGui import QIcon, QCloseEvent
+import io
 import logging
-from typing import Dict, List, Any, Optional
-from sity_list import Bookmark, add_bookmark, remove_bookmark
+import sqlite3
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Any, Optional, Set, Tuple
+from sity_list import (Bookmark, BookmarkStore, ChangeSet, add_bookmark, remove_bookmark,
+                       update_bookmark, validate_url)
+from search_index import SearchIndex
+from ranked_search import RankedSearch
+from frecency import FrecencyTracker
+from bookmark_view import ROW_HEIGHT, BookmarkModel, BookmarkView
+from column_layout import ColumnBalancer, column_count
+from ui_state import load_ui_state, save_ui_state
+from icon_loader import IconService
+from bookmark_import import add_imported
+from import_worker import ImportWorker
+from link_checker import LINK_MOVED, LinkCache, LinkStatus
+from link_check_worker import LinkCheckWorker
+from favicon_fetcher import FaviconCache
+from favicon_worker import FaviconWorker
+from cli import build_parser, execute, is_cli_request
+from bookmark_sync import (ContentHashes, apply_plan, load_copy, plan_sync, read_ancestor,
+                           resolve_conflicts)
+from sync_dialog import SyncConflictDialog
+from metrics import metrics
+from url_opener import DEFAULT_BATCH_INTERVAL_MS, DEFAULT_BATCH_SIZE, UrlOpener
 
 logger = logging.getLogger(__name__)
 
 class CollapsibleCategory(QWidget):
-    """Widget for a collapsible category of bookmarks."""
+    """
+    Widget for a collapsible category of bookmarks.
+
+    The bookmark widgets are built by the ``populate`` callback the first time
+    the category is expanded and can be released again with ``clear_content``.
+    With ``defer`` an expanded category only reserves ``placeholder_height``
+    until ``ensure_populated`` is called.
+    """
     
-    def __init__(self, category: str, parent=None):
+    toggled = pyqtSignal(str, bool)
+    menu_requested = pyqtSignal(QPoint, str)
+
+    def __init__(self, category: str, populate: Optional[Callable[['CollapsibleCategory'], None]] = None,
+                 collapsed: bool = False, defer: bool = False, placeholder_height: int = 0, parent=None):
         super().__init__(parent)
         self.category = category
-        self.is_collapsed = False
+        self.is_collapsed = collapsed
+        self.is_populated = False
+        self.populate = populate
         
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         
         # Header with category name and collapse button
         header = QHBoxLayout()
-        self.toggle_button = QPushButton("▼")
+        self.toggle_button = QPushButton("▶" if collapsed else "▼")
         self.toggle_button.setFixedWidth(20)
         self.toggle_button.clicked.connect(self.toggle_collapse)
         header.addWidget(self.toggle_button)
         
-        header.addWidget(QLabel(f"<b>{category}</b>"))
+        title = QLabel(f"<b>{category}</b>")
+        title.setContextMenuPolicy(Qt.CustomContextMenu)
+        title.customContextMenuRequested.connect(
+            lambda pos: self.menu_requested.emit(title.mapToGlobal(pos), self.category))
+        header.addWidget(title)
         header.addStretch()
         
         # Container for bookmarks
         self.content = QWidget()
         self.content_layout = QVBoxLayout(self.content)
+        self.content.setVisible(not collapsed)
         
         layout.addLayout(header)
         layout.addWidget(self.content)
@@ -48,25 +92,78 @@ class CollapsibleCategory(QWidget):
         line.setFrameShadow(QFrame.Sunken)
         layout.addWidget(line)
         
+        if not collapsed and not defer:
+            self.ensure_populated()
+        elif defer:
+            self.content.setMinimumHeight(placeholder_height)
+        
     def toggle_collapse(self):
         """Toggle the collapsed state of the category."""
-        self.is_collapsed = not self.is_collapsed
-        self.content.setVisible(not self.is_collapsed)
-        self.toggle_button.setText("▶" if self.is_collapsed else "▼")
+        self.set_collapsed(not self.is_collapsed)
+        self.toggled.emit(self.category, self.is_collapsed)
+
+    def set_collapsed(self, collapsed: bool):
+        """Collapse or expand the category, building its content on first expand."""
+        self.is_collapsed = collapsed
+        if not collapsed:
+            self.ensure_populated()
+        self.content.setVisible(not collapsed)
+        self.toggle_button.setText("▶" if collapsed else "▼")
+
+    def ensure_populated(self):
+        """Build the bookmark widgets if they have not been built yet."""
+        if not self.is_populated and self.populate is not None:
+            self.is_populated = True
+            self.content.setMinimumHeight(0)
+            self.populate(self)
+
+    def clear_content(self, keep_height: bool = False):
+        """
+        Delete the bookmark widgets of this category.
+
+        Args:
+            keep_height: Reserve the current content height so that the
+                surrounding layout does not jump
+        """
+        if keep_height:
+            self.content.setMinimumHeight(self.content.height())
+        while self.content_layout.count():
+            item = self.content_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        self.is_populated = False
+
+# Settings that are only read while the window is built
+RESTART_SETTINGS = ("render_mode", "search_mode", "store_mode", "single_instance", "live_reload",
+                    "release_offscreen_categories", "icon_cache_size")
+WINDOW_SIZE_SETTINGS = ("window_width", "window_height", "min_width", "min_height",
+                        "max_width", "max_height")
+
+# Horizontal space of a column besides its buttons: margins, spacing and scroll bar share
+COLUMN_PADDING = 40
+# Default vertical spacing between the buttons of a category
+ROW_SPACING = 6
+MOST_USED_TITLE = "Часто используемые"
+# Time per event loop turn spent building off-screen categories after the first paint
+FILL_SLICE_SECONDS = 0.008
 
 class BookmarkMainWindow(QMainWindow):
     """Main window class for the bookmark application."""
     
     bookmark_added = pyqtSignal(str, Bookmark)
     bookmark_removed = pyqtSignal(str, str)
+    bookmarks_changed = pyqtSignal(object)
+    config_changed = pyqtSignal(object)
 
-    def __init__(self, bookmarks: Dict[str, List[Bookmark]], config: Dict[str, Any]):
+    def __init__(self, bookmarks: Dict[str, List[Bookmark]], config: Dict[str, Any],
+                 frecency: Optional[FrecencyTracker] = None):
         """
         Initialize the main window.
 
         Args:
             bookmarks (Dict[str, List[Bookmark]]): A dictionary of bookmarks
             config (Dict[str, Any]): Application configuration
+            frecency (Optional[FrecencyTracker]): Visit statistics used to rank search results
         """
         super().__init__()
         self.setWindowTitle("Мой Портативный Браузер")
@@ -74,11 +171,69 @@ class BookmarkMainWindow(QMainWindow):
         self.bookmarks = bookmarks
         self.config = config
         self.category_widgets = {}  # Store category widgets for easy access
+        self.site_buttons: Dict[Tuple[str, str], QPushButton] = {}
+        self.frecency = frecency if frecency is not None else FrecencyTracker()
+        if self.config.get("search_mode") == "ranked":
+            self.search_index = RankedSearch()
+        else:
+            self.search_index = SearchIndex()
+        self.ranked_results: List[Tuple[str, str]] = []
+        self.visible_bookmarks: Set[Tuple[str, str]] = set()
+        self.bookmark_model: Optional[BookmarkModel] = None
+        self.bookmark_views: List[BookmarkView] = []
+        self.indexed_keys: Dict[str, Set[Tuple[str, str]]] = {}
+        self.columns: List[QVBoxLayout] = []
+        self.category_columns: Dict[str, int] = {}
+        self.column_balancer = ColumnBalancer()
+        self.row_height: Optional[int] = None
+        self.reflow_timer = QTimer(self)
+        self.reflow_timer.setSingleShot(True)
+        self.reflow_timer.setInterval(50)
+        self.reflow_timer.timeout.connect(self.reflow_columns)
+        self.icon_service = IconService(self.config.get("icon_cache_size", 256), parent=self)
+        self.url_opener = UrlOpener(self.config.get("open_batch_size", DEFAULT_BATCH_SIZE),
+                                    self.config.get("open_batch_interval_ms", DEFAULT_BATCH_INTERVAL_MS),
+                                    parent=self)
+        self.url_opener.opened.connect(self.on_url_opened)
+        self.url_opener.failed.connect(self.on_url_failed)
+        self.url_opener.batch_progress.connect(self.on_open_progress)
+        self.import_worker: Optional[ImportWorker] = None
+        self.import_progress: Optional[QProgressDialog] = None
+        self.link_cache = LinkCache(self.config.get("link_check_cache_ttl", 3600))
+        self.link_status: Dict[str, LinkStatus] = {}
+        self.link_worker: Optional[LinkCheckWorker] = None
+        self.links_checked = 0
+        self.favicon_cache = FaviconCache()
+        self.favicon_worker: Optional[FaviconWorker] = None
+        self.favicon_pending: Set[str] = set()
+        self.favicon_updates: Dict[str, str] = {}
+        self.favicon_timer = QTimer(self)
+        self.favicon_timer.setSingleShot(True)
+        self.favicon_timer.setInterval(200)
+        self.favicon_timer.timeout.connect(self.apply_favicons)
+        self.content_hashes: Optional[ContentHashes] = None
+        self.painted = False
+        self.ui_state = load_ui_state()
+        self.collapsed_categories: Dict[str, bool] = self.ui_state.get("collapsed_categories", {})
+        # Until the first show, expanded categories are only built if they are visible
+        self.defer_population = True
+        self.session_restored = False
+        self.pending_fill: List[str] = []
+        self.fill_timer = QTimer(self)
+        self.fill_timer.setInterval(0)
+        self.fill_timer.timeout.connect(self.fill_categories)
         self.initUI()
         
         # Connect signals
-        self.bookmark_added.connect(self.refresh_category)
-        self.bookmark_removed.connect(self.refresh_category)
+        if isinstance(self.bookmarks, BookmarkStore):
+            # The store reports every change, also those made outside the window
+            self.bookmarks.subscribe(self.bookmarks_changed.emit)
+            self.bookmarks_changed.connect(self.apply_changes)
+            self.request_favicons(site.url for _, site in self.all_bookmarks()
+                                  if self.wants_favicon(site))
+        else:
+            self.bookmark_added.connect(self.refresh_category)
+            self.bookmark_removed.connect(self.refresh_category)
 
     def initUI(self):
         """Set up the user interface."""
@@ -90,13 +245,53 @@ class BookmarkMainWindow(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск закладок...")
-        self.search_input.textChanged.connect(self.filter_bookmarks)
+        self.search_input.textChanged.connect(self.schedule_filter)
+        self.search_input.returnPressed.connect(self.open_best_match)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.config.get("search_debounce_ms", 150))
+        self.search_timer.timeout.connect(
+            lambda: self.filter_bookmarks(self.search_input.text()))
         search_layout.addWidget(self.search_input)
+        if isinstance(self.bookmarks, BookmarkStore):
+            self.import_button = QPushButton("Импорт")
+            self.import_button.setToolTip("Импорт закладок из HTML, Chrome Bookmarks или Firefox places.sqlite")
+            self.import_button.clicked.connect(self.choose_import_file)
+            search_layout.addWidget(self.import_button)
+            self.sync_button = QPushButton("Синхронизация")
+            self.sync_button.setToolTip("Объединить закладки с другой портативной копией")
+            self.sync_button.clicked.connect(self.choose_sync_directory)
+            search_layout.addWidget(self.sync_button)
+        self.check_links_button = QPushButton("Проверить ссылки")
+        self.check_links_button.setToolTip("Найти нерабочие и перемещенные адреса закладок")
+        self.check_links_button.clicked.connect(self.start_link_check)
+        search_layout.addWidget(self.check_links_button)
         main_layout.addLayout(search_layout)
 
+        # Most used bookmarks above the categories
+        self.most_used_widget = QWidget()
+        most_used_layout = QVBoxLayout(self.most_used_widget)
+        most_used_layout.setContentsMargins(0, 0, 0, 0)
+        most_used_layout.addWidget(QLabel(f"<b>{MOST_USED_TITLE}</b>"))
+        self.most_used_grid = QGridLayout()
+        most_used_layout.addLayout(self.most_used_grid)
+        main_layout.addWidget(self.most_used_widget)
+        self.most_used_timer = QTimer(self)
+        self.most_used_timer.setSingleShot(True)
+        self.most_used_timer.setInterval(500)
+        self.most_used_timer.timeout.connect(self.refresh_most_used)
+        self.refresh_most_used()
+
         # Bookmark area
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
+        self.materialize_timer = QTimer(self)
+        self.materialize_timer.setSingleShot(True)
+        self.materialize_timer.setInterval(100)
+        self.materialize_timer.timeout.connect(self.update_materialization)
+        if self.config.get("release_offscreen_categories", False):
+            self.scroll_area.verticalScrollBar().valueChanged.connect(
+                lambda _: self.materialize_timer.start())
         self.scroll_widget = QWidget()
         self.scroll_layout = QHBoxLayout()
 
@@ -108,38 +303,205 @@ class BookmarkMainWindow(QMainWindow):
         central_widget.setLayout(main_layout)
 
         self.adjust_window_size()
+        self.restore_geometry()
+        self.restore_search()
         self.show()
 
     def setup_bookmarks(self):
         """Set up the bookmark layout."""
         try:
             categories = list(self.bookmarks.items())
-            half = len(categories) // 2
+            for category, sites in categories:
+                self.index_category(category, sites)
 
-            left_column = QVBoxLayout()
-            right_column = QVBoxLayout()
+            if self.config.get("render_mode") == "model":
+                data = ({category: self.ordered_sites(category) for category in self.bookmarks}
+                        if self.config.get("sort_by_usage", False) else self.bookmarks)
+                self.bookmark_model = BookmarkModel(data, self.icon_service, self)
+                self.reflow_columns()
+                logger.info(f"Successfully set up {len(categories)} bookmark categories")
+                return
 
-            for i, (category, sites) in enumerate(categories):
-                layout = left_column if i < half else right_column
-                category_widget = CollapsibleCategory(category)
-                self.category_widgets[category] = category_widget
-                for site in sites:
-                    self.add_site_to_layout(category_widget.content_layout, site, category)
-                layout.addWidget(category_widget)
-
-            left_column.addStretch()
-            right_column.addStretch()
-            
-            self.scroll_layout.addLayout(left_column)
-            self.scroll_layout.addLayout(right_column)
-            
+            # Set before the category widgets are built: expanded categories
+            # create their buttons right away and hide those not in this set
+            self.visible_bookmarks = self.search_index.all()
+            self.reflow_columns()
             logger.info(f"Successfully set up {len(categories)} bookmark categories")
             
         except Exception as e:
             logger.error(f"Error setting up bookmarks: {e}")
             QMessageBox.warning(self, "Ошибка", "Не удалось загрузить все закладки")
 
-    def add_site_to_layout(self, layout: QVBoxLayout, site: Bookmark, category: str):
+    def create_bookmark_view(self) -> BookmarkView:
+        """Create an empty virtualized bookmark view for one column."""
+        view = BookmarkView(self.bookmark_model, set(), self.config["button_width"])
+        view.bookmark_activated.connect(lambda _, site: self.open_website(site))
+        view.bookmark_menu_requested.connect(self.exec_bookmark_context_menu)
+        view.category_menu_requested.connect(self.exec_category_context_menu)
+        view.category_toggled.connect(self.on_category_toggled)
+        return view
+
+    def layout_width(self) -> int:
+        """Width available to the columns, within the configured window limits."""
+        width = self.width() if self.isVisible() else self.config["window_width"]
+        return min(max(width, self.config["min_width"]), self.config["max_width"])
+
+    def measure_category(self, category: str) -> int:
+        """Estimate the height of a category from its bookmark count, without building its buttons."""
+        if self.row_height is None:
+            if self.bookmark_model is not None:
+                self.row_height = ROW_HEIGHT
+            else:
+                self.row_height = QPushButton("X").sizeHint().height() + ROW_SPACING
+        rows = 1 if self.is_category_collapsed(category) else 1 + len(self.bookmarks.get(category, ()))
+        return rows * self.row_height
+
+    def schedule_reflow(self, category: Optional[str] = None):
+        """Forget the size hint of a changed category and rebalance the columns shortly."""
+        if category is not None:
+            self.column_balancer.invalidate(category)
+        self.reflow_timer.start()
+
+    def reflow_columns(self):
+        """
+        Balance the categories across as many columns as fit the window width.
+
+        Only columns whose categories changed are rebuilt.
+        """
+        count = column_count(self.layout_width(), self.config["button_width"] + COLUMN_PADDING)
+        columns = self.column_balancer.arrange(list(self.bookmarks), count, self.measure_category)
+        if self.bookmark_model is not None:
+            self.apply_view_columns(columns)
+        else:
+            self.apply_widget_columns(columns)
+
+    def apply_widget_columns(self, columns: List[List[str]]):
+        """Move the category widgets into the given columns, creating missing widgets."""
+        while len(self.columns) < len(columns):
+            column = QVBoxLayout()
+            column.addStretch()
+            self.scroll_layout.addLayout(column)
+            self.columns.append(column)
+        for index, categories in enumerate(columns):
+            column = self.columns[index]
+            current = [column.itemAt(i).widget().category for i in range(column.count() - 1)]
+            if current == categories:
+                continue
+            for category in current:
+                column.removeWidget(self.category_widgets[category])
+            for category in categories:
+                widget = self.category_widgets.get(category)
+                if widget is None:
+                    widget = self.create_category_widget(category)
+                else:
+                    old = self.category_columns.get(category)
+                    if old is not None and old != index:
+                        self.columns[old].removeWidget(widget)
+                # Keep the trailing stretch at the end of the column
+                column.insertWidget(column.count() - 1, widget)
+                self.category_columns[category] = index
+        for column in self.columns[len(columns):]:
+            self.scroll_layout.removeItem(column)
+            column.deleteLater()
+        del self.columns[len(columns):]
+        if self.config.get("release_offscreen_categories", False):
+            self.materialize_timer.start()
+
+    def apply_view_columns(self, columns: List[List[str]]):
+        """Give each bookmark view the categories of its column, adding or removing views."""
+        added = False
+        while len(self.bookmark_views) < len(columns):
+            view = self.create_bookmark_view()
+            self.bookmark_views.append(view)
+            self.scroll_layout.addWidget(view)
+            added = True
+        for view, categories in zip(self.bookmark_views, columns):
+            view.set_categories(set(categories),
+                                {category for category in categories if self.is_category_collapsed(category)})
+        for view in self.bookmark_views[len(columns):]:
+            self.scroll_layout.removeWidget(view)
+            view.deleteLater()
+        del self.bookmark_views[len(columns):]
+        if added and self.search_input.text():
+            self.filter_bookmarks(self.search_input.text())
+
+    def is_category_collapsed(self, category: str) -> bool:
+        """Return the saved collapsed state of a category, or the configured default."""
+        return self.collapsed_categories.get(category, self.config.get("start_collapsed", False))
+
+    def on_category_toggled(self, category: str, collapsed: bool):
+        """Remember the collapsed state of a category for the next launch and rebalance the columns."""
+        self.collapsed_categories[category] = collapsed
+        self.schedule_reflow(category)
+        self.ui_state["collapsed_categories"] = self.collapsed_categories
+        save_ui_state(self.ui_state)
+
+    def index_category(self, category: str, sites: List[Bookmark]):
+        """Replace the search index entries of a category."""
+        for key in self.indexed_keys.pop(category, ()):
+            self.search_index.remove(key)
+        keys = set()
+        for site in sites:
+            keys.add(self.index_bookmark(category, site))
+        self.indexed_keys[category] = keys
+
+    def index_bookmark(self, category: str, site: Bookmark) -> Tuple[str, str]:
+        """Add a bookmark to the search index and return its key."""
+        key = (category, site.name)
+        self.search_index.add(key, site.name)
+        if isinstance(self.search_index, RankedSearch):
+            self.search_index.set_boost(key, self.frecency.boost(site.url))
+        return key
+
+    def create_category_widget(self, category: str) -> CollapsibleCategory:
+        """Create a category widget whose buttons are built when it is first expanded."""
+        collapsed = self.is_category_collapsed(category)
+        placeholder = self.measure_category(category) - self.row_height if self.defer_population else 0
+        category_widget = CollapsibleCategory(category, self.populate_category, collapsed,
+                                              self.defer_population, placeholder)
+        category_widget.toggled.connect(self.on_category_toggled)
+        category_widget.menu_requested.connect(self.exec_category_context_menu)
+        self.category_widgets[category] = category_widget
+        return category_widget
+
+    def populate_category(self, category_widget: CollapsibleCategory):
+        """Build the bookmark buttons of a category."""
+        category = category_widget.category
+        for site in self.ordered_sites(category):
+            self.add_site_to_layout(category_widget.content_layout, site, category)
+            key = (category, site.name)
+            if key not in self.visible_bookmarks:
+                self.site_buttons[key].setVisible(False)
+
+    def release_category(self, category: str, keep_height: bool = False):
+        """Delete the buttons of a category; they are rebuilt when needed again."""
+        category_widget = self.category_widgets[category]
+        layout = category_widget.content_layout
+        for i in range(layout.count()):
+            button = layout.itemAt(i).widget()
+            if button is not None:
+                self.site_buttons.pop((category, button.bookmark.name), None)
+        category_widget.clear_content(keep_height)
+
+    def update_materialization(self):
+        """
+        Build the buttons of expanded categories near the visible area and
+        release those far outside of it.
+        """
+        viewport = self.scroll_area.viewport()
+        top = self.scroll_area.verticalScrollBar().value() - viewport.height()
+        bottom = top + 3 * viewport.height()
+        for category, widget in self.category_widgets.items():
+            if widget.is_collapsed or widget.isHidden():
+                continue
+            y = widget.mapTo(self.scroll_widget, QPoint(0, 0)).y()
+            on_screen = y < bottom and y + widget.height() > top
+            if on_screen:
+                widget.ensure_populated()
+            elif widget.is_populated:
+                self.release_category(category, keep_height=True)
+
+    def add_site_to_layout(self, layout: QVBoxLayout, site: Bookmark, category: str, index: int = -1):
         """
         Add a site button to the layout.
 
@@ -147,77 +509,529 @@ class BookmarkMainWindow(QMainWindow):
             layout (QVBoxLayout): The layout to add the site button to
             site (Bookmark): A Bookmark object containing site information
             category (str): The category this bookmark belongs to
+            index (int): Position in the layout, -1 to append
         """
+        site_button = self.create_site_button(site, category)
+        self.site_buttons[(category, site.name)] = site_button
+        layout.insertWidget(index, site_button)
+
+    def create_site_button(self, site: Bookmark, category: str) -> QPushButton:
+        """Create a button that opens a bookmark and offers its context menu."""
         site_button = QPushButton(site.name)
         site_button.setContextMenuPolicy(Qt.CustomContextMenu)
         site_button.customContextMenuRequested.connect(
-            lambda pos, s=site, c=category: self.show_bookmark_context_menu(pos, s, c))
-        site_button.clicked.connect(lambda _, s=site: self.open_website(s))
+            lambda pos, b=site_button, c=category: self.show_bookmark_context_menu(pos, b.bookmark, c))
+        site_button.clicked.connect(lambda _, b=site_button: self.open_website(b.bookmark))
         site_button.setFixedWidth(self.config["button_width"])
-        
+        self.update_site_button(site_button, site)
+        return site_button
+
+    def update_site_button(self, site_button: QPushButton, site: Bookmark):
+        """Point an existing button at a (possibly changed) bookmark."""
+        previous = getattr(site_button, 'bookmark', None)
+        site_button.bookmark = site
+        self.mark_link_status(site_button, site)
+        if previous is not None and previous.name == site.name and previous.icon == site.icon:
+            return
+        site_button.setText(site.name)
         if site.icon:
-            try:
-                site_button.setIcon(QIcon(site.icon))
-            except Exception as e:
-                logger.warning(f"Failed to load icon for {site.name}: {e}")
-                
-        layout.addWidget(site_button)
+            icon = self.icon_service.cached(site.icon)
+            if icon is None:
+                site_button.setIcon(self.icon_service.placeholder)
+                self.icon_service.load(site.icon, site_button.setIcon)
+            else:
+                site_button.setIcon(icon)
+        else:
+            site_button.setIcon(QIcon())
+
+    def mark_link_status(self, site_button: QPushButton, site: Bookmark):
+        """Highlight a button whose bookmark failed the last link check."""
+        problem = self.link_problem(site.url)
+        if problem:
+            site_button.setStyleSheet("color: #c62828;")
+            site_button.setToolTip(f"{problem}\n{site.url}")
+        elif site_button.toolTip():
+            site_button.setStyleSheet("")
+            site_button.setToolTip("")
+
+    def link_problem(self, url: str) -> Optional[str]:
+        """Describe why a URL failed the link check, or return None if it works."""
+        status = self.link_status.get(url)
+        if status is None or not status.is_broken:
+            return None
+        if status.status is not None:
+            return f"Ссылка не работает: ответ сервера {status.status}"
+        return f"Ссылка не работает: {status.error}"
 
     def show_bookmark_context_menu(self, pos, bookmark: Bookmark, category: str):
         """Show context menu for bookmark."""
+        self.exec_bookmark_context_menu(self.sender().mapToGlobal(pos), category, bookmark)
+
+    def exec_bookmark_context_menu(self, global_pos: QPoint, category: str, bookmark: Bookmark):
+        """Show the bookmark context menu at a global position and handle the chosen action."""
         menu = QMenu(self)
         
         # Add menu actions
         open_action = menu.addAction("Открыть")
         open_new_window = menu.addAction("Открыть в новом окне")
+        open_all_action = menu.addAction("Открыть все в категории")
         menu.addSeparator()
         remove_action = menu.addAction("Удалить")
         
         # Show menu and handle actions
-        action = menu.exec_(self.sender().mapToGlobal(pos))
+        action = menu.exec_(global_pos)
         
         if action == open_action:
             self.open_website(bookmark)
         elif action == open_new_window:
             self.open_website(bookmark, new_window=True)
+        elif action == open_all_action:
+            self.open_category(category)
         elif action == remove_action:
             self.remove_bookmark_from_category(category, bookmark.name)
 
-    def open_website(self, site: Bookmark, new_window: bool = False):
+    def exec_category_context_menu(self, global_pos: QPoint, category: str):
+        """Show the context menu of a category header at a global position."""
+        menu = QMenu(self)
+        open_all_action = menu.addAction("Открыть все")
+        open_all_action.setEnabled(bool(self.bookmarks.get(category)))
+        if menu.exec_(global_pos) == open_all_action:
+            self.open_category(category)
+
+    def open_website(self, site: Bookmark, new_window: bool = False) -> bool:
         """
         Open the website in the default browser.
 
+        The URL is handed to the browser in the background; a failure is
+        reported in the status bar.
+
         Args:
             site (Bookmark): A Bookmark object containing site information
             new_window (bool): If True, try to open in a new window
+
+        Returns:
+            bool: True once the URL is queued for opening
         """
+        self.url_opener.open(site.url, new_window)
+        return True
+
+    def open_category(self, category: str):
+        """Open every bookmark of a category in throttled batches of browser tabs."""
+        urls = [site.url for site in self.bookmarks.get(category, [])]
+        logger.info(f"Opening {len(urls)} bookmarks of category {category}")
+        self.url_opener.open_many(urls)
+
+    def on_url_opened(self, url: str):
+        """Record the visit of a URL the browser accepted."""
+        self.frecency.record(url)
+        self.update_boosts(url)
+        self.most_used_timer.start()
+
+    def on_url_failed(self, url: str, _error: str):
+        """Report a URL that could not be opened without interrupting the user."""
+        self.statusBar().showMessage(f"Не удалось открыть сайт: {url}", 10000)
+
+    def on_open_progress(self, done: int, total: int):
+        """Show how many tabs of "open all" have been opened."""
+        self.statusBar().showMessage(f"Открыто вкладок: {done} из {total}", 5000)
+
+    def stop_opening(self):
+        """Drop the bookmarks of "open all" that have not been opened yet."""
+        self.url_opener.cancel()
+
+    def handle_command(self, argv: List[str]) -> Tuple[int, str, str]:
+        """
+        Run a command line forwarded by a new launch of the application.
+
+        A plain launch brings the window to the front; queries run against the
+        loaded bookmarks as ``cli`` would run them.
+
+        Returns:
+            Exit status, output and error text for the launching process
+        """
+        if not is_cli_request(argv):
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+            return 0, "", ""
         try:
-            url = QUrl(site.url)
-            if new_window:
-                # Attempt to open in new window - note this may not work with all browsers
-                url.setFragment("_blank")
-            if not QDesktopServices.openUrl(url):
-                raise Exception("QDesktopServices.openUrl returned False")
-            logger.info(f"Successfully opened URL: {site.url}")
-        except Exception as e:
-            logger.error(f"Failed to open URL {site.url}: {e}")
-            QMessageBox.warning(self, "Ошибка", f"Не удалось открыть сайт: {site.name}")
+            args = build_parser().parse_args(argv)
+        except SystemExit:
+            return 2, "", "Invalid arguments\n"
+        out, err = io.StringIO(), io.StringIO()
+        status = execute(args, self.bookmarks, self.config, self.frecency,
+                         lambda category, site, new_window: self.open_website(site, new_window), out, err)
+        return status, out.getvalue(), err.getvalue()
+
+    def update_boosts(self, url: str):
+        """Refresh the ranking boost of every bookmark pointing at a URL."""
+        if not isinstance(self.search_index, RankedSearch):
+            return
+        boost = self.frecency.boost(url)
+        for category, site in self.sites_for_url(url):
+            self.search_index.set_boost((category, site.name), boost)
 
+    def sites_for_url(self, url: str) -> List[Tuple[str, Bookmark]]:
+        """Return the (category, bookmark) pairs pointing at a URL."""
+        if isinstance(self.bookmarks, BookmarkStore):
+            return self.bookmarks.find_by_url(url)
+        return [(category, site) for category, category_sites in self.bookmarks.items()
+                for site in category_sites if site.url == url]
+
+    def ordered_sites(self, category: str) -> List[Bookmark]:
+        """Return the bookmarks of a category in display order: most used first with ``sort_by_usage``."""
+        sites = self.bookmarks.get(category, [])
+        if not self.config.get("sort_by_usage", False):
+            return sites
+        now = time.time()
+        return sorted(sites, key=lambda site: -self.frecency.score(site.url, now))
+
+    def refresh_most_used(self):
+        """Show the ``most_used_count`` bookmarks with the highest visit score above the categories."""
+        while self.most_used_grid.count():
+            self.most_used_grid.takeAt(0).widget().deleteLater()
+        limit = self.config.get("most_used_count", 8)
+        sites: List[Tuple[str, Bookmark]] = []
+        if limit > 0:
+            for url, _ in self.frecency.most_used(len(self.frecency)):
+                matches = self.sites_for_url(url)
+                if matches:
+                    sites.append(matches[0])
+                    if len(sites) >= limit:
+                        break
+        width = self.config["button_width"] + COLUMN_PADDING
+        columns = column_count(self.layout_width(), width)
+        for i, (category, site) in enumerate(sites):
+            button = self.create_site_button(site, category)
+            self.most_used_grid.addWidget(button, i // columns, i % columns)
+        self.most_used_widget.setVisible(bool(sites))
+
+    def schedule_filter(self, _text: str = ""):
+        """Restart the debounce timer; filtering runs once typing pauses."""
+        self.search_timer.start()
+
+    @metrics.timed("search.filter")
     def filter_bookmarks(self, text: str):
-        """Filter bookmarks based on search text."""
-        search_text = text.lower()
+        """
+        Filter bookmarks based on search text.
+
+        Only buttons whose match state changed since the previous call are
+        shown or hidden.
+        """
+        matches = self.search_matches(text)
+        if self.bookmark_model is not None:
+            for view in self.bookmark_views:
+                view.set_matches(matches if text else None)
+            return
+
+        for key in matches ^ self.visible_bookmarks:
+            button = self.site_buttons.get(key)
+            if button is not None:
+                button.setVisible(key in matches)
+        self.visible_bookmarks = matches
+        
+        # Show/hide category based on whether it has visible items
+        matched_categories = {category for category, _ in matches}
         for category, widget in self.category_widgets.items():
-            has_visible_items = False
-            for i in range(widget.content_layout.count()):
-                item = widget.content_layout.itemAt(i)
-                if item and item.widget():
-                    button = item.widget()
-                    visible = search_text in button.text().lower()
-                    button.setVisible(visible)
-                    has_visible_items = has_visible_items or visible
-            
-            # Show/hide category based on whether it has visible items
-            widget.setVisible(has_visible_items or not search_text)
+            visible = category in matched_categories or not text
+            if widget.isHidden() == visible:
+                widget.setVisible(visible)
+
+    def search_matches(self, text: str) -> Set[Tuple[str, str]]:
+        """
+        Return the keys of the bookmarks matching the search text.
+
+        In ranked mode only the best ``search_limit`` matches are returned and
+        their order is kept in ``ranked_results``.
+        """
+        if not isinstance(self.search_index, RankedSearch):
+            return self.search_index.search(text)
+        if not text.strip():
+            self.ranked_results = []
+            return self.search_index.all()
+        results = self.search_index.search(text, self.config.get("search_limit", 50))
+        self.ranked_results = [key for key, _ in results]
+        return set(self.ranked_results)
+
+    def open_best_match(self):
+        """Open the best ranked search result when Enter is pressed in the search bar."""
+        if not isinstance(self.search_index, RankedSearch):
+            return
+        if self.search_timer.isActive():
+            self.search_timer.stop()
+            self.filter_bookmarks(self.search_input.text())
+        if self.ranked_results:
+            category, name = self.ranked_results[0]
+            site = next((site for site in self.bookmarks.get(category, []) if site.name == name), None)
+            if site is not None:
+                self.open_website(site)
+
+    def choose_import_file(self):
+        """Ask for a browser export file and import it."""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт закладок", "",
+            "Закладки браузера (*.html *.htm Bookmarks *.json places.sqlite);;Все файлы (*)")
+        if path:
+            self.start_import(path)
+
+    def start_import(self, path: str):
+        """
+        Import bookmarks from a browser export in a background thread.
+
+        Args:
+            path (str): Netscape HTML file, Chrome ``Bookmarks`` JSON or Firefox ``places.sqlite``
+        """
+        if self.import_worker is not None:
+            return
+        known_urls = [site.url for category in self.bookmarks for site in self.bookmarks[category]]
+        self.import_worker = ImportWorker(path, known_urls, parent=self)
+        self.import_worker.progress.connect(self.on_import_progress)
+        self.import_worker.chunk_ready.connect(self.on_import_chunk)
+        self.import_worker.finished.connect(self.on_import_finished)
+        self.import_progress = QProgressDialog("Импорт закладок...", "Отмена", 0, 100, self)
+        self.import_progress.setWindowModality(Qt.NonModal)
+        self.import_progress.setMinimumDuration(500)
+        self.import_progress.canceled.connect(self.stop_import)
+        self.import_button.setEnabled(False)
+        self.import_worker.start()
+
+    def stop_import(self):
+        """Cancel a running import and wait for the worker to stop."""
+        if self.import_worker is not None:
+            self.import_worker.requestInterruption()
+            self.import_worker.wait()
+
+    def on_import_progress(self, done: int, total: int):
+        """Show the import progress in percent."""
+        if self.import_progress is not None and total:
+            self.import_progress.setValue(min(100, done * 100 // total))
+
+    def on_import_chunk(self, chunk: List[Tuple[str, Bookmark]]):
+        """Add a chunk of imported bookmarks to the store in one batch."""
+        try:
+            if not self.import_worker.isInterruptionRequested():
+                add_imported(self.bookmarks, chunk)
+        except Exception as e:
+            logger.error(f"Failed to add imported bookmarks: {e}")
+            self.import_worker.requestInterruption()
+        finally:
+            self.import_worker.chunk_done()
+
+    def on_import_finished(self):
+        """Close the progress dialog and report the import result."""
+        worker, self.import_worker = self.import_worker, None
+        cancelled = worker.isInterruptionRequested()
+        if self.import_progress is not None:
+            self.import_progress.canceled.disconnect(self.stop_import)
+            self.import_progress.close()
+            self.import_progress.deleteLater()
+            self.import_progress = None
+        self.import_button.setEnabled(True)
+        worker.deleteLater()
+        stats = worker.stats
+        logger.info(f"Import of {worker.path} finished: {stats}")
+        if worker.error is not None:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось импортировать закладки: {worker.error}")
+        elif not cancelled:
+            QMessageBox.information(
+                self, "Импорт закладок",
+                f"Добавлено: {stats.added}\n"
+                f"Дубликатов пропущено: {stats.duplicates}\n"
+                f"Некорректных адресов: {stats.invalid}")
+
+    def choose_sync_directory(self):
+        """Ask for the folder of another portable copy and synchronize with it."""
+        directory = QFileDialog.getExistingDirectory(self, "Папка другой копии с bookmarks.db")
+        if directory:
+            self.sync_with(Path(directory))
+
+    def sync_with(self, remote_dir: Path):
+        """
+        Merge the bookmarks of this copy and of the copy in ``remote_dir``.
+
+        Both copies receive the changes of the other; conflicting changes are
+        shown in a dialog to choose which version to keep.
+        """
+        db = self.bookmarks.backend
+        if db is None:
+            QMessageBox.warning(self, "Ошибка", "Закладки этой копии не сохраняются, синхронизация невозможна")
+            return
+        local_dir = db.path.parent
+        if remote_dir.resolve() == local_dir.resolve():
+            QMessageBox.warning(self, "Синхронизация", "Выбрана папка этой же копии")
+            return
+        try:
+            remote = load_copy(remote_dir)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to open bookmarks in {remote_dir}: {e}")
+            QMessageBox.warning(self, "Ошибка", f"Не удалось открыть закладки другой копии: {e}")
+            return
+
+        from bookmark_manager import close_bookmarks
+        try:
+            if self.content_hashes is None:
+                self.content_hashes = ContentHashes(self.bookmarks)
+            plan = plan_sync(self.content_hashes, ContentHashes(remote), read_ancestor(local_dir, remote_dir))
+            if plan.conflicts:
+                dialog = SyncConflictDialog(plan.conflicts, self)
+                if dialog.exec_() != QDialog.Accepted:
+                    return
+                plan = resolve_conflicts(plan, dialog.choices())
+            apply_plan(plan, self.bookmarks, remote, local_dir, remote_dir)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to sync bookmarks with {remote_dir}: {e}")
+            QMessageBox.warning(self, "Ошибка", f"Не удалось синхронизировать закладки: {e}")
+            return
+        finally:
+            close_bookmarks(remote)
+
+        summary = (f"Получено изменений: {len(plan.local)}\n"
+                   f"Передано изменений: {len(plan.remote)}")
+        if plan.conflicts:
+            summary += f"\nОтложено конфликтов: {len(plan.conflicts)}"
+        QMessageBox.information(self, "Синхронизация", summary)
+
+    def all_bookmarks(self) -> List[Tuple[str, Bookmark]]:
+        """Return (category, bookmark) pairs of all bookmarks."""
+        return [(category, site) for category in self.bookmarks for site in self.bookmarks[category]]
+
+    def start_link_check(self):
+        """Check all bookmark URLs in the background."""
+        if self.link_worker is not None:
+            return
+        urls = [site.url for _, site in self.all_bookmarks()]
+        self.link_worker = LinkCheckWorker(
+            urls, self.link_cache,
+            concurrency=self.config.get("link_check_concurrency", 16),
+            timeout=self.config.get("link_check_timeout", 10), parent=self)
+        self.link_worker.result.connect(self.on_link_checked)
+        self.link_worker.finished.connect(self.on_link_check_finished)
+        self.links_checked = 0
+        self.check_links_button.setEnabled(False)
+        self.check_links_button.setText(f"Проверка 0/{len(self.link_worker.urls)}")
+        self.link_worker.start()
+
+    def stop_link_check(self):
+        """Cancel a running link check."""
+        if self.link_worker is not None:
+            self.link_worker.stop()
+
+    def on_link_checked(self, status: LinkStatus):
+        """Store the result of one URL and mark its bookmarks."""
+        previous = self.link_status.get(status.url)
+        self.link_status[status.url] = status
+        self.links_checked += 1
+        self.check_links_button.setText(f"Проверка {self.links_checked}/{len(self.link_worker.urls)}")
+        if previous is None and not status.is_broken or previous == status:
+            return
+        for category, site in self.sites_for_url(status.url):
+            site_button = self.site_buttons.get((category, site.name))
+            if site_button is not None:
+                self.mark_link_status(site_button, site)
+
+    def on_link_check_finished(self):
+        """Report broken links and offer to apply permanent redirects."""
+        worker, self.link_worker = self.link_worker, None
+        worker.deleteLater()
+        self.check_links_button.setText("Проверить ссылки")
+        self.check_links_button.setEnabled(True)
+        if self.bookmark_model is not None:
+            self.bookmark_model.set_link_problems(
+                {url: self.link_problem(url) for url in self.link_status if self.link_problem(url)})
+        if worker.isInterruptionRequested():
+            return
+
+        checked = [self.link_status[url] for url in worker.urls if url in self.link_status]
+        broken = sum(1 for status in checked if status.is_broken)
+        moved = [(category, site, self.link_status[site.url].location)
+                 for category, site in self.all_bookmarks()
+                 if site.url in self.link_status and self.link_status[site.url].state == LINK_MOVED]
+        summary = f"Проверено ссылок: {len(checked)}\nНе работают: {broken}"
+        if not moved:
+            QMessageBox.information(self, "Проверка ссылок", summary)
+            return
+
+        examples = "\n".join(f"{site.name}: {location}" for _, site, location in moved[:10])
+        if len(moved) > 10:
+            examples += "\n..."
+        reply = QMessageBox.question(
+            self, "Проверка ссылок",
+            f"{summary}\nПеремещены навсегда: {len(moved)}\n\n{examples}\n\n"
+            "Обновить адреса этих закладок?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.apply_redirects(moved)
+
+    def apply_redirects(self, moved: List[Tuple[str, Bookmark, str]]):
+        """Point bookmarks at the targets of their permanent redirects."""
+        updated = 0
+        store = self.bookmarks if isinstance(self.bookmarks, BookmarkStore) else None
+        try:
+            with store.batch() if store is not None else nullcontext():
+                for category, site, location in moved:
+                    if store is None:
+                        changed = update_bookmark(category, site.name, new_url=location)
+                    elif not validate_url(location):
+                        raise ValueError("Invalid URL provided")
+                    else:
+                        current = store.find(category, site.name)
+                        changed = current is not None and store.update(
+                            category, site.name, current._replace(url=location))
+                    if changed:
+                        updated += 1
+        except ValueError as e:
+            logger.error(f"Failed to apply redirects: {e}")
+            QMessageBox.warning(self, "Ошибка", "Не удалось обновить адреса закладок")
+        logger.info(f"Updated {updated} bookmarks to their redirect targets")
+
+    def wants_favicon(self, site: Bookmark) -> bool:
+        """Return True if a bookmark has no icon or one taken from the favicon cache."""
+        return not site.icon or self.favicon_cache.owns(site.icon)
+
+    def request_favicons(self, urls: Iterable[str]):
+        """Fetch or revalidate the favicons of bookmark URLs in the background."""
+        if not self.config.get("fetch_favicons", True) or not isinstance(self.bookmarks, BookmarkStore):
+            return
+        self.favicon_pending.update(urls)
+        if self.favicon_worker is not None or not self.favicon_pending:
+            return
+        urls, self.favicon_pending = self.favicon_pending, set()
+        self.favicon_worker = FaviconWorker(
+            urls, self.favicon_cache,
+            refresh_after=self.config.get("favicon_refresh_days", 7) * 24 * 3600, parent=self)
+        self.favicon_worker.icon_ready.connect(self.on_favicon_ready)
+        self.favicon_worker.finished.connect(self.on_favicon_finished)
+        self.favicon_worker.start()
+
+    def stop_favicons(self):
+        """Cancel fetching favicons."""
+        self.favicon_pending.clear()
+        if self.favicon_worker is not None:
+            self.favicon_worker.stop()
+
+    def on_favicon_ready(self, url: str, path: str):
+        """Remember a fetched icon; icons are written to the store in batches."""
+        self.favicon_updates[url] = path
+        if not self.favicon_timer.isActive():
+            self.favicon_timer.start()
+
+    def on_favicon_finished(self):
+        """Start the next round if more URLs were requested meanwhile."""
+        self.favicon_worker.deleteLater()
+        self.favicon_worker = None
+        self.request_favicons(())
+
+    def apply_favicons(self):
+        """Set the fetched icons on bookmarks that have no icon of their own."""
+        updates, self.favicon_updates = self.favicon_updates, {}
+        try:
+            with self.bookmarks.batch():
+                for url, path in updates.items():
+                    for category, site in self.bookmarks.find_by_url(url):
+                        if site.icon != path and self.wants_favicon(site):
+                            self.bookmarks.update(category, site.name, site._replace(icon=path))
+        except ValueError as e:
+            logger.error(f"Failed to set favicons: {e}")
 
     def remove_bookmark_from_category(self, category: str, name: str):
         """Remove a bookmark from a category."""
@@ -237,26 +1051,221 @@ class BookmarkMainWindow(QMainWindow):
 
     def refresh_category(self, category: str, _=None):
         """Refresh the display of a category after changes."""
-        if category in self.category_widgets:
-            # Clear existing bookmarks
-            while self.category_widgets[category].content_layout.count():
-                item = self.category_widgets[category].content_layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
-            
-            # Add updated bookmarks
-            for site in self.bookmarks[category]:
-                self.add_site_to_layout(
-                    self.category_widgets[category].content_layout,
-                    site,
-                    category
-                )
+        self.index_category(category, self.bookmarks.get(category, []))
+        self.sync_category(category)
+        self.filter_bookmarks(self.search_input.text())
+
+    @metrics.timed("refresh.changes")
+    def apply_changes(self, changes: ChangeSet):
+        """
+        Apply a coalesced set of store changes to the search index and the UI.
+
+        Only the touched categories are synchronized, and within them only the
+        buttons of changed bookmarks are created, updated or deleted.
+        """
+        for category, site in changes.removed:
+            key = (category, site.name)
+            self.search_index.remove(key)
+            self.indexed_keys.get(category, set()).discard(key)
+        for category, site in changes.added:
+            self.indexed_keys.setdefault(category, set()).add(self.index_bookmark(category, site))
+        self.request_favicons(site.url for _, site in changes.added if not site.icon)
+        for category, _, site in changes.updated:
+            self.index_bookmark(category, site)
+        for category in changes.categories:
+            self.sync_category(category)
+            self.schedule_reflow(category)
+        if changes.categories:
+            self.most_used_timer.start()
+        self.filter_bookmarks(self.search_input.text())
+
+    def sync_category(self, category: str):
+        """Bring the widgets of a category in line with the bookmark data, reusing unchanged ones."""
+        sites = self.ordered_sites(category)
+        if self.bookmark_model is not None:
+            new = not self.bookmark_model.has_category(category)
+            self.bookmark_model.set_category(category, sites)
+            if new:
+                self.reflow_columns()
+            return
+
+        category_widget = self.category_widgets.get(category)
+        if category_widget is None:
+            if category in self.bookmarks and self.columns:
+                self.reflow_columns()
+            return
+        if not category_widget.is_populated:
+            return
+
+        layout = category_widget.content_layout
+        existing: Dict[str, QPushButton] = {}
+        for i in range(layout.count()):
+            button = layout.itemAt(i).widget()
+            if button is not None:
+                existing[button.bookmark.name] = button
+
+        wanted = {site.name for site in sites}
+        for name, button in existing.items():
+            if name not in wanted:
+                layout.removeWidget(button)
+                button.deleteLater()
+                del self.site_buttons[(category, name)]
+
+        for i, site in enumerate(sites):
+            button = existing.get(site.name)
+            if button is None:
+                self.add_site_to_layout(layout, site, category, i)
+                if (category, site.name) not in self.visible_bookmarks:
+                    self.site_buttons[(category, site.name)].setVisible(False)
+                continue
+            if button.bookmark != site:
+                self.update_site_button(button, site)
+            item = layout.itemAt(i)
+            if item is None or item.widget() is not button:
+                layout.removeWidget(button)
+                layout.insertWidget(i, button)
 
     def adjust_window_size(self):
-        """Adjust the window size based on configuration."""
+        """Apply the configured size limits and resize the window to the configured size."""
         self.setMinimumSize(self.config["min_width"], self.config["min_height"])
         self.setMaximumSize(self.config["max_width"], self.config["max_height"])
-        self.setFixedSize(self.config["window_width"], self.config["window_height"])
+        self.resize(self.config["window_width"], self.config["window_height"])
+
+    def restore_geometry(self):
+        """Put the window where it was in the last session; the size stays within the limits."""
+        geometry = self.ui_state.get("geometry")
+        if isinstance(geometry, str):
+            # Qt moves windows of a disconnected screen back onto a visible one
+            self.restoreGeometry(QByteArray.fromBase64(geometry.encode('ascii')))
+
+    def restore_search(self):
+        """Filter for the search text of the last session before the window is painted."""
+        text = self.ui_state.get("search", "")
+        if isinstance(text, str) and text:
+            self.search_input.setText(text)
+            self.search_timer.stop()
+            self.filter_bookmarks(text)
+
+    def restore_scroll(self):
+        """Scroll back to the positions of the last session."""
+        scroll = self.ui_state.get("scroll", 0)
+        if isinstance(scroll, int):
+            self.scroll_area.verticalScrollBar().setValue(scroll)
+        view_scroll = self.ui_state.get("view_scroll", [])
+        if isinstance(view_scroll, list):
+            for view, value in zip(self.bookmark_views, view_scroll):
+                if isinstance(value, int):
+                    view.verticalScrollBar().setValue(value)
+
+    def save_session(self):
+        """Save the collapsed categories, scroll positions, search text and window geometry."""
+        self.ui_state["collapsed_categories"] = self.collapsed_categories
+        self.ui_state["search"] = self.search_input.text()
+        self.ui_state["scroll"] = self.scroll_area.verticalScrollBar().value()
+        self.ui_state["view_scroll"] = [view.verticalScrollBar().value() for view in self.bookmark_views]
+        self.ui_state["geometry"] = bytes(self.saveGeometry().toBase64()).decode('ascii')
+        save_ui_state(self.ui_state)
+
+    def fill_categories(self):
+        """
+        Build the buttons of expanded off-screen categories, a slice of time per turn
+        of the event loop, so that input is handled in between.
+        """
+        deadline = time.perf_counter() + FILL_SLICE_SECONDS
+        while self.pending_fill:
+            widget = self.category_widgets.get(self.pending_fill.pop())
+            if widget is not None and not widget.is_collapsed:
+                widget.ensure_populated()
+            if time.perf_counter() >= deadline:
+                return
+        self.fill_timer.stop()
+
+    def showEvent(self, event):
+        """
+        Restore the scroll positions on the first show and build only the
+        categories in view, before the first paint.
+        """
+        super().showEvent(event)
+        if self.session_restored:
+            return
+        self.session_restored = True
+        self.restore_scroll()
+        if self.bookmark_model is None:
+            self.update_materialization()
+            if not self.config.get("release_offscreen_categories", False):
+                # Nearest first; popped from the end
+                widgets = sorted((widget for widget in self.category_widgets.values()
+                                  if not widget.is_collapsed and not widget.is_populated),
+                                 key=lambda widget: -widget.mapTo(self.scroll_widget, QPoint(0, 0)).y())
+                self.pending_fill = [widget.category for widget in widgets]
+        self.defer_population = False
+
+    def hideEvent(self, event):
+        """Save the session when the window is hidden to the tray or closed."""
+        super().hideEvent(event)
+        if self.session_restored:
+            self.save_session()
+
+    def apply_config(self, config: Dict[str, Any]):
+        """
+        Switch to a changed configuration without rebuilding the window.
+
+        The configuration dictionary is updated in place, so code reading it
+        later sees the new values; keys missing from ``config`` keep their
+        values. ``config_changed`` is emitted with the set of changed keys.
+        """
+        changed = {key for key in config if config[key] != self.config.get(key)}
+        if not changed:
+            return
+        self.config.update(config)
+
+        if "button_width" in changed:
+            width = self.config["button_width"]
+            for button in self.site_buttons.values():
+                button.setFixedWidth(width)
+            for view in self.bookmark_views:
+                view.set_button_width(width)
+            self.schedule_reflow()
+        if changed.intersection(WINDOW_SIZE_SETTINGS):
+            self.adjust_window_size()
+        if "search_debounce_ms" in changed:
+            self.search_timer.setInterval(self.config.get("search_debounce_ms", 150))
+        if "search_limit" in changed:
+            self.filter_bookmarks(self.search_input.text())
+        if "open_batch_size" in changed:
+            self.url_opener.batch_size = self.config.get("open_batch_size", DEFAULT_BATCH_SIZE)
+        if "open_batch_interval_ms" in changed:
+            self.url_opener.set_batch_interval(
+                self.config.get("open_batch_interval_ms", DEFAULT_BATCH_INTERVAL_MS))
+        if "link_check_cache_ttl" in changed:
+            self.link_cache.ttl = self.config.get("link_check_cache_ttl", 3600)
+        if "fetch_favicons" in changed:
+            self.request_favicons(site.url for _, site in self.all_bookmarks() if self.wants_favicon(site))
+        if "sort_by_usage" in changed:
+            for category in self.bookmarks:
+                self.sync_category(category)
+        if changed.intersection(("most_used_count", "button_width")):
+            self.refresh_most_used()
+
+        restart = sorted(changed.intersection(RESTART_SETTINGS))
+        if restart:
+            logger.info(f"Settings {', '.join(restart)} take effect after a restart")
+        logger.info(f"Applied changed settings: {', '.join(sorted(changed))}")
+        self.config_changed.emit(changed)
+
+    def resizeEvent(self, event):
+        """Rebalance the columns once the new width is known."""
+        super().resizeEvent(event)
+        self.reflow_timer.start()
+
+    def paintEvent(self, event):
+        """Record when the window is painted for the first time."""
+        if not self.painted:
+            self.painted = True
+            metrics.record_since_start("startup.first_paint")
+            if self.pending_fill:
+                self.fill_timer.start()
+        super().paintEvent(event)
 
     def closeEvent(self, event: QCloseEvent):
         """
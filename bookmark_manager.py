@@ -1,22 +1,277 @@
+"""
+Loading of the persistent bookmark data.
+
+Bookmarks are stored in an SQLite database next to the portable executable.
+On the first launch the database is filled from the built-in bookmarks in
+``sity_list.py`` and from a legacy ``bookmarks.json`` if one exists. Later
+launches read a binary snapshot of the data instead of querying the database,
+as long as the snapshot still matches it. Visit statistics used for ranking
+search results live in a separate ``visits.db``. Changes other processes
+commit to the database are merged into the running store by ``reload_bookmarks``.
+"""
+
 import sys
-import json
 import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+import sity_list
+from sity_list import Bookmark, BookmarkStore, DEFAULT_BOOKMARKS
+from bookmark_storage import BookmarkDatabase
+from bookmark_snapshot import read_snapshot, write_snapshot, is_snapshot_current
+from lazy_logger import get_logger
+
+logger = get_logger(__name__)
+
+DATABASE_NAME = 'bookmarks.db'
+SNAPSHOT_NAME = 'bookmarks.snapshot'
+VISITS_NAME = 'visits.db'
+VISITS_LOG_NAME = 'visits.log'
+
+def get_data_dir() -> Path:
+    """Return the directory for writable data: next to the executable when frozen."""
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).resolve().parent
+    return Path(__file__).resolve().parent
+
+def data_path(path: str) -> str:
+    """Resolve a path stored relative to the data directory, such as ``Bookmark.icon``."""
+    if os.path.isabs(path):
+        return path
+    return str(get_data_dir() / path)
+
+def parse_legacy_bookmarks(text: str) -> Dict[str, List[Bookmark]]:
+    """
+    Parse the content of a legacy bookmarks file.
+
+    Besides plain JSON (lists of objects or of [name, url, icon] arrays), the file
+    may contain ``Bookmark(name=..., url=..., icon=...)`` expressions, possibly
+    mixed with objects. Those are read from the syntax tree; nothing in the file
+    is executed.
 
-def load_bookmarks():
+    Raises:
+        ValueError: If the content cannot be interpreted as bookmark data
+    """
+    import ast
+    import json
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+    if data is not None:
+        try:
+            return {category: [Bookmark(**item) if isinstance(item, dict) else Bookmark(*item)
+                               for item in items]
+                    for category, items in data.items()}
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"Invalid bookmarks file: {e}")
+
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid bookmarks file: {e}")
+    if not isinstance(tree.body, ast.Dict):
+        raise ValueError("Invalid bookmarks file: expected a dictionary of categories")
+
+    result: Dict[str, List[Bookmark]] = {}
+    for key, value in zip(tree.body.keys, tree.body.values):
+        category = ast.literal_eval(key)
+        if not isinstance(value, ast.List):
+            raise ValueError(f"Invalid bookmarks file: category {category!r} is not a list")
+        result[category] = []
+        for entry in value.elts:
+            result[category].append(_parse_legacy_entry(entry))
+    return result
+
+def _parse_legacy_entry(entry: 'ast.expr') -> Bookmark:
+    import ast
+    if isinstance(entry, ast.Call) and isinstance(entry.func, ast.Name) and entry.func.id == 'Bookmark':
+        args = [ast.literal_eval(arg) for arg in entry.args]
+        kwargs = {kw.arg: ast.literal_eval(kw.value) for kw in entry.keywords}
+        return Bookmark(*args, **kwargs)
+    try:
+        value = ast.literal_eval(entry)
+    except ValueError:
+        raise ValueError("Invalid bookmarks file: unsupported bookmark entry")
+    if isinstance(value, dict):
+        return Bookmark(**value)
+    return Bookmark(*value)
+
+def load_legacy_bookmarks() -> Dict[str, List[Bookmark]]:
+    """Read the legacy bookmarks.json, returning an empty dict if it is missing or invalid."""
     if getattr(sys, 'frozen', False):
         bookmarks_path = os.path.join(sys._MEIPASS, 'bookmarks.json')
     else:
         bookmarks_path = 'bookmarks.json'
     try:
         with open(bookmarks_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            print("Loaded bookmarks:", data)  # Для отладки
-            return data
+            return parse_legacy_bookmarks(file.read())
     except FileNotFoundError:
-        print("Bookmarks file not found. Returning empty dictionary.")
         return {}
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
+    except ValueError as e:
+        logger.error(f"Error reading {bookmarks_path}: {e}")
         return {}
 
-bookmarks = load_bookmarks()
+def initial_bookmarks() -> BookmarkStore:
+    """Combine the built-in bookmarks with entries found only in the legacy file."""
+    store = BookmarkStore(DEFAULT_BOOKMARKS)
+    for category, category_bookmarks in load_legacy_bookmarks().items():
+        store.add_category(category)
+        for bookmark in category_bookmarks:
+            if store.find(category, bookmark.name) is None:
+                store.add(category, bookmark)
+    return store
+
+def load_bookmarks(store: Optional[BookmarkStore] = None,
+                   db_path: Optional[Path] = None, compact: bool = False) -> BookmarkStore:
+    """
+    Load bookmarks and attach the database to the store for write-through.
+
+    The content comes from the binary snapshot when it is current, otherwise it
+    is read from the database.
+
+    Args:
+        store: Store to fill, the shared ``sity_list.bookmarks`` by default
+        db_path: Database location, ``bookmarks.db`` in the data directory by default
+        compact: Replace the shared store with a ``CompactBookmarkStore`` first;
+            ignored when ``store`` is given
+
+    Returns:
+        The filled store. If the database cannot be opened, the store keeps its
+        built-in content and changes are not saved.
+    """
+    if store is None and compact:
+        from compact_store import CompactBookmarkStore
+        if not isinstance(sity_list.bookmarks, CompactBookmarkStore):
+            sity_list.bookmarks = CompactBookmarkStore(sity_list.bookmarks)
+    store = store if store is not None else sity_list.bookmarks
+    db_path = db_path or get_data_dir() / DATABASE_NAME
+    snapshot_path = db_path.with_name(SNAPSHOT_NAME)
+    try:
+        db = BookmarkDatabase(db_path)
+        snapshot = read_snapshot(snapshot_path, db_path) if db.is_migrated else None
+        if snapshot is not None:
+            store.reset(snapshot.bookmarks, snapshot.search_keys)
+        else:
+            if not db.is_migrated:
+                db.migrate(initial_bookmarks())
+            store.reset(db.load())
+            logger.info("Bookmark snapshot is missing or stale, loaded bookmarks from the database")
+        store.backend = db
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open bookmark database {db_path}, changes will not be saved: {e}")
+    return store
+
+def apply_bookmark_delta(store: BookmarkStore, data: Mapping[str, List[Bookmark]]) -> None:
+    """
+    Change the store to hold ``data``, touching only the bookmarks that differ.
+
+    Bookmarks that are new, changed or gone are added, updated or removed;
+    a category whose order changed is re-added in the new order. New
+    categories are created. The store has no category removal, so a category
+    missing from ``data`` is only emptied.
+    """
+    with store.batch():
+        for category in store:
+            if category not in data:
+                for bookmark in store[category]:
+                    store.remove(category, bookmark.name)
+        for category, wanted in data.items():
+            current = store.get(category)
+            if current is None:
+                store.add_category(category)
+                current = []
+            if current == wanted:
+                continue
+            wanted_by_name = {bookmark.name: bookmark for bookmark in wanted}
+            for bookmark in current:
+                if bookmark.name not in wanted_by_name:
+                    store.remove(category, bookmark.name)
+            kept = [bookmark.name for bookmark in current if bookmark.name in wanted_by_name]
+            if kept != [bookmark.name for bookmark in wanted][:len(kept)]:
+                for name in kept:
+                    store.remove(category, name)
+            for bookmark in wanted:
+                store.add(category, bookmark)
+
+def reload_bookmarks(store: Optional[BookmarkStore] = None) -> bool:
+    """
+    Merge changes other processes committed to the attached database into the store.
+
+    The delta is applied without writing it back, and subscribers receive it as
+    one ChangeSet.
+
+    Returns:
+        True if the database had changed
+    """
+    store = store if store is not None else sity_list.bookmarks
+    db = store.backend
+    if db is None or not db.has_external_changes():
+        return False
+    data = db.load()
+    store.backend = None
+    try:
+        apply_bookmark_delta(store, data)
+    finally:
+        store.backend = db
+    logger.info(f"Reloaded bookmarks changed outside the application from {db.path}")
+    return True
+
+def close_bookmarks(store: Optional[BookmarkStore] = None) -> None:
+    """Close the database attached to the store and refresh the snapshot if needed."""
+    store = store if store is not None else sity_list.bookmarks
+    db = store.backend
+    if db is None:
+        return
+    store.backend = None
+    db.close()
+    snapshot_path = db.path.with_name(SNAPSHOT_NAME)
+    try:
+        if not is_snapshot_current(snapshot_path, db.path):
+            write_snapshot(snapshot_path, store, db.path)
+    except OSError as e:
+        logger.warning(f"Failed to write bookmark snapshot {snapshot_path}: {e}")
+
+def load_frecency(db_path: Optional[Path] = None) -> 'FrecencyTracker':
+    """
+    Load the visit statistics and attach the visit log for recording.
+
+    Visits logged since the last compaction are replayed and compacted into
+    the database.
+
+    Args:
+        db_path: Database location, ``visits.db`` in the data directory by default;
+            the log ``visits.log`` lives next to it
+
+    Returns:
+        The tracker. If the database cannot be opened, visits are only kept in memory.
+    """
+    from frecency import FrecencyTracker, VisitDatabase, VisitLog
+    db_path = db_path or get_data_dir() / VISITS_NAME
+    try:
+        db = VisitDatabase(db_path)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open visit database {db_path}, visits will not be saved: {e}")
+        return FrecencyTracker()
+    tracker = FrecencyTracker(db.load())
+    log = VisitLog(db_path.with_name(VISITS_LOG_NAME), db)
+    try:
+        replayed = log.replay(tracker)
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Failed to read visit log {log.path}, visits will not be saved: {e}")
+        db.close()
+        return tracker
+    if replayed:
+        logger.info(f"Compacted {replayed} logged visits into {db_path}")
+    tracker.backend = log
+    return tracker
+
+def close_frecency(tracker: 'FrecencyTracker') -> None:
+    """Compact the visit log attached to a frecency tracker and close it."""
+    log = tracker.backend
+    if log is not None:
+        tracker.backend = None
+        try:
+            log.close()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Failed to compact visit log: {e}")
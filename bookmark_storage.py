@@ -0,0 +1,187 @@
+"""
+Durable SQLite storage for bookmarks.
+
+The database runs in WAL mode and every mutation is written as its own small
+transaction, so changes survive restarts without rewriting the whole data set.
+A ``BookmarkDatabase`` can be attached to a ``BookmarkStore`` as its backend;
+the store then writes every add, update and remove through to the database.
+Changes committed through other connections are reported by
+``has_external_changes``.
+
+Example:
+    >>> db = BookmarkDatabase('bookmarks.db')
+    >>> db.add('ИИ', Bookmark(name='ChatGPT', url='https://chat.openai.com'))
+    >>> db.load()
+    {'ИИ': [Bookmark(name='ChatGPT', url='https://chat.openai.com', icon='')]}
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Mapping, Union
+from sity_list import Bookmark
+from lazy_logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bookmarks (
+    id INTEGER PRIMARY KEY,
+    category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    icon TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL,
+    UNIQUE (category_id, name)
+);
+CREATE INDEX IF NOT EXISTS bookmarks_url ON bookmarks(url);
+CREATE INDEX IF NOT EXISTS bookmarks_position ON bookmarks(category_id, position);
+"""
+
+class BookmarkDatabase:
+    """SQLite-backed bookmark storage with one transaction per mutation."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self._batch_depth = 0
+        self._data_version = self._current_data_version()
+
+    def _current_data_version(self) -> int:
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def has_external_changes(self) -> bool:
+        """
+        Return True if another connection committed changes since the last call.
+
+        SQLite's ``data_version`` only moves on commits of other connections,
+        so writes through this object never count.
+        """
+        if self._batch_depth:
+            return False
+        version = self._current_data_version()
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+    @contextmanager
+    def batch(self):
+        """
+        Run several mutations in one transaction.
+
+        Mutations that completed are committed when the outermost batch ends,
+        even if it ends with an exception, so the database always matches the
+        in-memory store that writes through to it.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.connection.commit()
+
+    @contextmanager
+    def _transaction(self):
+        if self._batch_depth:
+            yield
+        else:
+            with self.connection:
+                yield
+
+    @property
+    def is_migrated(self) -> bool:
+        """True once the initial data has been imported into this database."""
+        return self.connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+    def load(self) -> Dict[str, List[Bookmark]]:
+        """Read all categories and bookmarks in their stored order."""
+        result: Dict[str, List[Bookmark]] = {}
+        for (name,) in self.connection.execute(
+                "SELECT name FROM categories ORDER BY position"):
+            result[name] = []
+        rows = self.connection.execute(
+            "SELECT c.name, b.name, b.url, b.icon FROM bookmarks b "
+            "JOIN categories c ON c.id = b.category_id "
+            "ORDER BY c.position, b.position")
+        for category, name, url, icon in rows:
+            result[category].append(Bookmark(name=name, url=url, icon=icon))
+        return result
+
+    def migrate(self, data: Mapping[str, List[Bookmark]]) -> None:
+        """
+        Import the initial bookmark data in a single transaction.
+
+        Does nothing if the database has already been migrated.
+        """
+        if self.is_migrated:
+            return
+        with self.connection:
+            for category, category_bookmarks in data.items():
+                category_id = self._category_id(category)
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO bookmarks (category_id, name, url, icon, position) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(category_id, b.name, b.url, b.icon, position)
+                     for position, b in enumerate(category_bookmarks)])
+            self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        logger.info(f"Migrated {len(data)} bookmark categories to {self.path}")
+
+    def add_category(self, category: str) -> None:
+        """Create an empty category if it does not exist yet."""
+        with self._transaction():
+            self._category_id(category)
+
+    def add(self, category: str, bookmark: Bookmark) -> None:
+        """Insert a bookmark at the end of its category, or replace it in place."""
+        with self._transaction():
+            category_id = self._category_id(category)
+            self.connection.execute(
+                "INSERT INTO bookmarks (category_id, name, url, icon, position) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 "
+                "FROM bookmarks WHERE category_id = ?)) "
+                "ON CONFLICT (category_id, name) DO UPDATE SET url = excluded.url, icon = excluded.icon",
+                (category_id, bookmark.name, bookmark.url, bookmark.icon, category_id))
+
+    def update(self, category: str, old_name: str, bookmark: Bookmark) -> None:
+        """Replace a bookmark, keeping its position."""
+        with self._transaction():
+            self.connection.execute(
+                "UPDATE bookmarks SET name = ?, url = ?, icon = ? "
+                "WHERE category_id = (SELECT id FROM categories WHERE name = ?) AND name = ?",
+                (bookmark.name, bookmark.url, bookmark.icon, category, old_name))
+
+    def remove(self, category: str, name: str) -> None:
+        """Delete a bookmark."""
+        with self._transaction():
+            self.connection.execute(
+                "DELETE FROM bookmarks "
+                "WHERE category_id = (SELECT id FROM categories WHERE name = ?) AND name = ?",
+                (category, name))
+
+    def _category_id(self, category: str) -> int:
+        row = self.connection.execute(
+            "SELECT id FROM categories WHERE name = ?", (category,)).fetchone()
+        if row is not None:
+            return row[0]
+        cursor = self.connection.execute(
+            "INSERT INTO categories (name, position) "
+            "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM categories))",
+            (category,))
+        return cursor.lastrowid
@@ -0,0 +1,378 @@
+"""
+Three-way merge of the bookmarks of two portable copies.
+
+Every bookmark has a content hash over its name, URL and icon, and every
+category a hash over the sorted (name, bookmark hash) pairs of its bookmarks,
+Merkle-style. Comparing two copies only looks inside categories whose hashes
+differ. If one side still matches the common ancestor, the whole category is
+taken from the other side. Only if both sides changed a category are its
+bookmarks merged one by one against the ancestor.
+
+The ancestor is the merged result of the previous sync of the same two copies.
+It is recorded in both data directories (``sync/<copy id>.json``, named after
+the other copy), and is only used if both records agree. Without one, the
+merge falls back to a union in which differing bookmarks are conflicts.
+
+Bookmarks are identified by category and name. The order within a category
+is not synchronized, and categories are never deleted, only emptied, as the
+store has no category removal. Icon files with relative paths are copied
+along if the receiving copy lacks them.
+
+Example:
+    >>> remote = load_copy(Path('E:/PortableBrowser'))
+    >>> plan = plan_sync(ContentHashes(local), ContentHashes(remote),
+    ...                  read_ancestor(local_dir, remote_dir))
+    >>> plan = resolve_conflicts(plan, {key: LOCAL for key in plan.conflict_keys()})
+    >>> apply_plan(plan, local, remote, local_dir, remote_dir)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from sity_list import Bookmark, BookmarkStore, ChangeSet
+
+logger = logging.getLogger(__name__)
+
+SYNC_DIR = 'sync'
+COPY_ID_NAME = 'id'
+LOCAL = 'local'
+REMOTE = 'remote'
+
+BookmarkKey = Tuple[str, str]
+# (category, name, new bookmark); None removes the bookmark
+Change = Tuple[str, str, Optional[Bookmark]]
+
+def bookmark_hash(bookmark: Bookmark) -> bytes:
+    return hashlib.blake2b(f"{bookmark.name}\0{bookmark.url}\0{bookmark.icon}".encode('utf-8'),
+                           digest_size=16).digest()
+
+def category_hash(category: str, hashes: Mapping[str, bytes]) -> bytes:
+    """Hash a category from the hashes of its bookmarks, independent of their order."""
+    digest = hashlib.blake2b(category.encode('utf-8'), digest_size=16)
+    for name in sorted(hashes):
+        digest.update(hashes[name])
+    return digest.digest()
+
+class ContentHashes:
+    """
+    Bookmark and category hashes of a store.
+
+    Hashes are computed when first needed. A subscription to the store drops
+    the hashes of the categories a change touches.
+    """
+
+    def __init__(self, data: Mapping[str, List[Bookmark]]):
+        self.data = data
+        self._bookmarks: Dict[str, Dict[str, bytes]] = {}
+        self._categories: Dict[str, bytes] = {}
+        if isinstance(data, BookmarkStore):
+            data.subscribe(self._invalidate)
+
+    def close(self) -> None:
+        """Stop following the changes of the store."""
+        if isinstance(self.data, BookmarkStore):
+            self.data.unsubscribe(self._invalidate)
+
+    def _invalidate(self, changes: ChangeSet) -> None:
+        for category in changes.categories:
+            self._bookmarks.pop(category, None)
+            self._categories.pop(category, None)
+
+    def categories(self) -> List[str]:
+        return list(self.data)
+
+    def bookmark_hashes(self, category: str) -> Dict[str, bytes]:
+        """Return the hashes of a category's bookmarks by name; empty if it does not exist."""
+        hashes = self._bookmarks.get(category)
+        if hashes is None:
+            hashes = {bookmark.name: bookmark_hash(bookmark) for bookmark in self.data.get(category, [])}
+            if category in self.data:
+                self._bookmarks[category] = hashes
+        return hashes
+
+    def category_hash(self, category: str) -> Optional[bytes]:
+        """Return the hash of a category, or None if it does not exist."""
+        if category not in self.data:
+            return None
+        digest = self._categories.get(category)
+        if digest is None:
+            digest = self._categories[category] = category_hash(category, self.bookmark_hashes(category))
+        return digest
+
+    def root_hash(self) -> str:
+        """Hash of the whole content, e.g. to check that two copies agree."""
+        digest = hashlib.blake2b(digest_size=16)
+        for category in sorted(self.data):
+            digest.update(self.category_hash(category))
+        return digest.hexdigest()
+
+    def find(self, category: str, name: str) -> Optional[Bookmark]:
+        if isinstance(self.data, BookmarkStore):
+            return self.data.find(category, name)
+        return next((bookmark for bookmark in self.data.get(category, []) if bookmark.name == name), None)
+
+class Conflict(NamedTuple):
+    """A bookmark both copies changed differently since the ancestor; None means absent."""
+    category: str
+    name: str
+    base: Optional[Bookmark]
+    local: Optional[Bookmark]
+    remote: Optional[Bookmark]
+
+class SyncPlan(NamedTuple):
+    """
+    Changes that bring two copies together.
+
+    ``local`` and ``remote`` list the changes to apply to the local and the
+    remote copy, ``local_categories`` and ``remote_categories`` the categories
+    to create there. ``compared`` holds the categories whose hashes differed.
+    """
+    local: List[Change]
+    remote: List[Change]
+    local_categories: List[str]
+    remote_categories: List[str]
+    conflicts: List[Conflict]
+    compared: List[str]
+
+    def conflict_keys(self) -> List[BookmarkKey]:
+        return [(conflict.category, conflict.name) for conflict in self.conflicts]
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.local or self.remote or self.local_categories
+                    or self.remote_categories or self.conflicts)
+
+def _take(category: str, source: ContentHashes, target: ContentHashes) -> List[Change]:
+    """Changes that make ``target``'s category equal to ``source``'s."""
+    wanted = source.bookmark_hashes(category)
+    current = target.bookmark_hashes(category)
+    changes: List[Change] = [(category, name, None) for name in current if name not in wanted]
+    changes += [(category, name, source.find(category, name)) for name, digest in wanted.items()
+                if current.get(name) != digest]
+    return changes
+
+def plan_sync(local: ContentHashes, remote: ContentHashes,
+              base: Optional[ContentHashes] = None) -> SyncPlan:
+    """
+    Compare two copies against their common ancestor.
+
+    Args:
+        local: Hashes of the local copy
+        remote: Hashes of the other copy
+        base: Hashes of the common ancestor, None if there is none
+
+    Returns:
+        The changes for both sides and the conflicts; changes of conflicting
+        bookmarks are not included
+    """
+    plan = SyncPlan([], [], [], [], [], [])
+    categories = dict.fromkeys(local.categories())
+    categories.update(dict.fromkeys(remote.categories()))
+    for category in categories:
+        local_hash = local.category_hash(category)
+        remote_hash = remote.category_hash(category)
+        if local_hash == remote_hash:
+            continue
+        plan.compared.append(category)
+        if local_hash is None:
+            plan.local_categories.append(category)
+        if remote_hash is None:
+            plan.remote_categories.append(category)
+        base_hash = base.category_hash(category) if base is not None else None
+        if base is not None and local_hash == base_hash:
+            plan.local.extend(_take(category, remote, local))
+            continue
+        if base is not None and remote_hash == base_hash:
+            plan.remote.extend(_take(category, local, remote))
+            continue
+
+        local_hashes = local.bookmark_hashes(category)
+        remote_hashes = remote.bookmark_hashes(category)
+        base_hashes = base.bookmark_hashes(category) if base is not None else {}
+        names = dict.fromkeys(local_hashes)
+        names.update(dict.fromkeys(remote_hashes))
+        for name in names:
+            local_digest = local_hashes.get(name)
+            remote_digest = remote_hashes.get(name)
+            if local_digest == remote_digest:
+                continue
+            base_digest = base_hashes.get(name)
+            if base is not None and local_digest == base_digest:
+                plan.local.append((category, name, remote.find(category, name)))
+            elif base is not None and remote_digest == base_digest:
+                plan.remote.append((category, name, local.find(category, name)))
+            elif base is None and local_digest is None:
+                plan.local.append((category, name, remote.find(category, name)))
+            elif base is None and remote_digest is None:
+                plan.remote.append((category, name, local.find(category, name)))
+            else:
+                plan.conflicts.append(Conflict(
+                    category, name, base.find(category, name) if base is not None else None,
+                    local.find(category, name), remote.find(category, name)))
+    return plan
+
+def resolve_conflicts(plan: SyncPlan, choices: Mapping[BookmarkKey, str]) -> SyncPlan:
+    """
+    Turn chosen conflicts into changes.
+
+    Args:
+        choices: ``LOCAL`` or ``REMOTE`` by (category, name), the version to keep;
+            conflicts without a choice stay unresolved
+
+    Returns:
+        A plan with the chosen versions added to the changes of the other side
+    """
+    local, remote, conflicts = list(plan.local), list(plan.remote), []
+    for conflict in plan.conflicts:
+        choice = choices.get((conflict.category, conflict.name))
+        if choice == LOCAL:
+            remote.append((conflict.category, conflict.name, conflict.local))
+        elif choice == REMOTE:
+            local.append((conflict.category, conflict.name, conflict.remote))
+        else:
+            conflicts.append(conflict)
+    return plan._replace(local=local, remote=remote, conflicts=conflicts)
+
+def apply_changes(store: BookmarkStore, categories: Iterable[str], changes: Iterable[Change]) -> None:
+    """Apply sync changes to a store in one batch."""
+    with store.batch():
+        for category in categories:
+            store.add_category(category)
+        for category, name, bookmark in changes:
+            if bookmark is None:
+                store.remove(category, name)
+            else:
+                store.add(category, bookmark)
+
+def copy_icons(changes: Iterable[Change], source_dir: Path, target_dir: Path) -> int:
+    """
+    Copy the relative icon files of changed bookmarks that the target copy lacks.
+
+    Returns:
+        The number of copied files
+    """
+    copied = 0
+    for _, _, bookmark in changes:
+        if bookmark is None or not bookmark.icon or os.path.isabs(bookmark.icon):
+            continue
+        source, target = source_dir / bookmark.icon, target_dir / bookmark.icon
+        if target.exists() or not source.is_file():
+            continue
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+            copied += 1
+        except OSError as e:
+            logger.warning(f"Failed to copy icon {source} to {target}: {e}")
+    return copied
+
+def copy_id(data_dir: Path) -> str:
+    """Return the identifier of a portable copy, creating it on first use."""
+    path = Path(data_dir) / SYNC_DIR / COPY_ID_NAME
+    try:
+        identifier = path.read_text(encoding='utf-8').strip()
+        if identifier:
+            return identifier
+    except FileNotFoundError:
+        pass
+    identifier = uuid.uuid4().hex
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(identifier, encoding='utf-8')
+    return identifier
+
+def _ancestor_path(data_dir: Path, peer_dir: Path) -> Path:
+    return Path(data_dir) / SYNC_DIR / f"{copy_id(peer_dir)}.json"
+
+def _read_ancestor_file(path: Path) -> Optional[Tuple[str, Dict[str, List[Bookmark]]]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        data = {category: [Bookmark(*entry) for entry in entries]
+                for category, entries in record["categories"].items()}
+        return record["root"], data
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"Ignoring unreadable sync ancestor {path}: {e}")
+        return None
+
+def read_ancestor(local_dir: Path, remote_dir: Path) -> Optional[ContentHashes]:
+    """
+    Return the content both copies had after their last sync.
+
+    Returns:
+        None if the copies were never synced, or if their records disagree,
+        e.g. because one of them was restored from an older backup
+    """
+    local = _read_ancestor_file(_ancestor_path(local_dir, remote_dir))
+    remote = _read_ancestor_file(_ancestor_path(remote_dir, local_dir))
+    if local is None or remote is None:
+        return None
+    if local[0] != remote[0]:
+        logger.warning("Sync ancestors of the two copies disagree, merging without one")
+        return None
+    return ContentHashes(local[1])
+
+def write_ancestor(data: Mapping[str, List[Bookmark]], local_dir: Path, remote_dir: Path) -> None:
+    """Record ``data`` as the common ancestor in both copies."""
+    record = {
+        "root": ContentHashes(data).root_hash(),
+        "categories": {category: [list(bookmark) for bookmark in bookmarks]
+                       for category, bookmarks in data.items()},
+    }
+    for path in (_ancestor_path(local_dir, remote_dir), _ancestor_path(remote_dir, local_dir)):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(path.name + '.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(temp, path)
+
+def merged_ancestor(store: Mapping[str, List[Bookmark]], plan: SyncPlan) -> Dict[str, List[Bookmark]]:
+    """
+    Return the content to record as the ancestor after applying a plan.
+
+    Unresolved conflicts keep their old ancestor version, so they are reported
+    again by the next sync.
+    """
+    data = {category: list(bookmarks) for category, bookmarks in store.items()}
+    for conflict in plan.conflicts:
+        bookmarks = [bookmark for bookmark in data.get(conflict.category, [])
+                     if bookmark.name != conflict.name]
+        if conflict.base is not None:
+            bookmarks.append(conflict.base)
+        data[conflict.category] = bookmarks
+    return data
+
+def apply_plan(plan: SyncPlan, local: BookmarkStore, remote: BookmarkStore,
+               local_dir: Path, remote_dir: Path) -> None:
+    """Apply a plan to both copies and record the result as their new ancestor."""
+    copy_icons(plan.local, remote_dir, local_dir)
+    copy_icons(plan.remote, local_dir, remote_dir)
+    apply_changes(local, plan.local_categories, plan.local)
+    apply_changes(remote, plan.remote_categories, plan.remote)
+    write_ancestor(merged_ancestor(local, plan), local_dir, remote_dir)
+    logger.info(f"Synced bookmarks with {remote_dir}: {len(plan.local)} changes here, "
+                f"{len(plan.remote)} there, {len(plan.conflicts)} conflicts left")
+
+def load_copy(data_dir: Path) -> BookmarkStore:
+    """
+    Open the bookmarks of another portable copy for writing.
+
+    Raises:
+        FileNotFoundError: If the directory has no bookmark database
+        sqlite3.Error: If the database cannot be opened
+    """
+    from bookmark_manager import DATABASE_NAME, load_bookmarks
+    db_path = Path(data_dir) / DATABASE_NAME
+    if not db_path.is_file():
+        raise FileNotFoundError(f"No {DATABASE_NAME} in {data_dir}")
+    store = load_bookmarks(BookmarkStore(), db_path)
+    if store.backend is None:
+        import sqlite3
+        raise sqlite3.Error(f"Cannot open {db_path}")
+    return store
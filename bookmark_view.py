@@ -0,0 +1,330 @@
+"""
+Model/view rendering of bookmarks.
+
+Instead of one QPushButton per bookmark, bookmarks are exposed through a
+two-level item model (categories and their bookmarks) and painted by a delegate.
+The views only paint the rows that are currently on screen, so build time and
+memory do not grow with the number of widgets.
+"""
+
+from PyQt5.QtWidgets import (QTreeView, QStyledItemDelegate, QStyleOptionButton,
+                             QStyle, QApplication, QAbstractItemView)
+from PyQt5.QtCore import (QAbstractItemModel, QSortFilterProxyModel, QModelIndex,
+                          QRect, QSize, Qt, pyqtSignal, QPoint)
+from PyQt5.QtGui import QIcon, QColor, QPalette
+import logging
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+from sity_list import Bookmark
+from icon_loader import IconService
+
+logger = logging.getLogger(__name__)
+
+BookmarkRole = Qt.UserRole + 1
+CategoryRole = Qt.UserRole + 2
+
+ROW_HEIGHT = 28
+BROKEN_LINK_COLOR = QColor("#c62828")
+ICON_SIZE = QSize(16, 16)
+
+class BookmarkModel(QAbstractItemModel):
+    """
+    Item model with categories as top-level rows and bookmarks as their children.
+
+    Child indexes store ``category_row + 1`` as their internal id, top-level
+    indexes store 0.
+    """
+
+    def __init__(self, bookmarks: Mapping[str, List[Bookmark]],
+                 icon_service: Optional[IconService] = None, parent=None):
+        super().__init__(parent)
+        self._categories: List[str] = list(bookmarks)
+        self._rows: Dict[str, List[Bookmark]] = {
+            category: list(bookmarks[category]) for category in self._categories}
+        self.icon_service = icon_service or IconService(parent=self)
+        self.link_problems: Dict[str, str] = {}
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        return self.createIndex(row, column, parent.row() + 1)
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, 0)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return len(self._categories)
+        if parent.internalId() == 0:
+            return len(self._rows[self._categories[parent.row()]])
+        return 0
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if index.internalId() == 0:
+            category = self._categories[index.row()]
+            if role in (Qt.DisplayRole, CategoryRole):
+                return category
+            return None
+
+        category = self._categories[index.internalId() - 1]
+        site = self._rows[category][index.row()]
+        if role == Qt.DisplayRole:
+            return site.name
+        if role == Qt.ToolTipRole:
+            problem = self.link_problems.get(site.url)
+            return f"{problem}\n{site.url}" if problem else site.url
+        if role == Qt.ForegroundRole:
+            return BROKEN_LINK_COLOR if site.url in self.link_problems else None
+        if role == Qt.DecorationRole:
+            return self.icon_for(site)
+        if role == BookmarkRole:
+            return site
+        if role == CategoryRole:
+            return category
+        return None
+
+    def icon_for(self, site: Bookmark) -> Optional[QIcon]:
+        """Return the icon of a bookmark, requesting it the first time it is painted."""
+        if not site.icon:
+            return None
+        return self.icon_service.icon(site.icon)
+
+    def has_category(self, category: str) -> bool:
+        """Return True if the category is part of the model."""
+        return category in self._rows
+
+    def category_at(self, row: int) -> str:
+        """Return the category name of a top-level row."""
+        return self._categories[row]
+
+    def bookmark_at(self, category: str, row: int) -> Bookmark:
+        """Return the bookmark stored at a row of a category."""
+        return self._rows[category][row]
+
+    def bookmarks(self, category: str) -> List[Bookmark]:
+        """Return the bookmarks currently shown for a category."""
+        return list(self._rows.get(category, []))
+
+    def set_link_problems(self, problems: Dict[str, str]) -> None:
+        """Mark bookmarks whose URL is a key of ``problems``, with the value as explanation."""
+        self.link_problems = dict(problems)
+        for row, category in enumerate(self._categories):
+            count = len(self._rows[category])
+            if count:
+                parent = self.index(row, 0)
+                self.dataChanged.emit(self.index(0, 0, parent), self.index(count - 1, 0, parent),
+                                      [Qt.ForegroundRole, Qt.ToolTipRole])
+
+    def set_category(self, category: str, sites: List[Bookmark]) -> None:
+        """Replace the bookmarks of a category, adding the category if it is new."""
+        if category not in self._rows:
+            row = len(self._categories)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._categories.append(category)
+            self._rows[category] = []
+            self.endInsertRows()
+
+        parent = self.index(self._categories.index(category), 0)
+        old_rows = self._rows[category]
+        if old_rows:
+            self.beginRemoveRows(parent, 0, len(old_rows) - 1)
+            self._rows[category] = []
+            self.endRemoveRows()
+        if sites:
+            self.beginInsertRows(parent, 0, len(sites) - 1)
+            self._rows[category] = list(sites)
+            self.endInsertRows()
+
+class BookmarkFilterProxy(QSortFilterProxyModel):
+    """Proxy showing one column's categories, optionally limited to search matches."""
+
+    def __init__(self, categories: Set[str], parent=None):
+        super().__init__(parent)
+        self._categories = set(categories)
+        self._matches: Optional[Set[Tuple[str, str]]] = None
+        self._match_categories: Set[str] = set()
+
+    def add_category(self, category: str) -> None:
+        """Show an additional category in this proxy."""
+        self._categories.add(category)
+        self.invalidateFilter()
+
+    def categories(self) -> Set[str]:
+        return set(self._categories)
+
+    def set_categories(self, categories: Set[str]) -> None:
+        """Show exactly the given categories in this proxy."""
+        if categories != self._categories:
+            self._categories = set(categories)
+            self.invalidateFilter()
+
+    def set_matches(self, matches: Optional[Set[Tuple[str, str]]]) -> None:
+        """
+        Limit the visible bookmarks to the given (category, name) keys.
+
+        Args:
+            matches: Keys to show, or None to show everything
+        """
+        self._matches = matches
+        self._match_categories = {category for category, _ in matches or ()}
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        model = self.sourceModel()
+        if not source_parent.isValid():
+            category = model.category_at(source_row)
+            if category not in self._categories:
+                return False
+            return self._matches is None or category in self._match_categories
+        if self._matches is None:
+            return True
+        category = model.category_at(source_parent.row())
+        return (category, model.bookmark_at(category, source_row).name) in self._matches
+
+class BookmarkDelegate(QStyledItemDelegate):
+    """Paints category rows as bold headers and bookmark rows as push buttons."""
+
+    def __init__(self, button_width: int, parent=None):
+        super().__init__(parent)
+        self.button_width = button_width
+
+    def paint(self, painter, option, index: QModelIndex):
+        style = option.widget.style() if option.widget else QApplication.style()
+        if not index.parent().isValid():
+            painter.save()
+            font = painter.font()
+            font.setBold(True)
+            painter.setFont(font)
+            arrow = "▼" if option.state & QStyle.State_Open else "▶"
+            painter.drawText(option.rect, Qt.AlignLeft | Qt.AlignVCenter,
+                             f"{arrow} {index.data()}")
+            painter.setPen(option.palette.mid().color())
+            painter.drawLine(option.rect.bottomLeft(), option.rect.bottomRight())
+            painter.restore()
+            return
+
+        button = QStyleOptionButton()
+        button.rect = QRect(option.rect.left(), option.rect.top() + 1,
+                            min(self.button_width, option.rect.width()),
+                            option.rect.height() - 2)
+        button.text = index.data()
+        button.icon = index.data(Qt.DecorationRole) or QIcon()
+        button.iconSize = ICON_SIZE
+        button.palette = option.palette
+        color = index.data(Qt.ForegroundRole)
+        if color is not None:
+            button.palette = QPalette(option.palette)
+            button.palette.setColor(QPalette.ButtonText, color)
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        if option.state & QStyle.State_MouseOver:
+            button.state |= QStyle.State_MouseOver
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def sizeHint(self, option, index: QModelIndex) -> QSize:
+        return QSize(self.button_width, ROW_HEIGHT)
+
+class BookmarkView(QTreeView):
+    """
+    Virtualized view over one column of categories.
+
+    Signals:
+        bookmark_activated(str, Bookmark): A bookmark row was clicked
+        bookmark_menu_requested(QPoint, str, Bookmark): Context menu requested
+            at the given global position
+        category_menu_requested(QPoint, str): Context menu requested on a category row
+        category_toggled(str, bool): A category was collapsed (True) or expanded
+    """
+
+    bookmark_activated = pyqtSignal(str, Bookmark)
+    bookmark_menu_requested = pyqtSignal(QPoint, str, Bookmark)
+    category_menu_requested = pyqtSignal(QPoint, str)
+    category_toggled = pyqtSignal(str, bool)
+
+    def __init__(self, model: BookmarkModel, categories: Set[str], button_width: int, parent=None):
+        super().__init__(parent)
+        self.proxy = BookmarkFilterProxy(categories, self)
+        self.proxy.setSourceModel(model)
+        self.setModel(self.proxy)
+        self.setItemDelegate(BookmarkDelegate(button_width, self))
+
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.setIndentation(0)
+        self.setMouseTracking(True)
+        self.setExpandsOnDoubleClick(False)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setFrameShape(QTreeView.NoFrame)
+        self.viewport().setAutoFillBackground(False)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+
+        self.collapsed_categories: Set[str] = set()
+        self.clicked.connect(self._on_clicked)
+        self.customContextMenuRequested.connect(self._on_context_menu)
+        self.proxy.rowsInserted.connect(lambda parent, *_: self.restore_expansion()
+                                        if not parent.isValid() else None)
+        self.proxy.layoutChanged.connect(self.restore_expansion)
+        model.icon_service.icon_ready.connect(lambda _: self.viewport().update())
+        self.restore_expansion()
+
+    def set_button_width(self, width: int) -> None:
+        """Change the width of the bookmark buttons."""
+        self.itemDelegate().button_width = width
+        self.scheduleDelayedItemsLayout()
+        self.viewport().update()
+
+    def set_matches(self, matches: Optional[Set[Tuple[str, str]]]) -> None:
+        """Filter the view to the given (category, name) keys, or None for all."""
+        self.proxy.set_matches(matches)
+        self.restore_expansion()
+
+    def set_categories(self, categories: Set[str], collapsed: Set[str]) -> None:
+        """Show another set of categories, of which ``collapsed`` start collapsed."""
+        self.collapsed_categories = set(collapsed)
+        self.proxy.set_categories(categories)
+        self.restore_expansion()
+
+    def restore_expansion(self) -> None:
+        """Expand every category row that the user has not collapsed."""
+        for row in range(self.proxy.rowCount()):
+            index = self.proxy.index(row, 0)
+            self.setExpanded(index, index.data(CategoryRole) not in self.collapsed_categories)
+
+    def _on_clicked(self, index: QModelIndex) -> None:
+        if not index.parent().isValid():
+            category = index.data(CategoryRole)
+            collapsed = self.isExpanded(index)
+            if collapsed:
+                self.collapsed_categories.add(category)
+            else:
+                self.collapsed_categories.discard(category)
+            self.setExpanded(index, not collapsed)
+            self.category_toggled.emit(category, collapsed)
+            return
+        self.bookmark_activated.emit(index.data(CategoryRole), index.data(BookmarkRole))
+
+    def _on_context_menu(self, pos: QPoint) -> None:
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        if index.parent().isValid():
+            self.bookmark_menu_requested.emit(self.viewport().mapToGlobal(pos),
+                                              index.data(CategoryRole),
+                                              index.data(BookmarkRole))
+        else:
+            self.category_menu_requested.emit(self.viewport().mapToGlobal(pos),
+                                              index.data(CategoryRole))
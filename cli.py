@@ -0,0 +1,238 @@
+"""
+Command-line queries without starting the graphical interface.
+
+``python main.py --search git`` and friends answer straight from the bookmark
+data: this module and everything it imports are free of Qt, so a query costs
+little more than the interpreter startup and reading the bookmark snapshot.
+URLs are opened with the standard ``webbrowser`` module and the visit is
+recorded for frecency ranking like a click in the window.
+
+If the window is already running (``"single_instance": true``), the query is
+forwarded to it and answered from its loaded bookmarks instead; the output
+and exit status are the same.
+
+Commands:
+    --list [CATEGORY]   categories, or the bookmarks of one category
+    --search QUERY      bookmarks matching a query (ranked in ``"search_mode": "ranked"``)
+    --open QUERY        open the bookmark with this name, or the best match
+    --metrics           latency histograms of the running window (see ``metrics``)
+
+``--json`` prints machine-readable output instead of tab-separated lines. The
+exit status is 0 on success, 1 if nothing matched or the browser failed to
+start, 2 on invalid arguments.
+
+Example:
+    $ python main.py --open github
+    Учеба	GitHub	https://github.com
+    $ python main.py --search mail --json
+    [{"category": "Почта", "name": "Gmail", "url": "https://mail.google.com", "icon": "icons/gmail.png"}, ...]
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, TextIO, Tuple
+from sity_list import Bookmark, normalize_key
+from lazy_logger import get_logger
+
+logger = get_logger(__name__)
+
+CLI_COMMANDS = ("--list", "--search", "--open", "--metrics")
+
+# Must match single_instance.SERVER_PREFIX, which is not imported unless an instance may be running
+SERVER_PREFIX = "PortableBrowser"
+
+# Opens a bookmark: (category, bookmark, new window) -> success
+SiteOpener = Callable[[str, Bookmark, bool], bool]
+
+def is_cli_request(argv: Sequence[str]) -> bool:
+    """True if the arguments ask for a command-line query instead of the window."""
+    return any(arg.split("=", 1)[0] in CLI_COMMANDS for arg in argv)
+
+def build_parser() -> 'argparse.ArgumentParser':
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py", description="Query bookmarks without opening the window")
+    command = parser.add_mutually_exclusive_group(required=True)
+    command.add_argument("--list", nargs="?", const="", metavar="CATEGORY",
+                         help="List categories, or the bookmarks of CATEGORY")
+    command.add_argument("--search", metavar="QUERY", help="Print bookmarks matching QUERY")
+    command.add_argument("--open", metavar="QUERY", help="Open the bookmark named QUERY, or the best match")
+    command.add_argument("--metrics", action="store_true", help="Print the latency metrics of the running window")
+    parser.add_argument("--category", help="Only consider bookmarks of this category")
+    parser.add_argument("--limit", type=int, help="Maximum number of search results (default: search_limit)")
+    parser.add_argument("--new-window", action="store_true", help="Open the URL in a new browser window")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of tab-separated lines")
+    parser.add_argument("--data-dir", type=Path, help="Directory with bookmarks.db (default: next to the program)")
+    return parser
+
+def bookmark_record(category: str, bookmark: Bookmark) -> Dict[str, str]:
+    return {"category": category, "name": bookmark.name, "url": bookmark.url, "icon": bookmark.icon}
+
+def find_bookmarks(store, query: str, config: Dict[str, Any], frecency=None,
+                   category: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[str, Bookmark]]:
+    """
+    Search bookmarks the way the window's search bar does.
+
+    In ranked mode ``frecency`` boosts often opened sites; otherwise matches
+    come in category order.
+    """
+    limit = limit if limit is not None else config.get("search_limit", 50)
+    data = store if category is None else {category: store.get(category, [])}
+    if config.get("search_mode") == "ranked":
+        from ranked_search import rank_bookmarks
+        return rank_bookmarks(query, data, frecency, limit)
+    if category is None:
+        return store.search(query)[:limit]
+    needle = normalize_key(query)
+    return [(category, bookmark) for bookmark in data[category]
+            if needle in normalize_key(bookmark.name)][:limit]
+
+def resolve_bookmark(store, query: str, frecency=None,
+                     category: Optional[str] = None) -> Optional[Tuple[str, Bookmark]]:
+    """Return the bookmark whose name equals the query ignoring case, else the best ranked match."""
+    categories = list(store) if category is None else [category]
+    key = normalize_key(query)
+    for name in categories:
+        for bookmark in store.get(name, []):
+            if normalize_key(bookmark.name) == key:
+                return name, bookmark
+    from ranked_search import rank_bookmarks
+    data = store if category is None else {category: store.get(category, [])}
+    matches = rank_bookmarks(query, data, frecency, 1)
+    return matches[0] if matches else None
+
+def print_bookmarks(results: List[Tuple[str, Bookmark]], as_json: bool, out: TextIO) -> None:
+    if as_json:
+        print(json.dumps([bookmark_record(category, bookmark) for category, bookmark in results],
+                         ensure_ascii=False), file=out)
+    else:
+        for category, bookmark in results:
+            print(f"{category}\t{bookmark.name}\t{bookmark.url}", file=out)
+
+def execute(args: 'argparse.Namespace', store, config: Dict[str, Any], frecency, open_site: SiteOpener,
+            out: Optional[TextIO] = None, err: Optional[TextIO] = None) -> int:
+    """
+    Run a parsed command against loaded bookmarks.
+
+    The running window calls this for forwarded queries with its own store,
+    frecency tracker and opener.
+
+    Returns:
+        The exit status
+    """
+    out = out or sys.stdout
+    err = err or sys.stderr
+    if args.metrics:
+        from metrics import metrics
+        print(json.dumps(metrics.snapshot(), ensure_ascii=False, indent=None if args.json else 2), file=out)
+        return 0
+    if args.category is not None and args.category not in store:
+        print(f"Category not found: {args.category}", file=err)
+        return 1
+
+    if args.list is not None:
+        if args.list and args.list not in store:
+            print(f"Category not found: {args.list}", file=err)
+            return 1
+        if args.list:
+            print_bookmarks([(args.list, bookmark) for bookmark in store[args.list]], args.json, out)
+        elif args.json:
+            print(json.dumps([{"category": category, "count": len(store[category])} for category in store],
+                             ensure_ascii=False), file=out)
+        else:
+            print("\n".join(store), file=out)
+        return 0
+
+    if args.search is not None:
+        results = find_bookmarks(store, args.search, config, frecency, args.category, args.limit)
+        print_bookmarks(results, args.json, out)
+        return 0 if results else 1
+
+    match = resolve_bookmark(store, args.open, frecency, args.category)
+    if match is None:
+        print(f"No bookmark matches {args.open!r}", file=err)
+        return 1
+    category, bookmark = match
+    if not open_site(category, bookmark, args.new_window):
+        print(f"Failed to open URL {bookmark.url}", file=err)
+        return 1
+    if args.json:
+        print(json.dumps(bookmark_record(category, bookmark), ensure_ascii=False), file=out)
+    else:
+        print(f"{category}\t{bookmark.name}\t{bookmark.url}", file=out)
+    return 0
+
+def forward(argv: Sequence[str], data_dir: Path) -> Optional[int]:
+    """
+    Let the running instance for ``data_dir`` handle a command line.
+
+    Returns:
+        Its exit status after printing its output, or None if no instance is
+        running. If an instance is running but does not answer, a warning is
+        printed and the status is 1, so no second instance is started.
+    """
+    if not instance_may_be_running():
+        return None
+    from single_instance import InstanceNotResponding, send_command, server_name
+    try:
+        reply = send_command(server_name(data_dir), argv)
+    except InstanceNotResponding as e:
+        print(f"{e}; try again later", file=sys.stderr)
+        return 1
+    if reply is None:
+        return None
+    if reply.get("output"):
+        sys.stdout.write(reply["output"])
+    if reply.get("error"):
+        sys.stderr.write(reply["error"])
+    return int(reply.get("status", 1))
+
+def instance_may_be_running() -> bool:
+    """
+    Return False if no instance can be listening, without importing ``single_instance``.
+
+    Looks for any socket (Unix) or named pipe (Windows) with the prefix of
+    ``single_instance.server_name`` where ``server_address`` puts them, so
+    launches without a running window skip loading ``socket`` and ``hashlib``.
+    """
+    directory = '\\\\.\\pipe\\' if sys.platform == 'win32' else os.environ.get('TMPDIR') or '/tmp'
+    try:
+        return any(name.startswith(SERVER_PREFIX) for name in os.listdir(directory))
+    except OSError:
+        return True
+
+def run(argv: Sequence[str], config: Dict[str, Any]) -> int:
+    """Run a command-line query and return the exit status."""
+    args = build_parser().parse_args(argv)
+    from bookmark_manager import (DATABASE_NAME, VISITS_NAME, close_bookmarks, close_frecency,
+                                  get_data_dir, load_bookmarks, load_frecency)
+
+    data_dir = args.data_dir
+    if config.get("single_instance", True):
+        status = forward(argv, data_dir or get_data_dir())
+        if status is not None:
+            return status
+    if args.metrics:
+        print("The window is not running, no metrics to report", file=sys.stderr)
+        return 1
+
+    store = load_bookmarks(db_path=data_dir / DATABASE_NAME if data_dir else None,
+                           compact=config.get("store_mode") == "compact")
+    frecency = None
+    if args.open is not None or (args.search is not None and config.get("search_mode") == "ranked"):
+        frecency = load_frecency(data_dir / VISITS_NAME if data_dir else None)
+
+    def open_site(category: str, bookmark: Bookmark, new_window: bool) -> bool:
+        import webbrowser
+        if not webbrowser.open(bookmark.url, new=1 if new_window else 2):
+            return False
+        frecency.record(bookmark.url)
+        return True
+
+    try:
+        return execute(args, store, config, frecency, open_site)
+    finally:
+        if frecency is not None:
+            close_frecency(frecency)
+        close_bookmarks(store)
@@ -0,0 +1,124 @@
+"""
+Balancing of categories across the columns of the window.
+
+Categories keep their order and fill the columns top to bottom, left to
+right. Each column takes a contiguous run of categories, and the runs are
+chosen so that the tallest column is as short as possible. Heights are
+size hints cached per category; only categories whose hint was invalidated
+are measured again. A new arrangement is only adopted if it beats the
+current one noticeably, so that editing one category does not shuffle the
+other columns.
+
+Example:
+    >>> balancer = ColumnBalancer()
+    >>> balancer.arrange(['Почта', 'ИИ', 'Учеба'], 2, {'Почта': 300, 'ИИ': 120, 'Учеба': 150}.get)
+    [['Почта'], ['ИИ', 'Учеба']]
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Keep the current arrangement unless the best one is this much shorter
+REBALANCE_TOLERANCE = 0.15
+
+def column_count(width: int, column_width: int, max_columns: Optional[int] = None) -> int:
+    """Return how many columns of ``column_width`` fit into ``width``, at least one."""
+    count = max(1, width // max(1, column_width))
+    return min(count, max_columns) if max_columns else count
+
+def _columns_needed(heights: Sequence[int], limit: int) -> int:
+    needed, height = 1, 0
+    for value in heights:
+        if height and height + value > limit:
+            needed += 1
+            height = 0
+        height += value
+    return needed
+
+def partition(heights: Sequence[int], columns: int) -> List[int]:
+    """
+    Split a sequence of heights into at most ``columns`` contiguous runs.
+
+    Returns:
+        The number of items in each of the ``columns`` runs; trailing runs
+        may be empty. The tallest run is as short as possible.
+    """
+    if columns <= 1 or not heights:
+        return [len(heights)] + [0] * max(0, columns - 1)
+    low, high = max(heights), sum(heights)
+    while low < high:
+        middle = (low + high) // 2
+        if _columns_needed(heights, middle) <= columns:
+            high = middle
+        else:
+            low = middle + 1
+    sizes, size, height = [], 0, 0
+    for index, value in enumerate(heights):
+        # Leave at least one item for every remaining column
+        remaining_columns = columns - len(sizes) - 1
+        if size and (height + value > low or len(heights) - index <= remaining_columns):
+            sizes.append(size)
+            size = height = 0
+        size += 1
+        height += value
+    sizes.append(size)
+    return sizes + [0] * (columns - len(sizes))
+
+class ColumnBalancer:
+    """
+    Arranges categories in columns by their cached heights.
+
+    Attributes:
+        columns: The current arrangement, category names per column
+    """
+
+    def __init__(self, tolerance: float = REBALANCE_TOLERANCE):
+        self.tolerance = tolerance
+        self.columns: List[List[str]] = []
+        self._heights: Dict[str, int] = {}
+
+    def invalidate(self, category: Optional[str] = None) -> None:
+        """Forget the size hint of a category, or of all categories."""
+        if category is None:
+            self._heights.clear()
+        else:
+            self._heights.pop(category, None)
+
+    def height(self, category: str, measure: Callable[[str], int]) -> int:
+        height = self._heights.get(category)
+        if height is None:
+            height = self._heights[category] = measure(category)
+        return height
+
+    def column_of(self, category: str) -> Optional[int]:
+        for index, column in enumerate(self.columns):
+            if category in column:
+                return index
+        return None
+
+    def arrange(self, categories: Sequence[str], count: int,
+                measure: Callable[[str], int]) -> List[List[str]]:
+        """
+        Return the categories per column, measuring only uncached heights.
+
+        The current arrangement is kept if it still holds the same categories
+        in ``count`` columns and its tallest column is within the tolerance of
+        the best arrangement.
+        """
+        heights = [self.height(category, measure) for category in categories]
+        sizes = partition(heights, count)
+        best, start = [], 0
+        for size in sizes:
+            best.append(list(categories[start:start + size]))
+            start += size
+        by_name = dict(zip(categories, heights))
+        tallest_best = max((sum(by_name[c] for c in column) for column in best), default=0)
+        current = self.columns
+        if (len(current) == count and [c for column in current for c in column] == list(categories)):
+            tallest_current = max(sum(by_name[c] for c in column) for column in current)
+            if tallest_current <= tallest_best * (1 + self.tolerance):
+                return current
+        for category in list(self._heights):
+            if category not in by_name:
+                del self._heights[category]
+        self.columns = best
+        return best
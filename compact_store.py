@@ -0,0 +1,485 @@
+"""
+Columnar bookmark storage for very large profiles.
+
+``CompactBookmarkStore`` has the same interface as ``BookmarkStore`` but does
+not keep a Python object per bookmark. Every bookmark is a slot number into
+parallel ``array`` columns:
+
+- names and URL tails are UTF-8 bytes in one shared buffer, addressed by offset;
+- the scheme and host of each URL (``https://www.example.com``) and the icon
+  paths are dictionary-encoded in ``StringTable`` buffers, so each distinct
+  value is stored once;
+- categories are integer IDs with an ordered array of member slots each;
+- search keys are newline-separated in one byte buffer that ``search`` scans
+  with ``bytearray.find``;
+- the (category, name) and URL lookups are open-addressing hash tables kept
+  in two arrays instead of dictionaries.
+
+``Bookmark`` objects are built on demand when a category is read, so callers
+such as the main window keep working unchanged. Space left behind by updated
+and removed bookmarks is reclaimed by rebuilding the columns once it makes up
+more than half of the store.
+
+Example:
+    >>> store = CompactBookmarkStore({"Почта": [Bookmark("Gmail", "https://mail.google.com")]})
+    >>> store.find("Почта", "Gmail").url
+    'https://mail.google.com'
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from sity_list import Bookmark, BookmarkStore, normalize_key
+from lazy_logger import get_logger
+
+logger = get_logger(__name__)
+
+REMOVED = 0xFFFFFFFF
+MIN_COMPACT_SLOTS = 1024
+
+_EMPTY = -1
+_DELETED = -2
+_HASH_MASK = 0xFFFFFFFF
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Split a URL into its ``scheme://host`` part and the rest."""
+    start = url.find("://")
+    if start < 0:
+        return "", url
+    end = url.find("/", start + 3)
+    return (url, "") if end < 0 else (url[:end], url[end:])
+
+class HashIndex:
+    """
+    Multimap from hash values to slot numbers with open addressing.
+
+    Only the low 32 bits of each hash are stored, so ``find`` yields candidate
+    slots that the caller has to verify. The table is kept at most three
+    quarters full.
+    """
+
+    def __init__(self, size: int = 0):
+        self._allocate(self._capacity_for(size))
+
+    def __len__(self) -> int:
+        return self._live
+
+    @staticmethod
+    def _capacity_for(size: int) -> int:
+        capacity = 16
+        while 3 * capacity < 4 * (size + 1):
+            capacity *= 2
+        return capacity
+
+    def _allocate(self, capacity: int) -> None:
+        self._mask = capacity - 1
+        self._hashes = array('I', bytes(4 * capacity))
+        self._values = array('i', [_EMPTY]) * capacity
+        self._used = 0
+        self._live = 0
+
+    def add(self, key_hash: int, value: int) -> None:
+        """Add a value under a hash."""
+        if (self._used + 1) * 4 > (self._mask + 1) * 3:
+            self._resize()
+        key_hash &= _HASH_MASK
+        mask, values = self._mask, self._values
+        i = key_hash & mask
+        while values[i] >= 0:
+            i = (i + 1) & mask
+        if values[i] == _EMPTY:
+            self._used += 1
+        self._hashes[i] = key_hash
+        values[i] = value
+        self._live += 1
+
+    def find(self, key_hash: int) -> Iterator[int]:
+        """Yield the values stored under a hash."""
+        key_hash &= _HASH_MASK
+        mask, hashes, values = self._mask, self._hashes, self._values
+        i = key_hash & mask
+        while True:
+            value = values[i]
+            if value == _EMPTY:
+                return
+            if value >= 0 and hashes[i] == key_hash:
+                yield value
+            i = (i + 1) & mask
+
+    def remove(self, key_hash: int, value: int) -> bool:
+        """Remove one value stored under a hash. Returns False if it was not found."""
+        key_hash &= _HASH_MASK
+        mask, hashes, values = self._mask, self._hashes, self._values
+        i = key_hash & mask
+        while True:
+            current = values[i]
+            if current == _EMPTY:
+                return False
+            if current == value and hashes[i] == key_hash:
+                values[i] = _DELETED
+                self._live -= 1
+                return True
+            i = (i + 1) & mask
+
+    def fill(self, key_hashes: Iterable[int]) -> None:
+        """Add ``key_hashes[i]`` under value ``i`` to an empty index sized for all of them."""
+        mask, hashes, values = self._mask, self._hashes, self._values
+        for value, key_hash in enumerate(key_hashes):
+            key_hash &= _HASH_MASK
+            i = key_hash & mask
+            while values[i] != _EMPTY:
+                i = (i + 1) & mask
+            hashes[i] = key_hash
+            values[i] = value
+            self._used += 1
+            self._live += 1
+
+    def _resize(self) -> None:
+        entries = [(key_hash, value) for key_hash, value in zip(self._hashes, self._values)
+                   if value >= 0]
+        self._allocate(self._capacity_for(len(entries)))
+        for key_hash, value in entries:
+            self.add(key_hash, value)
+
+class StringTable:
+    """
+    Dictionary encoding of strings into one UTF-8 buffer.
+
+    Every distinct string gets a stable integer ID; nothing is ever removed.
+    """
+
+    def __init__(self, values: Iterable[str] = ()):
+        self._data = bytearray()
+        self._offsets = array('Q', [0])
+        values = list(values)
+        for value in values:
+            self._data += value.encode('utf-8')
+            self._offsets.append(len(self._data))
+        self._index = HashIndex(len(values))
+        self._index.fill(map(hash, values))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, value_id: int) -> str:
+        return self._data[self._offsets[value_id]:self._offsets[value_id + 1]].decode('utf-8')
+
+    def intern(self, value: str) -> int:
+        """Return the ID of a string, adding it if it is new."""
+        key_hash = hash(value)
+        encoded = value.encode('utf-8')
+        data, offsets = self._data, self._offsets
+        for value_id in self._index.find(key_hash):
+            if data[offsets[value_id]:offsets[value_id + 1]] == encoded:
+                return value_id
+        value_id = len(offsets) - 1
+        data += encoded
+        offsets.append(len(data))
+        self._index.add(key_hash, value_id)
+        return value_id
+
+class CompactBookmarkStore(BookmarkStore):
+    """
+    ``BookmarkStore`` with columnar storage, for profiles of a million bookmarks.
+
+    Lookups and mutations stay O(1) on average; reading a category decodes its
+    bookmarks, so it costs more than in ``BookmarkStore``.
+    """
+
+    def reset(self, data: Optional[Mapping[str, List[Bookmark]]] = None,
+              search_keys: Optional[Mapping[str, List[str]]] = None) -> None:
+        """
+        Replace the whole content of the store without touching the backend.
+
+        Args:
+            data: Bookmarks by category
+            search_keys: Already normalized search keys, parallel to ``data``
+        """
+        self._category_names: List[str] = []
+        self._category_ids: Dict[str, int] = {}
+        self._members: List[array] = []
+        self._live = 0
+        self._garbage = 0
+
+        # Columns are filled in bulk here; the interning dictionaries only live
+        # until the string tables are built.
+        slot_category, offsets, name_sizes, tail_sizes = array('I'), array('Q'), array('I'), array('I')
+        slot_host, slot_icon, line_starts = array('I'), array('I'), array('Q')
+        text, keys = bytearray(), bytearray()
+        host_ids: Dict[str, int] = {}
+        icon_ids: Dict[str, int] = {}
+        name_hashes = array('q')
+        url_hashes = array('q')
+        for category, category_bookmarks in (data or {}).items():
+            category_id = self._category_id(category)
+            category_keys = search_keys[category] if search_keys is not None else None
+            positions: Dict[str, int] = {}
+            bookmarks: List[Bookmark] = []
+            bookmark_keys: List[Optional[str]] = []
+            for i, bookmark in enumerate(category_bookmarks):
+                key = category_keys[i] if category_keys is not None else None
+                position = positions.get(bookmark.name)
+                if position is None:
+                    positions[bookmark.name] = len(bookmarks)
+                    bookmarks.append(bookmark)
+                    bookmark_keys.append(key)
+                else:
+                    # Like ``add``: a repeated name replaces the earlier bookmark in place
+                    bookmarks[position] = bookmark
+                    bookmark_keys[position] = key
+            first_slot = len(slot_category)
+            self._members[category_id] = array('I', range(first_slot, first_slot + len(bookmarks)))
+            for bookmark, key in zip(bookmarks, bookmark_keys):
+                host, tail = split_url(bookmark.url)
+                name_bytes = bookmark.name.encode('utf-8')
+                tail_bytes = tail.encode('utf-8')
+                slot_category.append(category_id)
+                offsets.append(len(text))
+                name_sizes.append(len(name_bytes))
+                tail_sizes.append(len(tail_bytes))
+                text += name_bytes
+                text += tail_bytes
+                host_id = host_ids.get(host)
+                if host_id is None:
+                    host_id = host_ids[host] = len(host_ids)
+                slot_host.append(host_id)
+                icon_id = icon_ids.get(bookmark.icon)
+                if icon_id is None:
+                    icon_id = icon_ids[bookmark.icon] = len(icon_ids)
+                slot_icon.append(icon_id)
+                line_starts.append(len(keys))
+                keys += (key if key is not None else normalize_key(bookmark.name)).replace("\n", " ").encode('utf-8')
+                keys += b"\n"
+                name_hashes.append(hash((category_id, bookmark.name)))
+                url_hashes.append(hash(bookmark.url))
+
+        self._slot_category, self._offsets = slot_category, offsets
+        self._name_sizes, self._tail_sizes = name_sizes, tail_sizes
+        self._text, self._keys, self._line_starts = text, keys, line_starts
+        self._slot_host, self._slot_icon = slot_host, slot_icon
+        self._hosts = StringTable(host_ids)
+        self._icons = StringTable(icon_ids)
+        del host_ids, icon_ids
+        self._line_slots = array('I', range(len(slot_category)))
+        self._slot_lines = array('I', range(len(slot_category)))
+        self._live = len(slot_category)
+        self._name_index = HashIndex(self._live)
+        self._name_index.fill(name_hashes)
+        del name_hashes
+        self._url_index = HashIndex(self._live)
+        self._url_index.fill(url_hashes)
+
+    def __getitem__(self, category: str) -> List[Bookmark]:
+        return [self._bookmark(slot) for slot in self._members[self._category_ids[category]]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._category_names)
+
+    def __len__(self) -> int:
+        return len(self._category_names)
+
+    def __contains__(self, category: object) -> bool:
+        return category in self._category_ids
+
+    def add_category(self, category: str) -> None:
+        """Create an empty category if it does not exist yet."""
+        if category not in self._category_ids:
+            if self.backend is not None:
+                self.backend.add_category(category)
+            self._category_id(category)
+            self._touched_categories[category] = None
+            self._flush_unless_batched()
+
+    def entries(self, category: str) -> List[Tuple[Bookmark, str]]:
+        """Return (bookmark, normalized search key) pairs of a category in order."""
+        return [(self._bookmark(slot), self._search_key(slot))
+                for slot in self._members[self._category_ids[category]]]
+
+    def find(self, category: str, name: str) -> Optional[Bookmark]:
+        """Return the bookmark with the given name in a category, or None."""
+        slot = self._find_slot(category, name)
+        return None if slot is None else self._bookmark(slot)
+
+    def find_by_url(self, url: str) -> List[tuple[str, Bookmark]]:
+        """Return all (category, bookmark) pairs pointing to the given URL."""
+        slots = sorted(slot for slot in self._url_index.find(hash(url)) if self._url(slot) == url)
+        return [(self._category_names[self._slot_category[slot]], self._bookmark(slot))
+                for slot in slots]
+
+    def add(self, category: str, bookmark: Bookmark) -> None:
+        """
+        Add a bookmark to a category, creating the category if needed.
+
+        A bookmark with the same name in the same category is replaced in place.
+        """
+        if self.backend is not None:
+            self.backend.add(category, bookmark)
+        self._touch(category, bookmark.name)
+        self._put(category, bookmark)
+        self._flush_unless_batched()
+        self._compact_if_sparse()
+
+    def update(self, category: str, old_name: str, bookmark: Bookmark) -> bool:
+        """
+        Replace a bookmark, keeping its position in the category.
+
+        Returns:
+            bool: True if the bookmark was replaced, False if it was not found
+
+        Raises:
+            ValueError: If the new name is already used by another bookmark
+        """
+        slot = self._find_slot(category, old_name)
+        if slot is None:
+            return False
+        if bookmark.name != old_name and self._find_slot(category, bookmark.name) is not None:
+            raise ValueError("Bookmark with this name already exists")
+        if self.backend is not None:
+            self.backend.update(category, old_name, bookmark)
+        self._touch(category, old_name)
+        self._touch(category, bookmark.name)
+        category_id = self._slot_category[slot]
+        if bookmark.name != old_name:
+            self._name_index.remove(hash((category_id, old_name)), slot)
+            self._name_index.add(hash((category_id, bookmark.name)), slot)
+        self._write(slot, bookmark, None)
+        self._flush_unless_batched()
+        self._compact_if_sparse()
+        return True
+
+    def remove(self, category: str, name: str) -> bool:
+        """Remove a bookmark. Returns False if it was not found."""
+        slot = self._find_slot(category, name)
+        if slot is None:
+            return False
+        if self.backend is not None:
+            self.backend.remove(category, name)
+        self._touch(category, name)
+        category_id = self._slot_category[slot]
+        self._name_index.remove(hash((category_id, name)), slot)
+        self._url_index.remove(hash(self._url(slot)), slot)
+        members = self._members[category_id]
+        del members[bisect_left(members, slot)]
+        self._garbage += self._name_sizes[slot] + self._tail_sizes[slot]
+        self._slot_category[slot] = REMOVED
+        self._slot_lines[slot] = REMOVED
+        self._live -= 1
+        self._flush_unless_batched()
+        self._compact_if_sparse()
+        return True
+
+    def search(self, query: str) -> List[tuple[str, Bookmark]]:
+        """Return (category, bookmark) pairs whose names contain the query."""
+        needle = normalize_key(query).encode('utf-8')
+        if not needle:
+            return [(category, bookmark) for category in self for bookmark in self[category]]
+        if b"\n" in needle:
+            return []
+        keys, starts, line_slots, slot_lines = self._keys, self._line_starts, self._line_slots, self._slot_lines
+        last_line = len(starts) - 1
+        matches = []
+        position = keys.find(needle)
+        while position >= 0:
+            line = bisect_right(starts, position) - 1
+            slot = line_slots[line]
+            if slot_lines[slot] == line:
+                matches.append(slot)
+            if line == last_line:
+                break
+            position = keys.find(needle, starts[line + 1])
+        slot_category = self._slot_category
+        matches.sort(key=lambda slot: (slot_category[slot], slot))
+        return [(self._category_names[slot_category[slot]], self._bookmark(slot)) for slot in matches]
+
+    def _category_id(self, category: str) -> int:
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            category_id = self._category_ids[category] = len(self._category_names)
+            self._category_names.append(category)
+            self._members.append(array('I'))
+        return category_id
+
+    def _find_slot(self, category: str, name: str) -> Optional[int]:
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            return None
+        encoded = None
+        for slot in self._name_index.find(hash((category_id, name))):
+            if self._slot_category[slot] != category_id:
+                continue
+            if encoded is None:
+                encoded = name.encode('utf-8')
+            start = self._offsets[slot]
+            if self._text[start:start + self._name_sizes[slot]] == encoded:
+                return slot
+        return None
+
+    def _put(self, category: str, bookmark: Bookmark, search_key: Optional[str] = None) -> None:
+        slot = self._find_slot(category, bookmark.name)
+        if slot is not None:
+            self._write(slot, bookmark, search_key)
+            return
+        category_id = self._category_id(category)
+        slot = len(self._slot_category)
+        self._slot_category.append(category_id)
+        for column in (self._offsets, self._name_sizes, self._tail_sizes, self._slot_host,
+                       self._slot_icon, self._slot_lines):
+            column.append(0)
+        self._members[category_id].append(slot)
+        self._name_index.add(hash((category_id, bookmark.name)), slot)
+        self._live += 1
+        self._write(slot, bookmark, search_key, new=True)
+
+    def _write(self, slot: int, bookmark: Bookmark, search_key: Optional[str], new: bool = False) -> None:
+        """Store the fields of a bookmark in its slot, appending fresh text and key data."""
+        if not new:
+            self._url_index.remove(hash(self._url(slot)), slot)
+            self._garbage += self._name_sizes[slot] + self._tail_sizes[slot]
+        host, tail = split_url(bookmark.url)
+        name_bytes = bookmark.name.encode('utf-8')
+        tail_bytes = tail.encode('utf-8')
+        self._offsets[slot] = len(self._text)
+        self._name_sizes[slot] = len(name_bytes)
+        self._tail_sizes[slot] = len(tail_bytes)
+        self._text += name_bytes
+        self._text += tail_bytes
+        self._slot_host[slot] = self._hosts.intern(host)
+        self._slot_icon[slot] = self._icons.intern(bookmark.icon)
+        self._url_index.add(hash(bookmark.url), slot)
+
+        key = search_key if search_key is not None else normalize_key(bookmark.name)
+        self._slot_lines[slot] = len(self._line_starts)
+        self._line_starts.append(len(self._keys))
+        self._line_slots.append(slot)
+        self._keys += key.replace("\n", " ").encode('utf-8')
+        self._keys += b"\n"
+
+    def _bookmark(self, slot: int) -> Bookmark:
+        start = self._offsets[slot]
+        middle = start + self._name_sizes[slot]
+        text = self._text
+        return Bookmark(text[start:middle].decode('utf-8'),
+                        self._hosts[self._slot_host[slot]]
+                        + text[middle:middle + self._tail_sizes[slot]].decode('utf-8'),
+                        self._icons[self._slot_icon[slot]])
+
+    def _url(self, slot: int) -> str:
+        start = self._offsets[slot] + self._name_sizes[slot]
+        return (self._hosts[self._slot_host[slot]]
+                + self._text[start:start + self._tail_sizes[slot]].decode('utf-8'))
+
+    def _search_key(self, slot: int) -> str:
+        line = self._slot_lines[slot]
+        start = self._line_starts[line]
+        return self._keys[start:self._keys.index(b"\n", start)].decode('utf-8')
+
+    def _compact_if_sparse(self) -> None:
+        """Rebuild the columns when most of their space belongs to old versions."""
+        dead_slots = len(self._slot_category) - self._live
+        dead_lines = len(self._line_starts) - self._live
+        if (max(dead_slots, dead_lines) > max(MIN_COMPACT_SLOTS, self._live)
+                or self._garbage > max(1 << 16, len(self._text) // 2)):
+            data = {category: self.entries(category) for category in self._category_names}
+            self.reset({category: [bookmark for bookmark, _ in entries] for category, entries in data.items()},
+                       {category: [key for _, key in entries] for category, entries in data.items()})
+            logger.debug(f"Compacted bookmark store to {self._live} bookmarks")
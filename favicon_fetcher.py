@@ -0,0 +1,350 @@
+"""
+Favicon acquisition for bookmarks.
+
+For every site the bookmark page is fetched and its ``<link rel="icon">``
+tags are read; ``/favicon.ico`` is the fallback. Icons are stored in a
+content-addressed cache: the file name is the hash of the image, so sites
+sharing an icon share one file. ``index.json`` maps each site (scheme, host
+and port) to its icon file together with the ``ETag`` and ``Last-Modified``
+of the icon, which are used to revalidate it with a conditional request once
+it is older than ``refresh_after`` seconds. The cache lives in the data
+directory, and icon paths under it are returned relative to that directory,
+so ``Bookmark.icon`` does not depend on the working directory or on where the
+portable copy is.
+
+All network work runs on asyncio through ``HttpClient``; this module does not
+depend on Qt.
+
+Example:
+    >>> fetcher = FaviconFetcher(FaviconCache())
+    >>> asyncio.run(fetcher.fetch_all(["https://github.com"]))  # doctest: +SKIP
+    {'https://github.com': 'favicons/0f3a...c1.ico'}
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from bookmark_manager import get_data_dir, data_path
+from http_client import DEFAULT_PER_HOST, DEFAULT_TIMEOUT, HTTP_ERRORS, HttpClient, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+FAVICON_DIR = get_data_dir() / 'favicons'
+INDEX_NAME = 'index.json'
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REFRESH = 7 * 24 * 3600
+MAX_PAGE_SIZE = 512 * 1024
+MAX_ICON_SIZE = 256 * 1024
+PREFERRED_SIZE = 32
+
+_IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\x00\x00\x01\x00", ".ico"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"BM", ".bmp"),
+]
+
+class FaviconEntry(NamedTuple):
+    """Cached icon of a site; an empty ``file`` records that the site has none."""
+    icon_url: str
+    file: str
+    etag: str = ""
+    last_modified: str = ""
+    checked_at: float = 0.0
+
+def site_key(url: str) -> str:
+    """Return the site of a URL as ``scheme://host[:port]``."""
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+def sniff_image(data: bytes) -> Optional[str]:
+    """Return the file extension of a supported image, or None if ``data`` is not one."""
+    for signature, extension in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    head = data[:512].lstrip().lower()
+    if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return ".svg"
+    return None
+
+class FaviconCache:
+    """
+    Content-addressed icon files and the site index.
+
+    The index is read on first use and written by ``save``.
+    """
+
+    def __init__(self, directory: Path = FAVICON_DIR):
+        self.directory = Path(directory)
+        self._entries: Optional[Dict[str, FaviconEntry]] = None
+        self._dirty = False
+
+    @property
+    def entries(self) -> Dict[str, FaviconEntry]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def get(self, site: str) -> Optional[FaviconEntry]:
+        """Return the cached entry of a site."""
+        return self.entries.get(site)
+
+    def put(self, site: str, entry: FaviconEntry) -> None:
+        """Record the icon of a site."""
+        self.entries[site] = entry
+        self._dirty = True
+
+    def path(self, entry: FaviconEntry) -> str:
+        """Return the icon path to store in ``Bookmark.icon``, relative to the data directory if it is under it."""
+        path = self.directory / entry.file
+        try:
+            path = path.relative_to(get_data_dir())
+        except ValueError:
+            pass
+        return path.as_posix()
+
+    def exists(self, entry: FaviconEntry) -> bool:
+        """Return True if the icon file of an entry is present."""
+        return bool(entry.file) and (self.directory / entry.file).is_file()
+
+    def owns(self, path: str) -> bool:
+        """Return True if an icon path points into this cache."""
+        return Path(data_path(path)).parent == self.directory
+
+    def store(self, data: bytes, extension: str) -> str:
+        """
+        Write an icon file named after its content and return the file name.
+
+        An icon that is already cached is not written again.
+        """
+        name = hashlib.sha256(data).hexdigest()[:32] + extension
+        path = self.directory / name
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(path.suffix + '.tmp')
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        return name
+
+    def save(self) -> None:
+        """Write the index if it changed."""
+        if not self._dirty:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / INDEX_NAME
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({site: entry._asdict() for site, entry in self.entries.items()}, f)
+        os.replace(temp_path, path)
+        self._dirty = False
+
+    def prune(self) -> int:
+        """Delete icon files no site refers to and return how many were removed."""
+        used = {entry.file for entry in self.entries.values()}
+        removed = 0
+        if self.directory.is_dir():
+            for path in self.directory.iterdir():
+                if path.name != INDEX_NAME and path.name not in used:
+                    path.unlink()
+                    removed += 1
+        return removed
+
+    def _load(self) -> Dict[str, FaviconEntry]:
+        try:
+            with open(self.directory / INDEX_NAME, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {site: FaviconEntry(**entry) for site, entry in data.items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Failed to read favicon index, starting empty: {e}")
+            return {}
+
+class _IconLinkParser(HTMLParser):
+    """Collects (href, size) of icon links in the head of a page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[Tuple[str, int]] = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.done = True
+        elif tag == 'link':
+            attributes = {name: value or "" for name, value in attrs}
+            rel = attributes.get('rel', '').lower().split()
+            href = attributes.get('href', '').strip()
+            if href and ('icon' in rel or 'apple-touch-icon' in rel):
+                self.links.append((href, self._size(attributes.get('sizes', ''), rel)))
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+
+    def _size(self, sizes: str, rel: List[str]) -> int:
+        best = 0
+        for size in sizes.lower().split():
+            if size == 'any':
+                return PREFERRED_SIZE
+            width, _, _ = size.partition('x')
+            if width.isdigit():
+                best = max(best, int(width))
+        if not best:
+            best = 180 if 'apple-touch-icon' in rel else 16
+        return best
+
+def icon_links(html: str, base_url: str) -> List[str]:
+    """
+    Return the icon URLs declared by a page, best first.
+
+    Icons closest to ``PREFERRED_SIZE`` (but not smaller) come first.
+    """
+    parser = _IconLinkParser()
+    chunk_size = 8192
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        if parser.done:
+            break
+    parser.close()
+    links = sorted(parser.links,
+                   key=lambda link: (link[1] < PREFERRED_SIZE, abs(link[1] - PREFERRED_SIZE)))
+    urls = [urljoin(base_url, href) for href, _ in links]
+    return [url for url in dict.fromkeys(urls) if urlsplit(url).scheme in ('http', 'https')]
+
+class FaviconFetcher:
+    """
+    Resolves and caches the favicons of many sites concurrently.
+
+    A fetcher is bound to the event loop it is first used in; create a new one
+    (with the same ``cache``) for every ``asyncio.run``.
+    """
+
+    def __init__(self, cache: FaviconCache, concurrency: int = DEFAULT_CONCURRENCY,
+                 per_host: int = DEFAULT_PER_HOST, timeout: float = DEFAULT_TIMEOUT,
+                 refresh_after: float = DEFAULT_REFRESH):
+        self.cache = cache
+        self.refresh_after = refresh_after
+        self.client = HttpClient(per_host, timeout, max_body=MAX_PAGE_SIZE)
+        self._concurrency = concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def fetch_all(self, urls: Iterable[str],
+                        on_icon: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """
+        Find the favicons of the sites of ``urls``; each site is fetched once.
+
+        Args:
+            urls: Bookmark URLs
+            on_icon: Called with (url, icon path) for every URL whose site has an icon
+
+        Returns:
+            Icon paths by URL
+        """
+        by_site: Dict[str, List[str]] = {}
+        for url in dict.fromkeys(urls):
+            by_site.setdefault(site_key(url), []).append(url)
+        results: Dict[str, str] = {}
+
+        async def fetch_site(site_urls: List[str]):
+            path = await self.fetch(site_urls[0])
+            if path is None:
+                return
+            for url in site_urls:
+                results[url] = path
+                if on_icon is not None:
+                    on_icon(url, path)
+
+        try:
+            await asyncio.gather(*(fetch_site(site_urls) for site_urls in by_site.values()))
+        finally:
+            self.client.close()
+            self.cache.save()
+        return results
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """Return the cached icon path of the site of ``url``, fetching or revalidating it if needed."""
+        site = site_key(url)
+        entry = self.cache.get(site)
+        now = time.time()
+        if entry is not None and now - entry.checked_at < self.refresh_after:
+            if not entry.file:
+                return None
+            if self.cache.exists(entry):
+                return self.cache.path(entry)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        async with self._slots:
+            if entry is not None and self.cache.exists(entry):
+                entry = await self._revalidate(entry)
+            else:
+                entry = None
+            if entry is None:
+                entry = await self._resolve(url)
+        self.cache.put(site, entry)
+        return self.cache.path(entry) if entry.file else None
+
+    async def _revalidate(self, entry: FaviconEntry) -> Optional[FaviconEntry]:
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        try:
+            response = await self.client.get(entry.icon_url, headers)
+        except HTTP_ERRORS as e:
+            # Keep the icon we have while the site is unreachable
+            logger.debug(f"Failed to revalidate favicon {entry.icon_url}: {e}")
+            return entry._replace(checked_at=time.time())
+        if response.status == 304:
+            return entry._replace(checked_at=time.time(),
+                                  etag=response.headers.get('etag', entry.etag),
+                                  last_modified=response.headers.get('last-modified', entry.last_modified))
+        return self._entry_from(response)
+
+    async def _resolve(self, url: str) -> FaviconEntry:
+        candidates = []
+        try:
+            page = await self.client.get(url)
+            if page.status == 200 and 'html' in page.headers.get('content-type', 'text/html'):
+                candidates = icon_links(page.body.decode('utf-8', 'replace'), page.url)
+            base_url = page.url
+        except HTTP_ERRORS as e:
+            logger.debug(f"Failed to load {url} for its favicon: {e}")
+            base_url = url
+        candidates.append(urljoin(base_url, '/favicon.ico'))
+
+        for icon_url in dict.fromkeys(candidates):
+            try:
+                entry = self._entry_from(await self.client.get(icon_url))
+            except HTTP_ERRORS as e:
+                logger.debug(f"Failed to load favicon {icon_url}: {e}")
+                continue
+            if entry is not None:
+                return entry
+        logger.info(f"No favicon found for {site_key(url)}")
+        return FaviconEntry(icon_url="", file="", checked_at=time.time())
+
+    def _entry_from(self, response: HttpResponse) -> Optional[FaviconEntry]:
+        if response.status != 200 or len(response.body) > MAX_ICON_SIZE:
+            return None
+        extension = sniff_image(response.body)
+        if extension is None:
+            return None
+        return FaviconEntry(icon_url=response.url,
+                            file=self.cache.store(response.body, extension),
+                            etag=response.headers.get('etag', ''),
+                            last_modified=response.headers.get('last-modified', ''),
+                            checked_at=time.time())
@@ -0,0 +1,61 @@
+"""
+Background thread running the favicon fetcher.
+
+The fetcher's event loop runs in its own thread; every icon found is reported
+to the GUI thread through a signal.
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+import asyncio
+import logging
+from typing import Iterable, Optional
+from favicon_fetcher import DEFAULT_REFRESH, FaviconCache, FaviconFetcher
+
+logger = logging.getLogger(__name__)
+
+class FaviconWorker(QThread):
+    """
+    Fetches the favicons of a list of bookmark URLs in a worker thread.
+
+    Signals:
+        icon_ready(str, str): Bookmark URL and the path of its icon
+    """
+
+    icon_ready = pyqtSignal(str, str)
+
+    def __init__(self, urls: Iterable[str], cache: FaviconCache,
+                 refresh_after: float = DEFAULT_REFRESH, parent=None):
+        super().__init__(parent)
+        self.urls = list(dict.fromkeys(urls))
+        self.cache = cache
+        self.refresh_after = refresh_after
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run(self):
+        try:
+            asyncio.run(self._fetch())
+        except asyncio.CancelledError:
+            logger.info("Favicon fetching cancelled")
+        except OSError as e:
+            logger.error(f"Failed to save favicons: {e}")
+
+    def stop(self):
+        """Cancel fetching and wait for the thread to finish."""
+        self.requestInterruption()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # The loop has already finished
+        self.wait()
+
+    async def _fetch(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if self.isInterruptionRequested():
+            return
+        fetcher = FaviconFetcher(self.cache, refresh_after=self.refresh_after)
+        icons = await fetcher.fetch_all(self.urls, self.icon_ready.emit)
+        logger.info(f"Favicons known for {len(icons)} of {len(self.urls)} bookmark URLs")
@@ -0,0 +1,88 @@
+"""
+Debounced watching of files that other programs may change.
+
+Editors often save by writing a new file and renaming it over the old one,
+which silently ends a plain ``QFileSystemWatcher`` watch. The directories of
+the watched files are therefore watched too, and files are watched again
+whenever they reappear.
+"""
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_MS = 300
+
+def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+    except OSError:
+        return None
+
+class FileWatcher(QObject):
+    """
+    Reports changes of a set of files once they have been quiet for a moment.
+
+    Files do not need to exist yet; creating one counts as a change.
+
+    Signals:
+        changed(str): A watched file changed, was created or removed
+    """
+
+    changed = pyqtSignal(str)
+
+    def __init__(self, paths: Iterable[Path], debounce_ms: int = DEFAULT_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self._paths = [str(Path(path).resolve()) for path in paths]
+        self._signatures: Dict[str, Optional[Tuple[int, int, int]]] = {
+            path: _signature(path) for path in self._paths}
+        self._pending: Dict[str, None] = {}
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._emit_pending)
+        directories = {os.path.dirname(path) for path in self._paths}
+        self._watcher.addPaths(sorted(directories))
+        self._rewatch()
+
+    def _rewatch(self):
+        """Watch the files that exist but are not watched (any more)."""
+        watched = {os.path.normpath(path) for path in self._watcher.files()}
+        missing = [path for path in self._paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self._watcher.addPaths(missing)
+
+    def _check(self, path: str):
+        signature = _signature(path)
+        if signature != self._signatures[path]:
+            self._signatures[path] = signature
+            self._pending[path] = None
+            self._timer.start()
+
+    def _on_file_changed(self, path: str):
+        # Qt reports paths with forward slashes, also on Windows
+        path = os.path.normpath(path)
+        if path in self._signatures:
+            self._check(path)
+        self._rewatch()
+
+    def _on_directory_changed(self, directory: str):
+        directory = os.path.normpath(directory)
+        for path in self._paths:
+            if os.path.dirname(path) == directory:
+                self._check(path)
+        self._rewatch()
+
+    def _emit_pending(self):
+        pending, self._pending = list(self._pending), {}
+        for path in pending:
+            logger.debug(f"Watched file changed: {path}")
+            self.changed.emit(path)
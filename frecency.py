@@ -0,0 +1,266 @@
+"""
+Frecency tracking for bookmarks.
+
+Every bookmark URL keeps a visit count, the time of the last visit and an
+exponentially decaying score: each visit adds 1, and the score halves every
+``half_life`` seconds. The decayed value is only computed when it is read, so
+recording a visit is a constant-time update.
+
+Every visit is appended to a binary log (``VisitLog``), which costs one
+small write instead of a database transaction. The log is compacted into
+per-URL aggregates in a small SQLite database (``VisitDatabase``) when it
+is opened, every ``compact_every`` visits and when it is closed. Keeping
+visits out of the bookmark database means that opening a site does not
+invalidate the bookmark snapshot used for fast startup.
+
+Example:
+    >>> tracker = FrecencyTracker()
+    >>> tracker.record("https://github.com").count
+    1
+    >>> tracker.score("https://github.com") > 0
+    True
+"""
+
+import heapq
+import math
+import os
+import sqlite3
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from lazy_logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_HALF_LIFE = 14 * 24 * 3600
+DEFAULT_COMPACT_EVERY = 1000
+
+# Log file: magic and generation, then entries of visit time, URL length and UTF-8 URL
+LOG_MAGIC = b"PBVL"
+LOG_HEADER = struct.Struct("<4sQ")
+LOG_ENTRY = struct.Struct("<dH")
+
+class VisitStats(NamedTuple):
+    """Aggregated visits of one URL; ``score`` is valid at ``score_time``."""
+    count: int
+    last_visit: float
+    score: float
+    score_time: float
+
+class FrecencyTracker:
+    """
+    Keeps visit statistics per URL and turns them into a ranking boost.
+
+    If a ``backend`` with ``record_visit(url, stats)`` is given, every visit is
+    also persisted there.
+    """
+
+    def __init__(self, stats: Optional[Iterable[Tuple[str, VisitStats]]] = None,
+                 backend=None, half_life: float = DEFAULT_HALF_LIFE):
+        self.half_life = half_life
+        self.backend = backend
+        self._stats: Dict[str, VisitStats] = dict(stats or ())
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def stats(self, url: str) -> Optional[VisitStats]:
+        """Return the visit statistics of a URL, or None if it was never opened."""
+        return self._stats.get(url)
+
+    def items(self) -> Iterable[Tuple[str, VisitStats]]:
+        """Iterate over (url, stats) pairs."""
+        return self._stats.items()
+
+    def record(self, url: str, when: Optional[float] = None) -> VisitStats:
+        """Register a visit of a URL and return its updated statistics."""
+        when = time.time() if when is None else when
+        previous = self._stats.get(url)
+        if previous is None:
+            stats = VisitStats(1, when, 1.0, when)
+        else:
+            stats = VisitStats(previous.count + 1, max(previous.last_visit, when),
+                               self._decayed(previous, when) + 1.0, when)
+        self._stats[url] = stats
+        if self.backend is not None:
+            try:
+                self.backend.record_visit(url, stats)
+            except Exception as e:
+                logger.warning(f"Failed to save visit of {url}: {e}")
+        return stats
+
+    def score(self, url: str, now: Optional[float] = None) -> float:
+        """Return the decayed visit score of a URL at ``now``."""
+        stats = self._stats.get(url)
+        if stats is None:
+            return 0.0
+        return self._decayed(stats, time.time() if now is None else now)
+
+    def boost(self, url: str, now: Optional[float] = None) -> float:
+        """Return a ranking multiplier bonus (0 for never visited URLs)."""
+        return math.log1p(self.score(url, now))
+
+    def most_used(self, limit: int, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` (url, score) pairs with the highest decayed score."""
+        now = time.time() if now is None else now
+        return heapq.nlargest(limit, ((url, self._decayed(stats, now)) for url, stats in self._stats.items()),
+                              key=lambda item: item[1])
+
+    def _decayed(self, stats: VisitStats, now: float) -> float:
+        age = max(0.0, now - stats.score_time)
+        return stats.score * 0.5 ** (age / self.half_life)
+
+class VisitDatabase:
+    """SQLite storage of the visit statistics, one row per URL."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS visits ("
+                "url TEXT PRIMARY KEY, count INTEGER NOT NULL, last_visit REAL NOT NULL, "
+                "score REAL NOT NULL, score_time REAL NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS visit_log ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER NOT NULL, size INTEGER NOT NULL)")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+    def load(self) -> List[Tuple[str, VisitStats]]:
+        """Read the statistics of all visited URLs."""
+        rows = self.connection.execute(
+            "SELECT url, count, last_visit, score, score_time FROM visits")
+        return [(url, VisitStats(*stats)) for url, *stats in rows]
+
+    def record_visit(self, url: str, stats: VisitStats) -> None:
+        """Store the updated statistics of a URL."""
+        self.save_aggregates([(url, stats)])
+
+    def log_state(self) -> Tuple[int, int]:
+        """Return the generation and size of the visit log part already merged into the aggregates."""
+        row = self.connection.execute("SELECT generation, size FROM visit_log WHERE id = 0").fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def save_aggregates(self, items: Iterable[Tuple[str, VisitStats]],
+                        log_state: Optional[Tuple[int, int]] = None) -> None:
+        """Store updated statistics and, in the same transaction, how much of the log they include."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO visits (url, count, last_visit, score, score_time) "
+                "VALUES (?, ?, ?, ?, ?)", [(url, *stats) for url, stats in items])
+            if log_state is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO visit_log (id, generation, size) VALUES (0, ?, ?)", log_state)
+
+class VisitLog:
+    """
+    Append-only log of visits in front of a ``VisitDatabase``.
+
+    Compaction writes the statistics of the URLs visited since the last
+    compaction to the database, together with the generation and size of
+    the log they cover, and then starts a new, empty log of the next
+    generation. A crash between the two steps is harmless: entries covered by
+    the recorded size are skipped when the log is read again. A partly
+    written entry at the end of the log is ignored.
+    """
+
+    def __init__(self, path: Union[str, Path], database: VisitDatabase,
+                 compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.path = Path(path)
+        self.database = database
+        self.compact_every = compact_every
+        self._pending: Dict[str, VisitStats] = {}
+        self._appended = 0
+        self._file = None
+        self._generation = 0
+
+    def replay(self, tracker: FrecencyTracker) -> int:
+        """
+        Record the visits of the log that are not in the database yet and compact.
+
+        Call this once, before attaching the log to ``tracker`` as its backend.
+
+        Returns:
+            The number of replayed visits
+        """
+        merged_generation, merged_size = self.database.log_state()
+        entries: List[Tuple[float, str]] = []
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if len(data) >= LOG_HEADER.size:
+            magic, self._generation = LOG_HEADER.unpack_from(data)
+            if magic != LOG_MAGIC:
+                logger.warning(f"Ignoring visit log {self.path} with unknown format")
+                self._generation = merged_generation
+            else:
+                offset = merged_size if self._generation == merged_generation else LOG_HEADER.size
+                entries = self._parse(data, max(offset, LOG_HEADER.size))
+        else:
+            self._generation = merged_generation
+        for when, url in entries:
+            self._pending[url] = tracker.record(url, when)
+        self.compact()
+        return len(entries)
+
+    @staticmethod
+    def _parse(data: bytes, offset: int) -> List[Tuple[float, str]]:
+        entries = []
+        while offset + LOG_ENTRY.size <= len(data):
+            when, length = LOG_ENTRY.unpack_from(data, offset)
+            end = offset + LOG_ENTRY.size + length
+            if end > len(data):
+                break
+            entries.append((when, data[offset + LOG_ENTRY.size:end].decode('utf-8', 'replace')))
+            offset = end
+        return entries
+
+    def record_visit(self, url: str, stats: VisitStats) -> None:
+        """Append a visit; ``stats.score_time`` is the time of the visit."""
+        encoded = url.encode('utf-8')[:0xFFFF]
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            if self._file.tell() == 0:
+                self._file.write(LOG_HEADER.pack(LOG_MAGIC, self._generation))
+        self._file.write(LOG_ENTRY.pack(stats.score_time, len(encoded)) + encoded)
+        self._file.flush()
+        self._pending[url] = stats
+        self._appended += 1
+        if self._appended >= self.compact_every:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge the logged visits into the database and start a new log."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if self._pending or size > LOG_HEADER.size:
+            self.database.save_aggregates(self._pending.items(), (self._generation, size))
+        # An empty log of the current generation can be kept
+        if size != LOG_HEADER.size:
+            self._generation += 1
+            temp = self.path.with_name(self.path.name + '.tmp')
+            with open(temp, 'wb') as f:
+                f.write(LOG_HEADER.pack(LOG_MAGIC, self._generation))
+            os.replace(temp, self.path)
+        self._pending.clear()
+        self._appended = 0
+
+    def close(self) -> None:
+        """Compact the log and close the database."""
+        try:
+            self.compact()
+        finally:
+            self.database.close()
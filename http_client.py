@@ -0,0 +1,335 @@
+"""
+Minimal asynchronous HTTP/1.1 client on asyncio streams.
+
+Connections are kept alive and reused per (scheme, host, port), and the number
+of connections in use is limited per host and, optionally, in total. Time
+spent waiting for a free connection does not count against the timeout. Bodies are read for
+``Content-Length``, chunked and close-delimited responses up to ``max_body``
+bytes. Only what the link checker and the favicon fetcher need is supported:
+no request bodies, cookies or compression.
+
+Example:
+    >>> async def main():
+    ...     client = HttpClient(timeout=5)
+    ...     try:
+    ...         return (await client.get("https://github.com/favicon.ico")).status
+    ...     finally:
+    ...         client.close()
+    >>> asyncio.run(main())  # doctest: +SKIP
+    200
+"""
+
+import asyncio
+import logging
+import ssl
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urljoin, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_HOST = 2
+DEFAULT_TIMEOUT = 10.0
+IDLE_TIMEOUT = 30.0
+MAX_HEADERS = 100
+MAX_BODY = 1 << 20
+MAX_REDIRECTS = 5
+USER_AGENT = "Mozilla/5.0 (compatible; PortableBrowser)"
+
+REDIRECTS = {301, 302, 303, 307, 308}
+
+# Everything a request can fail with
+HTTP_ERRORS = (asyncio.TimeoutError, OSError, EOFError, ValueError, asyncio.LimitOverrunError)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_TARGET_SAFE = "/%:@!$&'()*+,;=-._~?"
+_NO_BODY = {204, 304}
+
+HostKey = Tuple[str, str, int]
+
+class HttpResponse(NamedTuple):
+    """A response; ``url`` is the address that produced it, after redirects."""
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    url: str
+
+class _StaleConnection(Exception):
+    """A reused keep-alive connection was closed by the server."""
+
+class _Connection:
+    """One HTTP connection to a host."""
+
+    def __init__(self, key: HostKey, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.idle_since = 0.0
+        self.reused = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+class ConnectionPool:
+    """
+    Keep-alive connections grouped by (scheme, host, port).
+
+    ``acquire`` waits until the host has fewer than ``per_host`` connections
+    in use, then until fewer than ``max_total`` connections are in use over
+    all hosts, and returns an idle connection if one is available. The host
+    slot is taken first, so requests queued for a busy host do not hold
+    slots other hosts could use.
+    """
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST, ssl_context: Optional[ssl.SSLContext] = None,
+                 idle_timeout: float = IDLE_TIMEOUT, max_total: Optional[int] = None):
+        self.per_host = per_host
+        self.ssl_context = ssl_context
+        self.idle_timeout = idle_timeout
+        self.max_total = max_total
+        self._idle: Dict[HostKey, List[_Connection]] = {}
+        self._limits: Dict[HostKey, asyncio.Semaphore] = {}
+        self._total: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self, key: HostKey, timeout: Optional[float] = None) -> _Connection:
+        """
+        Return a connection to the host, opening a new one if none is idle.
+
+        ``timeout`` limits opening the connection, not waiting for a free slot.
+        """
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.per_host)
+        if self._total is None and self.max_total:
+            self._total = asyncio.Semaphore(self.max_total)
+        await limit.acquire()
+        try:
+            if self._total is not None:
+                await self._total.acquire()
+        except BaseException:
+            limit.release()
+            raise
+        try:
+            idle = self._idle.get(key, [])
+            now = time.monotonic()
+            while idle:
+                connection = idle.pop()
+                if now - connection.idle_since < self.idle_timeout and not connection.reader.at_eof():
+                    connection.reused = True
+                    return connection
+                connection.close()
+            return await asyncio.wait_for(self._open(key), timeout)
+        except BaseException:
+            self._release_slots(key)
+            raise
+
+    def release(self, connection: _Connection, reusable: bool) -> None:
+        """Give a connection back, keeping it open for the next request if possible."""
+        if reusable:
+            connection.idle_since = time.monotonic()
+            self._idle.setdefault(connection.key, []).append(connection)
+        else:
+            connection.close()
+        self._release_slots(connection.key)
+
+    def _release_slots(self, key: HostKey) -> None:
+        if self._total is not None:
+            self._total.release()
+        self._limits[key].release()
+
+    def discard_idle(self, key: HostKey) -> None:
+        """Close the idle connections of one host."""
+        for connection in self._idle.pop(key, []):
+            connection.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        for key in list(self._idle):
+            self.discard_idle(key)
+
+    async def _open(self, key: HostKey) -> _Connection:
+        scheme, host, port = key
+        if scheme == "https":
+            if self.ssl_context is None:
+                self.ssl_context = ssl.create_default_context()
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=self.ssl_context, server_hostname=host)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return _Connection(key, reader, writer)
+
+class HttpClient:
+    """
+    Sends requests over a shared connection pool.
+
+    A client is bound to the event loop it is first used in. ``timeout``
+    applies to opening a connection and, separately, to sending the request
+    and reading the response; waiting for a free connection is not limited.
+    """
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST, timeout: float = DEFAULT_TIMEOUT,
+                 ssl_context: Optional[ssl.SSLContext] = None, max_body: int = MAX_BODY,
+                 max_connections: Optional[int] = None):
+        self.timeout = timeout
+        self.max_body = max_body
+        self.pool = ConnectionPool(per_host, ssl_context, max_total=max_connections)
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.pool.close()
+
+    async def request(self, url: str, method: str = "GET", headers: Optional[Mapping[str, str]] = None,
+                      read_body: bool = True) -> HttpResponse:
+        """
+        Send one request without following redirects.
+
+        Args:
+            url: Absolute http or https URL
+            method: Request method
+            headers: Additional request headers
+            read_body: False to skip the body; the connection is then not reused
+
+        Returns:
+            The response
+
+        Raises:
+            ValueError: If the URL is not supported, the response is malformed
+                or its body is larger than ``max_body``
+            asyncio.TimeoutError: If connecting or the response takes longer than ``timeout``
+            OSError, EOFError: If the connection fails
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in _DEFAULT_PORTS or not parts.hostname:
+            raise ValueError(f"Неподдерживаемый адрес: {url}")
+        host = parts.hostname.encode("idna").decode("ascii")
+        port = parts.port or _DEFAULT_PORTS[scheme]
+        lines = [f"{method} {self._target(parts)} HTTP/1.1",
+                 f"Host: {host if port == _DEFAULT_PORTS[scheme] else f'{host}:{port}'}",
+                 f"User-Agent: {USER_AGENT}",
+                 "Accept: */*"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        keep_alive = read_body or method == "HEAD"
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        key = (scheme, host, port)
+        try:
+            status, response_headers, body = await self._exchange(key, data, method, keep_alive)
+        except _StaleConnection:
+            self.pool.discard_idle(key)
+            status, response_headers, body = await self._exchange(key, data, method, keep_alive)
+        return HttpResponse(status, response_headers, body, url)
+
+    async def get(self, url: str, headers: Optional[Mapping[str, str]] = None,
+                  max_redirects: int = MAX_REDIRECTS) -> HttpResponse:
+        """
+        Send a GET request, following up to ``max_redirects`` redirects.
+
+        Raises:
+            ValueError: If there are more redirects, or as for ``request``
+        """
+        for _ in range(max_redirects + 1):
+            response = await self.request(url, headers=headers)
+            location = response.headers.get("location")
+            if response.status not in REDIRECTS or not location:
+                return response
+            url = urljoin(url, location.strip())
+        raise ValueError("Слишком много перенаправлений")
+
+    def _target(self, parts) -> str:
+        target = quote(parts.path or "/", safe=_TARGET_SAFE)
+        if parts.query:
+            target += "?" + quote(parts.query, safe=_TARGET_SAFE)
+        return target
+
+    async def _exchange(self, key: HostKey, data: bytes, method: str,
+                        keep_alive: bool) -> Tuple[int, Dict[str, str], bytes]:
+        # The timeout starts once a connection is ours, not while queued for one
+        connection = await self.pool.acquire(key, self.timeout)
+        reusable = False
+        try:
+            status, headers, body, keep = await asyncio.wait_for(
+                self._transfer(connection, data, method, keep_alive), self.timeout)
+            # Only a connection whose response was read completely can carry the next request;
+            # errors, timeouts and cancellation while reading the body leave it closed
+            reusable = keep
+            return status, headers, body
+        finally:
+            self.pool.release(connection, reusable)
+
+    async def _transfer(self, connection: _Connection, data: bytes, method: str,
+                        keep_alive: bool) -> Tuple[int, Dict[str, str], bytes, bool]:
+        connection.writer.write(data)
+        try:
+            await connection.writer.drain()
+            version, status, headers = await self._read_head(connection.reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if connection.reused:
+                raise _StaleConnection()
+            raise
+        keep = (keep_alive and version == "HTTP/1.1"
+                and headers.get("connection", "").lower() != "close")
+        body = b""
+        if method != "HEAD" and status not in _NO_BODY:
+            if not keep_alive:
+                keep = False
+            elif headers.get("transfer-encoding", "").lower().endswith("chunked"):
+                body = await self._read_chunked(connection.reader)
+            elif "content-length" in headers:
+                body = await self._read_exactly(connection.reader, headers["content-length"])
+            else:
+                body = await connection.reader.read(self.max_body + 1)
+                keep = False
+                if len(body) > self.max_body:
+                    raise ValueError("Слишком большой ответ")
+        return status, headers, body, keep
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Tuple[str, int, Dict[str, str]]:
+        while True:
+            line = await reader.readuntil(b"\n")
+            try:
+                version, status = line.decode("latin-1").split(None, 2)[:2]
+                status = int(status)
+            except ValueError:
+                raise ValueError(f"Некорректный ответ сервера: {line[:80]!r}")
+            headers: Dict[str, str] = {}
+            for _ in range(MAX_HEADERS):
+                line = await reader.readuntil(b"\n")
+                if line in (b"\r\n", b"\n"):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            else:
+                raise ValueError("Слишком много заголовков в ответе")
+            # Informational responses are followed by the real one
+            if status >= 200:
+                return version, status, headers
+
+    async def _read_exactly(self, reader: asyncio.StreamReader, length: str) -> bytes:
+        try:
+            size = int(length)
+        except ValueError:
+            raise ValueError(f"Некорректная длина ответа: {length!r}")
+        if size < 0 or size > self.max_body:
+            raise ValueError("Слишком большой ответ")
+        return await reader.readexactly(size)
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        body = bytearray()
+        while True:
+            line = await reader.readuntil(b"\n")
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise ValueError(f"Некорректный размер блока: {line[:40]!r}")
+            if size == 0:
+                break
+            if len(body) + size > self.max_body:
+                raise ValueError("Слишком большой ответ")
+            body += await reader.readexactly(size)
+            await reader.readuntil(b"\n")
+        # Trailer fields up to the empty line
+        while (await reader.readuntil(b"\n")) not in (b"\r\n", b"\n"):
+            pass
+        return bytes(body)
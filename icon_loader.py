@@ -0,0 +1,202 @@
+"""
+Asynchronous, cached loading of bookmark icons.
+
+Icons are decoded on a worker thread pool, scaled to the size used by the
+interface and kept in a bounded in-memory LRU cache keyed by path and mtime.
+A lookup checks the mtime of the file again at most every
+``MTIME_CHECK_SECONDS``, so an icon replaced while the application runs is
+reloaded. Relative icon paths, as stored in ``Bookmark.icon``, are resolved
+against the data directory rather than the working directory.
+Every decoded icon is also written to an on-disk thumbnail cache, so later
+launches read a small pre-scaled PNG instead of decoding the original image.
+Callers get a placeholder immediately and are called back when the real icon
+is ready. A failed load is remembered for ``FAILED_RETRY_SECONDS`` only, so an
+icon that was missing or still being written is tried again later.
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QIcon, QImage, QPixmap, QPainter, QColor
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from metrics import metrics
+from bookmark_manager import get_data_dir, data_path
+
+logger = logging.getLogger(__name__)
+
+ICON_CACHE_DIR = get_data_dir() / 'icon_cache'
+THUMBNAIL_SIZE = QSize(32, 32)
+FAILED_RETRY_SECONDS = 30.0
+MTIME_CHECK_SECONDS = 2.0
+
+IconKey = Tuple[str, int]
+
+def thumbnail_path(path: str, mtime_ns: int, size: int) -> Path:
+    """Return the on-disk thumbnail location for a given version of an icon file."""
+    digest = hashlib.sha1(f"{os.path.abspath(path)}|{mtime_ns}|{size}".encode('utf-8')).hexdigest()
+    return ICON_CACHE_DIR / f"{digest}.png"
+
+class _DecodeSignals(QObject):
+    finished = pyqtSignal(str, object, QImage)
+
+class _DecodeTask(QRunnable):
+    """Loads one icon in a worker thread, preferring the thumbnail cache."""
+
+    def __init__(self, path: str, signals: _DecodeSignals):
+        super().__init__()
+        self.path = path
+        self.signals = signals
+
+    @metrics.timed("icons.decode")
+    def run(self):
+        key = None
+        image = QImage()
+        try:
+            source = data_path(self.path)
+            stat = os.stat(source)
+            key = (self.path, stat.st_mtime_ns)
+            thumbnail = thumbnail_path(source, stat.st_mtime_ns, stat.st_size)
+            if thumbnail.exists():
+                image.load(str(thumbnail))
+            if image.isNull() and image.load(source):
+                image = image.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                ICON_CACHE_DIR.mkdir(exist_ok=True)
+                image.save(str(thumbnail), 'PNG')
+        except FileNotFoundError:
+            logger.debug(f"Icon file not found: {self.path}")
+        except Exception as e:
+            logger.warning(f"Failed to load icon {self.path}: {e}")
+        self.signals.finished.emit(self.path, key, image)
+
+class IconService(QObject):
+    """
+    Loads icons off the GUI thread and caches them.
+
+    Signals:
+        icon_ready(str): The icon for the given path has been loaded
+    """
+
+    icon_ready = pyqtSignal(str)
+
+    def __init__(self, max_entries: int = 256, max_threads: int = 2, parent=None):
+        super().__init__(parent)
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[IconKey, QIcon]" = OrderedDict()
+        self._latest: Dict[str, IconKey] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._pending: Dict[str, List[Callable[[QIcon], None]]] = {}
+        self._placeholder: Optional[QIcon] = None
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _DecodeSignals(self)
+        self._signals.finished.connect(self._on_decoded)
+
+    @property
+    def placeholder(self) -> QIcon:
+        """Neutral icon shown while the real one is loading."""
+        if self._placeholder is None:
+            pixmap = QPixmap(THUMBNAIL_SIZE)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(200, 200, 200))
+            painter.drawRoundedRect(4, 4, THUMBNAIL_SIZE.width() - 8, THUMBNAIL_SIZE.height() - 8, 4, 4)
+            painter.end()
+            self._placeholder = QIcon(pixmap)
+        return self._placeholder
+
+    def cached(self, path: str) -> Optional[QIcon]:
+        """Return the cached icon for a path without scheduling a load."""
+        key = self._latest.get(path)
+        if key is None or key not in self._cache:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at.get(path, 0.0) >= MTIME_CHECK_SECONDS:
+            self._checked_at[path] = now
+            try:
+                mtime_ns = os.stat(data_path(path)).st_mtime_ns
+            except OSError:
+                mtime_ns = -1
+            if mtime_ns != key[1]:
+                self.invalidate(path)
+                return None
+        failed_at = self._failed_at.get(path)
+        if failed_at is not None and now - failed_at >= FAILED_RETRY_SECONDS:
+            self.invalidate(path)
+            return None
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def icon(self, path: str) -> QIcon:
+        """Return the icon for a path, or the placeholder while it is being loaded."""
+        icon = self.cached(path)
+        if icon is not None:
+            return icon
+        self.load(path)
+        return self.placeholder
+
+    def load(self, path: str, callback: Optional[Callable[[QIcon], None]] = None) -> None:
+        """
+        Load an icon, calling ``callback`` with the result on the GUI thread.
+
+        The callback runs immediately on a cache hit. Requests for a path that is
+        already being loaded share the same decode.
+        """
+        icon = self.cached(path)
+        if icon is not None:
+            if callback is not None:
+                callback(icon)
+            return
+        waiters = self._pending.get(path)
+        if waiters is None:
+            self._pending[path] = waiters = []
+            self._pool.start(_DecodeTask(path, self._signals))
+        if callback is not None:
+            waiters.append(callback)
+
+    def invalidate(self, path: str) -> None:
+        """Forget the cached icon of a path so that the next request reloads it."""
+        self._failed_at.pop(path, None)
+        self._checked_at.pop(path, None)
+        key = self._latest.pop(path, None)
+        if key is not None:
+            self._cache.pop(key, None)
+
+    def _on_decoded(self, path: str, key: Optional[IconKey], image: QImage) -> None:
+        waiters = self._pending.pop(path, [])
+        if key is None or image.isNull():
+            # Keyed by mtime when the file exists, and retried after FAILED_RETRY_SECONDS
+            icon = QIcon()
+            key = key or (path, -1)
+            self._failed_at[path] = time.monotonic()
+        else:
+            icon = QIcon(QPixmap.fromImage(image))
+            self._failed_at.pop(path, None)
+
+        stale = self._latest.get(path)
+        if stale is not None and stale != key:
+            self._cache.pop(stale, None)
+        self._latest[path] = key
+        self._checked_at[path] = time.monotonic()
+        self._cache[key] = icon
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            old_key, _ = self._cache.popitem(last=False)
+            if self._latest.get(old_key[0]) == old_key:
+                del self._latest[old_key[0]]
+                self._failed_at.pop(old_key[0], None)
+                self._checked_at.pop(old_key[0], None)
+
+        for callback in waiters:
+            try:
+                callback(icon)
+            except RuntimeError:
+                # The widget waiting for this icon has been deleted meanwhile
+                pass
+        self.icon_ready.emit(path)
@@ -0,0 +1,78 @@
+"""
+Background worker for importing browser bookmark exports.
+
+The export is parsed and deduplicated on a separate thread. New bookmarks are
+handed to the GUI thread in chunks, which adds them to the store in one batch
+each. At most ``MAX_PENDING_CHUNKS`` chunks are in flight; the worker waits for
+the GUI to apply them, so memory stays bounded even when parsing is faster than
+the interface can keep up.
+"""
+
+from PyQt5.QtCore import QThread, QSemaphore, pyqtSignal
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+from sity_list import Bookmark
+from bookmark_import import BATCH_SIZE, ImportStats, read_bookmarks
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING_CHUNKS = 2
+
+class ImportWorker(QThread):
+    """
+    Reads an export file in a worker thread.
+
+    Signals:
+        progress(int, int): Amount done and total, in bytes or rows depending on the format
+        chunk_ready(object): A list of (category, Bookmark) pairs to add; the
+            receiver must call ``chunk_done`` once it has applied them
+    """
+
+    progress = pyqtSignal(int, int)
+    chunk_ready = pyqtSignal(object)
+
+    def __init__(self, path: Union[str, Path], known_urls: Iterable[str],
+                 batch_size: int = BATCH_SIZE, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.known_urls = list(known_urls)
+        self.batch_size = batch_size
+        self.stats = ImportStats()
+        self.error: Optional[str] = None
+        self._slots = QSemaphore(MAX_PENDING_CHUNKS)
+        self._last_percent = -1
+
+    def chunk_done(self) -> None:
+        """Acknowledge a chunk, letting the worker continue."""
+        self._slots.release()
+
+    def run(self):
+        chunk: List[Tuple[str, Bookmark]] = []
+        try:
+            for entry in read_bookmarks(self.path, self.known_urls, self._report, self.stats):
+                if self.isInterruptionRequested():
+                    break
+                chunk.append(entry)
+                if len(chunk) >= self.batch_size:
+                    self._emit(chunk)
+                    chunk = []
+            if chunk and not self.isInterruptionRequested():
+                self._emit(chunk)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.error(f"Failed to import {self.path}: {e}")
+            self.error = str(e)
+
+    def _emit(self, chunk: List[Tuple[str, Bookmark]]) -> None:
+        # Blocks while the GUI still has MAX_PENDING_CHUNKS chunks to apply
+        while not self._slots.tryAcquire(1, 100):
+            if self.isInterruptionRequested():
+                return
+        self.chunk_ready.emit(chunk)
+
+    def _report(self, done: int, total: int) -> None:
+        percent = done * 100 // total if total else 100
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.progress.emit(done, total)
@@ -0,0 +1,89 @@
+"""
+Local server of the running instance.
+
+Accepts the command lines that later launches forward through
+``single_instance.send_command`` and runs them in the GUI thread.
+"""
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+import logging
+from typing import Callable, Dict, List, Tuple
+from single_instance import MAX_MESSAGE_SIZE, decode_message, encode_message, is_stale, server_address
+
+logger = logging.getLogger(__name__)
+
+# Receives the forwarded arguments, returns (exit status, output, error text)
+CommandHandler = Callable[[List[str]], Tuple[int, str, str]]
+
+class InstanceServer(QObject):
+    """Listens for forwarded command lines and answers each with the handler's result."""
+
+    def __init__(self, name: str, handler: CommandHandler, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.handler = handler
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self._accept)
+        self._buffers: Dict[QLocalSocket, bytearray] = {}
+
+    def listen(self) -> bool:
+        """
+        Start listening, replacing a socket left behind by a crashed instance.
+
+        The socket is only removed if connecting to it is refused, so a running
+        instance that was too busy to answer ``send_command`` keeps it.
+        """
+        address = server_address(self.name)
+        if is_stale(self.name):
+            QLocalServer.removeServer(address)
+        # Other users of the machine must not be able to drive this instance
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        if not self.server.listen(address):
+            logger.warning(f"Single-instance server unavailable: {self.server.errorString()}")
+            return False
+        logger.info(f"Listening for new launches on {address}")
+        return True
+
+    def close(self):
+        """Stop listening and remove the socket."""
+        self.server.close()
+
+    def _accept(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            self._buffers[connection] = bytearray()
+            connection.readyRead.connect(lambda connection=connection: self._read(connection))
+            connection.disconnected.connect(lambda connection=connection: self._drop(connection))
+
+    def _drop(self, connection: QLocalSocket):
+        self._buffers.pop(connection, None)
+        connection.deleteLater()
+
+    def _read(self, connection: QLocalSocket):
+        buffer = self._buffers.get(connection)
+        if buffer is None:
+            return
+        buffer += bytes(connection.readAll())
+        if b"\n" not in buffer:
+            if len(buffer) > MAX_MESSAGE_SIZE:
+                logger.warning("Dropping oversized request from a new launch")
+                self._buffers.pop(connection, None)
+                connection.abort()
+            return
+        del self._buffers[connection]
+        line = bytes(buffer).split(b"\n", 1)[0]
+        try:
+            argv = decode_message(line).get("argv")
+            if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                raise ValueError("argv must be a list of strings")
+            status, output, error = self.handler(argv)
+        except ValueError as e:
+            logger.warning(f"Invalid request from a new launch: {e}")
+            status, output, error = 2, "", f"Invalid request: {e}"
+        except Exception as e:
+            logger.exception("Forwarded command failed")
+            status, output, error = 1, "", str(e)
+        connection.write(encode_message({"status": status, "output": output, "error": error}))
+        connection.flush()
+        connection.disconnectFromServer()
@@ -0,0 +1,32 @@
+"""
+Loggers that import ``logging`` on first use.
+
+Importing ``logging`` pulls in ``traceback``, ``threading`` and more, a
+noticeable part of a command-line query (``cli``). Modules on that path log
+through a ``LazyLogger`` instead, so a query that logs nothing never imports
+it. Without a configured handler, warnings and errors still reach stderr
+through the ``logging`` fallback handler.
+
+Example:
+    >>> logger = get_logger(__name__)
+    >>> logger.warning("Imports logging now")
+"""
+
+class LazyLogger:
+    """Stands in for ``logging.getLogger(name)``, which is created on the first attribute access."""
+
+    __slots__ = ("name", "_logger")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._logger = None
+
+    def __getattr__(self, attribute: str):
+        if self._logger is None:
+            import logging
+            self._logger = logging.getLogger(self.name)
+        return getattr(self._logger, attribute)
+
+def get_logger(name: str) -> LazyLogger:
+    """Return a logger for ``name`` that imports ``logging`` when it is first used."""
+    return LazyLogger(name)
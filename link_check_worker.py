@@ -0,0 +1,62 @@
+"""
+Background thread running the link checker.
+
+The asyncio event loop of the checker lives in its own thread, results are
+delivered to the GUI thread through a signal as soon as each URL is checked.
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+import asyncio
+import logging
+from typing import Iterable, Optional
+from link_checker import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, LinkCache, LinkChecker
+
+logger = logging.getLogger(__name__)
+
+class LinkCheckWorker(QThread):
+    """
+    Checks a list of URLs in a worker thread.
+
+    Signals:
+        result(object): The LinkStatus of one URL
+    """
+
+    result = pyqtSignal(object)
+
+    def __init__(self, urls: Iterable[str], cache: LinkCache,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 parent=None):
+        super().__init__(parent)
+        self.urls = list(dict.fromkeys(urls))
+        self.cache = cache
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run(self):
+        try:
+            asyncio.run(self._check())
+        except asyncio.CancelledError:
+            logger.info("Link check cancelled")
+
+    def stop(self):
+        """Cancel the running check and wait for the thread to finish."""
+        self.requestInterruption()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # The loop has already finished
+        self.wait()
+
+    async def _check(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if self.isInterruptionRequested():
+            return
+        checker = LinkChecker(self.concurrency, timeout=self.timeout, cache=self.cache)
+        results = await checker.check_all(self.urls, self.result.emit)
+        broken = sum(1 for status in results.values() if status.is_broken)
+        logger.info(f"Checked {len(results)} links, {broken} broken")
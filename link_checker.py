@@ -0,0 +1,182 @@
+"""
+Concurrent link-health checking for bookmarks.
+
+URLs are checked with ``HttpClient``: connections are kept alive and reused
+per host, the number of simultaneous requests is limited both overall and per
+host, and every request has a timeout. Results
+are kept in a cache for ``ttl`` seconds so that repeated checks only contact
+the hosts whose results expired.
+
+A ``HEAD`` request is tried first; servers that do not support it are asked
+again with ``GET``. Redirects are followed. When the chain starts with
+permanent redirects (301/308) that end at a working page, the last permanently
+redirected address is reported as ``location`` so the bookmark can be updated.
+
+Example:
+    >>> checker = LinkChecker(timeout=5)
+    >>> results = asyncio.run(checker.check_all(["https://github.com"]))  # doctest: +SKIP
+    >>> results["https://github.com"].state  # doctest: +SKIP
+    'ok'
+"""
+
+import asyncio
+import logging
+import ssl
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+from http_client import (DEFAULT_PER_HOST, DEFAULT_TIMEOUT, HTTP_ERRORS, MAX_REDIRECTS,
+                         REDIRECTS, HttpClient)
+
+logger = logging.getLogger(__name__)
+
+LINK_OK = "ok"
+LINK_MOVED = "moved"
+LINK_BROKEN = "broken"
+LINK_UNREACHABLE = "unreachable"
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TTL = 3600.0
+
+PERMANENT_REDIRECTS = {301, 308}
+# Answers to HEAD that are often wrong; the URL is asked again with GET
+HEAD_FALLBACK = {400, 403, 404, 405, 501}
+
+class LinkStatus(NamedTuple):
+    """
+    Result of checking one URL.
+
+    ``state`` is one of ``LINK_OK``, ``LINK_MOVED``, ``LINK_BROKEN`` or
+    ``LINK_UNREACHABLE``; ``status`` is the HTTP status of the last response
+    and ``location`` the permanent redirect target of a moved URL.
+    """
+    url: str
+    state: str
+    status: Optional[int] = None
+    location: Optional[str] = None
+    error: Optional[str] = None
+    checked_at: float = 0.0
+
+    @property
+    def is_broken(self) -> bool:
+        """True if the URL does not lead to a working page."""
+        return self.state in (LINK_BROKEN, LINK_UNREACHABLE)
+
+class LinkCache:
+    """Results of earlier checks, each valid for ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._results: Dict[str, LinkStatus] = {}
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, url: str, now: Optional[float] = None) -> Optional[LinkStatus]:
+        """Return the cached result of a URL, or None if there is none or it expired."""
+        result = self._results.get(url)
+        if result is None:
+            return None
+        if (time.time() if now is None else now) - result.checked_at >= self.ttl:
+            del self._results[url]
+            return None
+        return result
+
+    def put(self, result: LinkStatus) -> None:
+        """Store the result of a check."""
+        self._results[result.url] = result
+
+class LinkChecker:
+    """
+    Checks many URLs concurrently.
+
+    A checker is bound to the event loop it is first used in; create a new one
+    (with the same ``cache``) for every ``asyncio.run``.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+                 timeout: float = DEFAULT_TIMEOUT, cache: Optional[LinkCache] = None,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.cache = cache if cache is not None else LinkCache()
+        # The pool limits requests per host first and then overall, so a host
+        # with many bookmarks does not hold slots other hosts could use
+        self.client = HttpClient(per_host, timeout, ssl_context, max_connections=concurrency)
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.client.close()
+
+    async def check_all(self, urls: Iterable[str],
+                        on_result: Optional[Callable[[LinkStatus], None]] = None) -> Dict[str, LinkStatus]:
+        """
+        Check every distinct URL, closing the pooled connections afterwards.
+
+        Args:
+            urls: URLs to check
+            on_result: Called with every result as soon as it is known
+
+        Returns:
+            Results by URL
+        """
+        results: Dict[str, LinkStatus] = {}
+
+        async def check_one(url: str):
+            result = await self.check(url)
+            results[url] = result
+            if on_result is not None:
+                on_result(result)
+
+        try:
+            await asyncio.gather(*(check_one(url) for url in dict.fromkeys(urls)))
+        finally:
+            self.close()
+        return results
+
+    async def check(self, url: str) -> LinkStatus:
+        """Return the status of one URL, from the cache if it is still valid."""
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        result = await self._follow(url)
+        self.cache.put(result)
+        if result.is_broken:
+            logger.info(f"Link check {url}: {result.state} ({result.status or result.error})")
+        return result
+
+    async def _follow(self, url: str) -> LinkStatus:
+        current = url
+        location = None
+        permanent = True
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, headers = await self._request(current)
+                target = headers.get("location")
+                if status not in REDIRECTS or not target:
+                    break
+                permanent = permanent and status in PERMANENT_REDIRECTS
+                current = urljoin(current, target.strip())
+                if permanent:
+                    location = current
+            else:
+                return self._result(url, LINK_BROKEN, status, error="Слишком много перенаправлений")
+        except asyncio.TimeoutError:
+            return self._result(url, LINK_UNREACHABLE, error="Превышено время ожидания")
+        except HTTP_ERRORS as e:
+            return self._result(url, LINK_UNREACHABLE, error=str(e) or type(e).__name__)
+
+        if status >= 400:
+            return self._result(url, LINK_BROKEN, status)
+        if location is not None and location != url:
+            return self._result(url, LINK_MOVED, status, location)
+        return self._result(url, LINK_OK, status)
+
+    def _result(self, url: str, state: str, status: Optional[int] = None,
+                location: Optional[str] = None, error: Optional[str] = None) -> LinkStatus:
+        return LinkStatus(url, state, status, location, error, time.time())
+
+    async def _request(self, url: str) -> Tuple[int, Dict[str, str]]:
+        response = await self.client.request(url, "HEAD")
+        if response.status in HEAD_FALLBACK:
+            # The body of the page is not needed, so that connection is not kept
+            response = await self.client.request(url, "GET", read_body=False)
+        return response.status, response.headers
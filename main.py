@@ -1,27 +1,114 @@
 """
 Main entry point for the Portable Browser application.
 This module initializes the application and handles high-level configuration and error management.
+
+Command-line queries (``--list``, ``--search``, ``--open``) are answered by
+``cli`` without importing Qt, so PyQt5 is only imported when the window starts.
+With ``"single_instance": true`` a launch while the window is running is
+handed to that instance (``single_instance``) instead of starting another one.
+With ``"live_reload": true`` edits of config.json and of the bookmark database
+by other programs are applied to the running window.
+
+Log records are written by a background thread, so slow disks of portable
+machines do not stall the interface. Startup phases and other hot paths are
+timed (``metrics``) and the histograms are written to ``metrics_file`` on exit.
 """
 
 import sys
-import logging
 import json
 from pathlib import Path
-from typing import Dict, Any
-from PyQt5.QtWidgets import QApplication, QMessageBox, QSystemTrayIcon
-from PyQt5.QtGui import QIcon
-from bookmark_main_window import BookmarkMainWindow
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('browser.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from typing import Dict, Any, Optional
+from cli import is_cli_request
+from lazy_logger import get_logger
+
+logger = get_logger(__name__)
+
+def setup_logging() -> 'QueueListener':
+    """
+    Log to browser.log and the console from a background thread.
+
+    Callers only put records on a queue; the returned listener writes them
+    and is stopped at exit, after the remaining records are written.
+    """
+    import atexit
+    import logging
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+    log_queue = queue.SimpleQueue()
+    # Records are formatted by the QueueHandler, the writers only print the message
+    listener = QueueListener(log_queue, logging.FileHandler('browser.log'), logging.StreamHandler())
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[QueueHandler(log_queue)]
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "window_width": 450,
+    "window_height": 650,
+    "min_width": 300,
+    "min_height": 400,
+    "max_width": 800,
+    "max_height": 1200,
+    "button_width": 150,
+    "minimize_to_tray": True,
+    "search_debounce_ms": 150,
+    "search_mode": "substring",
+    "search_limit": 50,
+    "render_mode": "widgets",
+    "store_mode": "indexed",
+    "single_instance": True,
+    "live_reload": True,
+    "start_collapsed": False,
+    "release_offscreen_categories": False,
+    "icon_cache_size": 256,
+    "link_check_concurrency": 16,
+    "link_check_timeout": 10,
+    "link_check_cache_ttl": 3600,
+    "open_batch_size": 5,
+    "open_batch_interval_ms": 1000,
+    "fetch_favicons": True,
+    "favicon_refresh_days": 7,
+    "metrics_file": "metrics.json",
+    "most_used_count": 8,
+    "sort_by_usage": False
+}
+
+# Durations that may be fractional although their defaults are whole numbers
+FRACTIONAL_SETTINGS = {"link_check_timeout", "link_check_cache_ttl", "favicon_refresh_days"}
+
+def config_value_valid(key: str, value: Any) -> bool:
+    """Return True if a config value has the type of its default; numbers must not be booleans."""
+    default = DEFAULT_CONFIG[key]
+    if isinstance(default, bool) or isinstance(value, bool):
+        return isinstance(value, bool) and isinstance(default, bool)
+    if key in FRACTIONAL_SETTINGS:
+        return isinstance(value, (int, float))
+    return isinstance(value, type(default))
+
+def merge_config(config: Dict[str, Any], current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Merge a configuration read from config.json over the defaults.
+
+    Keys missing from ``config`` get their default value. A known key with a
+    value of the wrong type is ignored with a warning and keeps its value
+    from ``current``, or the default. Unknown keys are kept, so the result
+    never lacks a key that ``current`` has.
+    """
+    merged = dict(current or {})
+    merged.update(DEFAULT_CONFIG)
+    for key, value in config.items():
+        if key in DEFAULT_CONFIG and not config_value_valid(key, value):
+            logger.warning(f"Ignoring config value {key}={value!r}, "
+                           f"expected {type(DEFAULT_CONFIG[key]).__name__}")
+            if current is not None and key in current:
+                merged[key] = current[key]
+            continue
+        merged[key] = value
+    return merged
 
 def load_config() -> Dict[str, Any]:
     """
@@ -29,33 +116,27 @@ def load_config() -> Dict[str, Any]:
     If the file doesn't exist, create it with default values.
     """
     config_path = Path('config.json')
-    default_config = {
-        "window_width": 450,
-        "window_height": 650,
-        "min_width": 300,
-        "min_height": 400,
-        "max_width": 800,
-        "max_height": 1200,
-        "button_width": 150,
-        "minimize_to_tray": True
-    }
-    
     try:
         if config_path.exists():
             with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                config = json.load(f)
+            if not isinstance(config, dict):
+                logger.error("Error loading config: it is not a JSON object")
+                return dict(DEFAULT_CONFIG)
+            return merge_config(config)
         else:
             with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4)
-            return default_config
+                json.dump(DEFAULT_CONFIG, f, indent=4)
+            return dict(DEFAULT_CONFIG)
     except Exception as e:
         logger.error(f"Error loading config: {e}")
-        return default_config
+        return dict(DEFAULT_CONFIG)
 
-def import_bookmarks():
-    """Import bookmarks from the appropriate module."""
+def import_bookmarks(config: Dict[str, Any]):
+    """Load bookmarks from the portable bookmark database."""
     try:
-        from sity_list import bookmarks
+        from bookmark_manager import load_bookmarks
+        bookmarks = load_bookmarks(compact=config.get("store_mode") == "compact")
         logger.info("Successfully imported bookmarks")
         return bookmarks
     except ImportError as e:
@@ -63,16 +144,76 @@ def import_bookmarks():
         raise ImportError("Не удалось импортировать данные закладок из 'sity_list.py'. "
                         "Убедитесь, что файл существует и доступен.")
 
-def create_tray_icon(app: QApplication, window: BookmarkMainWindow) -> QSystemTrayIcon:
+def create_tray_icon(app: 'QApplication', window: 'BookmarkMainWindow') -> 'QSystemTrayIcon':
     """Create system tray icon with context menu."""
+    from PyQt5.QtWidgets import QSystemTrayIcon
+    from PyQt5.QtGui import QIcon
     tray_icon = QSystemTrayIcon(QIcon("icons/app.png"), app)
     tray_icon.activated.connect(lambda reason: window.show() if reason == QSystemTrayIcon.DoubleClick else None)
     tray_icon.setToolTip("Мой Портативный Браузер")
-    tray_icon.show()
     return tray_icon
 
+def read_changed_config(config_path: Path, current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Read config.json after it changed, merged over the defaults and the ``current`` settings.
+
+    Returns None if the file is missing or invalid, keeping the current settings.
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring changed config, it cannot be read: {e}")
+        return None
+    if not isinstance(config, dict):
+        logger.warning("Ignoring changed config, it is not a JSON object")
+        return None
+    return merge_config(config, current)
+
+def watch_files(app: 'QApplication', window: 'BookmarkMainWindow', bookmarks) -> 'FileWatcher':
+    """Apply changes of config.json and of the bookmark database made while the window runs."""
+    import sqlite3
+    from file_watcher import FileWatcher
+    from bookmark_manager import reload_bookmarks
+    config_path = Path('config.json').resolve()
+    paths = [config_path]
+    db = bookmarks.backend
+    if db is not None:
+        paths += [db.path, db.path.with_name(db.path.name + '-wal')]
+    watcher = FileWatcher(paths, parent=app)
+
+    def on_changed(path: str):
+        if Path(path) == config_path:
+            config = read_changed_config(config_path, window.config)
+            if config is not None:
+                window.apply_config(config)
+        else:
+            try:
+                from metrics import metrics
+                with metrics.timed("refresh.reload"):
+                    reload_bookmarks(bookmarks)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to reload changed bookmarks: {e}")
+
+    watcher.changed.connect(on_changed)
+    return watcher
+
+def dump_metrics(config: Dict[str, Any]):
+    """Write the collected metrics to ``metrics_file``; an empty value disables it."""
+    path = config.get("metrics_file", "metrics.json")
+    if not path:
+        return
+    from metrics import metrics
+    try:
+        metrics.dump(Path(path))
+    except OSError as e:
+        logger.warning(f"Failed to write metrics: {e}")
+
 def show_error_message(message: str):
     """Display an error message box."""
+    from PyQt5.QtWidgets import QMessageBox
     logger.error(message)
     error_box = QMessageBox()
     error_box.setIcon(QMessageBox.Critical)
@@ -82,17 +223,63 @@ def show_error_message(message: str):
     error_box.exec_()
 
 def main():
-    """Initialize and run the application."""
-    app = QApplication(sys.argv)
-    config = load_config()
+    """Initialize and run the application, or answer a command-line query."""
+    if is_cli_request(sys.argv[1:]):
+        from cli import run
+        return run(sys.argv[1:], load_config())
+
+    # Only the window records metrics, command-line queries do not import them
+    from metrics import metrics
+    with metrics.timed("startup.config"):
+        config = load_config()
+    if config.get("single_instance", True):
+        from bookmark_manager import get_data_dir
+        from cli import forward
+        status = forward(sys.argv[1:], get_data_dir())
+        if status is not None:
+            return status
+
+    setup_logging()
+    from PyQt5.QtWidgets import QApplication
+    with metrics.timed("startup.qt"):
+        app = QApplication(sys.argv)
     
     try:
-        bookmarks = import_bookmarks()
-        main_window = BookmarkMainWindow(bookmarks, config)
+        from bookmark_main_window import BookmarkMainWindow
+        with metrics.timed("startup.bookmarks"):
+            bookmarks = import_bookmarks(config)
+        from bookmark_manager import close_bookmarks, load_frecency, close_frecency
+        with metrics.timed("startup.frecency"):
+            frecency = load_frecency()
+        app.aboutToQuit.connect(lambda: close_bookmarks(bookmarks))
+        app.aboutToQuit.connect(lambda: close_frecency(frecency))
+        with metrics.timed("startup.ui"):
+            main_window = BookmarkMainWindow(bookmarks, config, frecency)
+        app.aboutToQuit.connect(lambda: dump_metrics(config))
+        app.aboutToQuit.connect(main_window.stop_import)
+        app.aboutToQuit.connect(main_window.stop_link_check)
+        app.aboutToQuit.connect(main_window.stop_favicons)
+        app.aboutToQuit.connect(main_window.stop_opening)
+        app.aboutToQuit.connect(main_window.save_session)
         main_window.show()
+
+        if config.get("single_instance", True):
+            from bookmark_manager import get_data_dir
+            from instance_server import InstanceServer
+            from single_instance import server_name
+            instance_server = InstanceServer(server_name(get_data_dir()), main_window.handle_command, parent=app)
+            instance_server.listen()
+            app.aboutToQuit.connect(instance_server.close)
         
-        if config["minimize_to_tray"]:
-            tray_icon = create_tray_icon(app, main_window)
+        # Created hidden when disabled, so a live config change can still show it
+        tray_icon = create_tray_icon(app, main_window)
+        tray_icon.setVisible(config["minimize_to_tray"])
+        main_window.config_changed.connect(
+            lambda changed: tray_icon.setVisible(config["minimize_to_tray"])
+            if "minimize_to_tray" in changed else None)
+
+        if config.get("live_reload", True):
+            watcher = watch_files(app, main_window, bookmarks)
         
         logger.info("Application started successfully")
         return app.exec_()
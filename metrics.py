@@ -0,0 +1,160 @@
+"""
+Latency histograms of the hot paths of the application.
+
+Durations are recorded into histograms with logarithmic buckets, so a
+histogram costs a fixed amount of memory no matter how often it is updated
+and recording is cheap enough for every keystroke. Worker threads (icon
+decoding) record into the same registry, which is guarded by a lock.
+
+The module does not import Qt. ``dump`` writes a JSON snapshot, which the
+window does on exit (``metrics_file``); ``python main.py --metrics`` asks a
+running window for the current snapshot.
+
+Recorded names:
+    startup.config          reading config.json
+    startup.bookmarks       loading the bookmark store
+    startup.frecency        opening the visit statistics
+    startup.qt              creating the QApplication
+    startup.ui              building the main window
+    startup.first_paint     process start until the window is first painted
+    search.filter           filtering the window for the search text
+    icons.decode            loading one icon in a worker thread
+    refresh.changes         applying bookmark changes to the window
+    refresh.reload          reading bookmark changes made by other programs
+
+Example:
+    >>> with metrics.timed("search.filter"):
+    ...     window.filter_bookmarks(text)
+    >>> metrics.snapshot()["search.filter"]["p90_ms"]
+    0.64
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+PROCESS_START = time.perf_counter()
+
+# Bucket upper bounds in milliseconds: 10 µs doubling up to about 84 s
+BUCKET_BOUNDS_MS: List[float] = [0.01 * 2 ** i for i in range(24)]
+
+class Histogram:
+    """Count, sum, extremes and logarithmic bucket counts of recorded durations."""
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        # The last bucket collects everything above the largest bound
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def record(self, ms: float) -> None:
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Return an upper estimate of a percentile in milliseconds.
+
+        The estimate is the bound of the bucket holding the percentile,
+        clamped to the recorded extremes.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max
+                return max(self.min, min(bound, self.max))
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {}
+        for index, count in enumerate(self.buckets):
+            if count:
+                label = (f"<={BUCKET_BOUNDS_MS[index]:g}" if index < len(BUCKET_BOUNDS_MS)
+                         else f">{BUCKET_BOUNDS_MS[-1]:g}")
+                buckets[label] = count
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p90_ms": round(self.percentile(0.9), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "buckets_ms": buckets,
+        }
+
+class Metrics:
+    """Thread-safe registry of named latency histograms."""
+
+    def __init__(self):
+        self.enabled = True
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add a duration in seconds to the histogram ``name``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(seconds * 1000)
+
+    def record_since_start(self, name: str) -> None:
+        """Record the time since the process started, e.g. for the first paint."""
+        self.record(name, time.perf_counter() - PROCESS_START)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """Time a block; the result also works as a function decorator."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return the summary of every histogram, keyed by name."""
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())}
+
+    def dump(self, path: Path) -> None:
+        """Write the snapshot as JSON, replacing the file atomically."""
+        path = Path(path)
+        data = {"uptime_s": round(time.perf_counter() - PROCESS_START, 3),
+                "pid": os.getpid(), "metrics": self.snapshot()}
+        temp = path.with_name(path.name + '.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(temp, path)
+        logger.info(f"Wrote metrics to {path}")
+
+metrics = Metrics()
@@ -0,0 +1,512 @@
+"""
+Ranked fuzzy search over bookmark names.
+
+A query matches a name as a prefix, at a word start, as a substring, as a
+subsequence ("gthb" → "GitHub") or as a subsequence with one typo. Queries are
+also tried in the other keyboard layout ("nfyr" → "танк") and transliterated
+from Cyrillic ("ютуб" → "yutub", which matches "YouTube"); Cyrillic names are
+indexed together with their transliteration.
+
+Every character has a bitmap with one bit per document, stored as a Python
+integer. Candidates are found with big-integer AND/OR over the bitmaps of the
+query characters, so only documents containing those characters are scored.
+The keys of the candidates are joined and searched with the patterns of the
+query in C, so only actual matches are graded in Python, and fuzzy matches
+are not searched for once exact ones fill ``limit``. When a variant of the
+query is too unselective for that, the keys are scanned instead: they are
+kept in one newline-separated string with an offset array, together with
+extra lines for every word tail ("google диск" → "диск"), so prefix and
+word-start matches are plain literal scans in C. One pass finds all tiers;
+once ``limit`` substrings are known it only looks at line starts, and it
+stops once ``limit`` prefixes are found.
+
+A keystroke scores at most ``MAX_SCORED_CANDIDATES`` candidates across all
+tiers, but the cost is not otherwise bounded: an unselective variant still
+costs up to two passes over the key blob, and nothing is reused from the
+previous query. At 100,000 names a short or unselective query takes 2-4 ms
+on a fast machine and several times that on a slow one, which can exceed a
+frame; ``search_debounce_ms`` keeps fast typing from paying it per character.
+
+Documents with a frecency boost are few and are always scored individually,
+so a frequently opened bookmark can outrank a better textual match. The best
+``limit`` results are selected with a heap.
+
+Example:
+    >>> index = RankedSearch()
+    >>> index.add(("Развлечение", "YouTube"), "YouTube")
+    >>> [doc_id for doc_id, score in index.search("ютуб")]
+    [('Развлечение', 'YouTube')]
+"""
+
+import heapq
+import re
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate, islice
+from operator import itemgetter
+from typing import Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Pattern, Set, Tuple
+from sity_list import Bookmark, normalize_key
+
+DEFAULT_LIMIT = 20
+MIN_TYPO_LENGTH = 4
+MAX_SCORED_CANDIDATES = 2000
+
+PREFIX = 1.0
+WORD_START = 0.9
+SUBSTRING = 0.8
+SUBSEQUENCE = 0.7
+TYPO = 0.5
+
+SEPARATORS = ' -_.,:;/()[]'
+
+_LATIN_LAYOUT = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_CYRILLIC_LAYOUT = "йцукенгшщзхъфывапролджэячсмитьбюё"
+_LAYOUT_SWAP = str.maketrans(_LATIN_LAYOUT + _CYRILLIC_LAYOUT, _CYRILLIC_LAYOUT + _LATIN_LAYOUT)
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+})
+_CYRILLIC = re.compile('[а-яё]')
+
+def _clean(text: str) -> str:
+    return " ".join(normalize_key(text).split())
+
+def swap_layout(text: str) -> str:
+    """Retype text in the other keyboard layout (ЙЦУКЕН ↔ QWERTY)."""
+    return text.translate(_LAYOUT_SWAP)
+
+def transliterate(text: str) -> str:
+    """Transliterate lowercase Cyrillic letters to Latin ones."""
+    return text.translate(_TRANSLIT)
+
+def document_keys(text: str) -> Tuple[str, ...]:
+    """Return the normalized search keys of a name: itself and its transliteration."""
+    key = _clean(text)
+    if _CYRILLIC.search(key):
+        latin = transliterate(key)
+        if latin != key:
+            return key, latin
+    return (key,)
+
+def query_variants(query: str) -> List[str]:
+    """Return the normalized query, its layout-swapped and its transliterated forms."""
+    needle = _clean(query)
+    if not needle:
+        return []
+    swapped = swap_layout(needle)
+    variants = [needle]
+    for variant in (swapped, transliterate(needle), transliterate(swapped)):
+        if variant and variant not in variants:
+            variants.append(variant)
+    return variants
+
+def _subsequence_pattern(needle: str) -> str:
+    # Negated classes instead of lazy gaps: the match is found without backtracking
+    parts = [re.escape(needle[0])]
+    for char in needle[1:]:
+        escaped = re.escape(char)
+        parts.append(f'[^\\n{escaped}]*{escaped}')
+    return ''.join(parts)
+
+@lru_cache(maxsize=64)
+def _fuzzy_patterns(needle: str) -> Tuple[Optional[Pattern], Optional[Pattern]]:
+    subsequence = re.compile(_subsequence_pattern(needle)) if len(needle) > 1 else None
+    typo = None
+    if len(needle) >= MIN_TYPO_LENGTH:
+        typo = re.compile('|'.join(_subsequence_pattern(needle[:i] + needle[i + 1:])
+                                   for i in range(len(needle))))
+    return subsequence, typo
+
+@lru_cache(maxsize=64)
+def _literal_patterns(needle: str) -> Tuple[Pattern, Pattern]:
+    """Return patterns finding a needle anywhere and at line starts only."""
+    escaped = re.escape(needle)
+    return re.compile(f'({escaped})'), re.compile(f'\\n({escaped})')
+
+def match_quality(needle: str, key: str) -> float:
+    """
+    Return how well a normalized query matches a key, from 0 (no match) to 1.
+
+    Args:
+        needle: Normalized query
+        key: Normalized document key
+
+    Returns:
+        PREFIX, WORD_START or SUBSTRING for exact occurrences, a value below
+        SUBSEQUENCE that grows with compactness for subsequences, a value below
+        TYPO for a match with one typo, and 0 otherwise
+    """
+    pos = key.find(needle)
+    if pos == 0:
+        return PREFIX
+    if pos > 0:
+        while pos > 0:
+            if key[pos - 1] in SEPARATORS:
+                return WORD_START
+            pos = key.find(needle, pos + 1)
+        return SUBSTRING
+    subsequence, typo = _fuzzy_patterns(needle)
+    if subsequence is not None:
+        match = subsequence.search(key)
+        if match:
+            return SUBSEQUENCE * len(needle) / (match.end() - match.start())
+    if typo is not None and typo.search(key):
+        return TYPO * (len(needle) - 1) / len(needle)
+    return 0.0
+
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+def _set_bits(mask: int) -> Iterator[int]:
+    """Yield the positions of the set bits of a non-negative integer."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for match in re.finditer(b'[^\\x00]', data):
+        base = match.start() * 8
+        for bit in _BYTE_BITS[data[match.start()]]:
+            yield base + bit
+
+class RankedSearch:
+    """Fuzzy, ranked search over a set of documents with optional per-document boosts."""
+
+    def __init__(self, documents: Optional[Iterable[Tuple[Hashable, str]]] = None):
+        self._slots: Dict[Hashable, int] = {}
+        self._ids: List[Optional[Hashable]] = []
+        self._keys: List[Tuple[str, ...]] = []
+        self._free: List[int] = []
+        self._boosts: Dict[int, float] = {}
+        self._char_bits: Dict[str, bytearray] = {}
+        self._char_masks: Dict[str, int] = {}
+        # Key blob: every line is preceded by a newline. Lines of removed or
+        # replaced keys stay in place as stale until the blob is rebuilt.
+        self._blob = "\n"
+        self._blob_length = 1
+        self._pending: List[str] = []
+        self._line_starts = array('q')
+        self._line_slots = array('q')
+        self._line_is_tail = array('b')
+        self._slot_lines: Dict[int, List[int]] = {}
+        self._stale: Set[int] = set()
+        for doc_id, text in documents or ():
+            self.add(doc_id, text)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._slots
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Index a document, replacing any previous text for the same id."""
+        slot = self._slots.get(doc_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._ids)
+                self._ids.append(None)
+                self._keys.append(())
+            self._slots[doc_id] = slot
+            self._ids[slot] = doc_id
+        else:
+            self._unindex(slot)
+        self._keys[slot] = document_keys(text)
+        self._set_chars(slot, True)
+        self._append_lines(slot)
+
+    def remove(self, doc_id: Hashable) -> bool:
+        """Drop a document from the index. Returns False if it was not indexed."""
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return False
+        self._unindex(slot)
+        self._ids[slot] = None
+        self._keys[slot] = ()
+        self._boosts.pop(slot, None)
+        self._free.append(slot)
+        return True
+
+    def set_boost(self, doc_id: Hashable, boost: float) -> None:
+        """Set the ranking bonus of a document; its match quality is multiplied by 1 + boost."""
+        slot = self._slots.get(doc_id)
+        if slot is None:
+            return
+        if boost > 0:
+            self._boosts[slot] = boost
+        else:
+            self._boosts.pop(slot, None)
+
+    def all(self) -> Set[Hashable]:
+        """Return the ids of all indexed documents."""
+        return set(self._slots)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[Hashable, float]]:
+        """
+        Return the best matching documents for a query.
+
+        Args:
+            query: Search string, compared case-insensitively
+            limit: Maximum number of results
+
+        Returns:
+            Up to ``limit`` (doc_id, score) pairs, best first
+        """
+        variants = query_variants(query)
+        if not variants or limit <= 0:
+            return []
+
+        scores: Dict[int, float] = {}
+        for slot, boost in self._boosts.items():
+            quality = max(match_quality(variant, key)
+                          for variant in variants for key in self._keys[slot])
+            if quality:
+                scores[slot] = quality * (1.0 + boost)
+
+        selective = []
+        broad = []
+        for variant in variants:
+            mask = self._candidates(variant, typo=False)
+            if bin(mask).count('1') > MAX_SCORED_CANDIDATES:
+                broad.append(variant)
+            elif mask:
+                selective.append((variant, mask))
+        if broad:
+            self._scan_exact(broad, scores, limit)
+        budget = self._score(selective, scores, MAX_SCORED_CANDIDATES, limit)
+        if len(scores) < limit and budget > 0:
+            typos = [(variant, self._candidates(variant, typo=True))
+                     for variant in variants if len(variant) >= MIN_TYPO_LENGTH]
+            self._score(typos, scores, budget, limit)
+
+        ids = self._ids
+        return [(ids[slot], score)
+                for slot, score in heapq.nlargest(limit, scores.items(), key=itemgetter(1))]
+
+    def _score(self, candidates: List[Tuple[str, int]], scores: Dict[int, float],
+               budget: int, limit: int) -> int:
+        """
+        Score candidate slots per variant, at most ``budget`` of them.
+
+        Returns:
+            The part of ``budget`` that is left
+        """
+        boosts = self._boosts
+        for variant, mask in candidates:
+            if budget <= 0:
+                break
+            slots = list(islice((slot for slot in _set_bits(mask) if slot not in boosts), budget))
+            budget -= len(slots)
+            self._grade(variant, slots, scores, limit)
+        return budget
+
+    def _grade(self, variant: str, slots: List[int], scores: Dict[int, float], limit: int) -> None:
+        """
+        Record the match quality of the slots that match a variant in ``scores``.
+
+        Candidates only contain the characters of the variant, and most of them
+        match it loosely if at all. Their keys are joined into one string and
+        the patterns of the variant run over it, from the exact to the loosest,
+        so Python only handles the matches. Exact matches are graded with
+        ``match_quality``; a fuzzy match is graded from the leftmost match the
+        pattern found, which is the one ``match_quality`` would find. Fuzzy
+        matches rank below exact ones and are not searched for once exact
+        matches fill ``limit``.
+        """
+        keys = self._keys
+        owners = [slot for slot in slots for _ in keys[slot]]
+        lines = [key for slot in slots for key in keys[slot]]
+        starts = list(accumulate((len(line) + 1 for line in lines), initial=0))
+        text = '\n'.join(lines)
+        graded: Set[int] = set()
+
+        def grade(line: int, quality: float) -> None:
+            graded.add(line)
+            slot = owners[line]
+            if quality > scores.get(slot, 0.0):
+                scores[slot] = quality
+
+        anywhere, _ = _literal_patterns(variant)
+        for match in anywhere.finditer(text):
+            line = bisect_right(starts, match.start()) - 1
+            if line not in graded:
+                grade(line, match_quality(variant, lines[line]))
+        if sum(1 for score in scores.values() if score >= SUBSTRING) >= limit:
+            return
+        subsequence, typo = _fuzzy_patterns(variant)
+        if subsequence is not None:
+            for match in subsequence.finditer(text):
+                line = bisect_right(starts, match.start()) - 1
+                if line not in graded:
+                    grade(line, SUBSEQUENCE * len(variant) / (match.end() - match.start()))
+        if typo is not None:
+            quality = TYPO * (len(variant) - 1) / len(variant)
+            for match in typo.finditer(text):
+                line = bisect_right(starts, match.start()) - 1
+                if line not in graded:
+                    grade(line, quality)
+
+    def _scan_exact(self, variants: List[str], scores: Dict[int, float], limit: int) -> None:
+        """
+        Collect exact matches from the key blob, best tier first, until ``limit`` are found.
+
+        All tiers are found in one pass over the blob. Once ``limit`` substring
+        matches are known, the rest of the blob is only searched at line
+        starts, where prefix and word-start matches begin.
+        """
+        self._flush_lines()
+        blob = self._blob
+        starts = self._line_starts
+        slots = self._line_slots
+        tails = self._line_is_tail
+        stale = self._stale
+        boosts = self._boosts
+        prefixes: Dict[int, None] = {}
+        word_starts: Dict[int, None] = {}
+        substrings: Dict[int, None] = {}
+        for variant in variants:
+            # One pattern per variant: an alternation would lose the literal search
+            anywhere, line_start = _literal_patterns(variant)
+            matches: Optional[Iterator] = (anywhere if len(substrings) < limit else line_start).finditer(blob)
+            while matches is not None:
+                resume = None
+                for match in matches:
+                    position = match.start(1)
+                    line = bisect_right(starts, position) - 1
+                    if line in stale or slots[line] in boosts:
+                        continue
+                    slot = slots[line]
+                    if position == starts[line]:
+                        if tails[line]:
+                            word_starts[slot] = None
+                        elif scores.get(slot, 0.0) < PREFIX:
+                            prefixes[slot] = None
+                            if len(prefixes) >= limit:
+                                break
+                    elif not tails[line] and scores.get(slot, 0.0) < SUBSTRING:
+                        substrings[slot] = None
+                        if len(substrings) >= limit:
+                            resume = match.end()
+                            break
+                matches = line_start.finditer(blob, resume) if resume is not None else None
+            if len(prefixes) >= limit:
+                break
+
+        found = 0
+        for tier, quality in ((prefixes, PREFIX), (word_starts, WORD_START), (substrings, SUBSTRING)):
+            for slot in tier:
+                if scores.get(slot, 0.0) < quality:
+                    scores[slot] = quality
+                    found += 1
+                    if found >= limit:
+                        return
+
+    def _candidates(self, variant: str, typo: bool) -> int:
+        """
+        Return the bitmap of documents containing all characters of a variant,
+        or all but one if ``typo`` is set.
+        """
+        masks = [self._char_mask(char) for char in set(variant)]
+        if not typo or len(masks) < 2:
+            mask = masks[0]
+            for other in masks[1:]:
+                mask &= other
+            return mask
+        # OR of the ANDs that leave out one character
+        prefix = [-1]
+        for other in masks:
+            prefix.append(prefix[-1] & other)
+        mask = 0
+        suffix = -1
+        for i in range(len(masks) - 1, -1, -1):
+            mask |= prefix[i] & suffix
+            suffix &= masks[i]
+        return mask
+
+    def _char_mask(self, char: str) -> int:
+        mask = self._char_masks.get(char)
+        if mask is None:
+            bits = self._char_bits.get(char)
+            mask = int.from_bytes(bits, 'little') if bits is not None else 0
+            self._char_masks[char] = mask
+        return mask
+
+    def _set_chars(self, slot: int, present: bool) -> None:
+        index, bit = divmod(slot, 8)
+        for char in set(''.join(self._keys[slot])):
+            bits = self._char_bits.get(char)
+            if bits is None:
+                bits = self._char_bits[char] = bytearray()
+            if len(bits) <= index:
+                bits.extend(bytes(index + 1 - len(bits)))
+            if present:
+                bits[index] |= 1 << bit
+            else:
+                bits[index] &= ~(1 << bit) & 0xFF
+            self._char_masks.pop(char, None)
+
+    def _append_lines(self, slot: int) -> None:
+        lines = self._slot_lines[slot] = []
+        for key in self._keys[slot]:
+            texts = [key]
+            texts.extend(key[i:] for i in range(1, len(key))
+                         if key[i - 1] in SEPARATORS and key[i] not in SEPARATORS)
+            for i, text in enumerate(texts):
+                lines.append(len(self._line_starts))
+                self._line_starts.append(self._blob_length)
+                self._line_slots.append(slot)
+                self._line_is_tail.append(i > 0)
+                self._pending.append(text)
+                self._blob_length += len(text) + 1
+
+    def _unindex(self, slot: int) -> None:
+        self._set_chars(slot, False)
+        self._stale.update(self._slot_lines.pop(slot, ()))
+        if len(self._stale) > len(self._line_starts) // 2:
+            self._rebuild_lines()
+
+    def _flush_lines(self) -> None:
+        if self._pending:
+            self._blob += '\n'.join(self._pending) + '\n'
+            self._pending = []
+
+    def _rebuild_lines(self) -> None:
+        self._blob = "\n"
+        self._blob_length = 1
+        self._pending = []
+        self._line_starts = array('q')
+        self._line_slots = array('q')
+        self._line_is_tail = array('b')
+        self._slot_lines = {}
+        self._stale = set()
+        for slot, doc_id in enumerate(self._ids):
+            if doc_id is not None:
+                self._append_lines(slot)
+
+def rank_bookmarks(query: str, bookmarks: Mapping[str, List[Bookmark]], frecency=None,
+                   limit: int = DEFAULT_LIMIT) -> List[Tuple[str, Bookmark]]:
+    """
+    Rank the bookmarks of all categories against a query.
+
+    Builds a temporary index; long-lived callers should keep a ``RankedSearch``.
+
+    Args:
+        query: Search string
+        bookmarks: Bookmarks by category
+        frecency: Optional ``FrecencyTracker`` whose boosts are applied
+        limit: Maximum number of results
+
+    Returns:
+        Up to ``limit`` (category, bookmark) pairs, best first
+    """
+    index = RankedSearch()
+    sites: Dict[Tuple[str, str], Bookmark] = {}
+    for category, category_bookmarks in bookmarks.items():
+        for bookmark in category_bookmarks:
+            key = (category, bookmark.name)
+            sites[key] = bookmark
+            index.add(key, bookmark.name)
+            if frecency is not None:
+                index.set_boost(key, frecency.boost(bookmark.url))
+    return [(key[0], sites[key]) for key, _ in index.search(query, limit)]
@@ -0,0 +1,114 @@
+"""
+Incremental substring search over bookmark names.
+
+The index maps every 1-, 2- and 3-character gram of the normalized names to the
+documents containing it. Short queries are answered by a single posting list,
+longer queries by intersecting their trigram postings and verifying the
+candidates. When a query extends the previous one, only the previous result set
+is re-checked.
+
+Example:
+    >>> index = SearchIndex()
+    >>> index.add(("Учеба", "GitHub"), "GitHub")
+    >>> index.search("hub")
+    {('Учеба', 'GitHub')}
+"""
+
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+from sity_list import normalize_key
+
+MAX_GRAM = 3
+
+def _grams(text: str) -> Set[str]:
+    """Return all distinct grams of length 1..MAX_GRAM contained in text."""
+    return {text[i:i + size]
+            for size in range(1, MAX_GRAM + 1)
+            for i in range(len(text) - size + 1)}
+
+class SearchIndex:
+    """Gram index answering "name contains query" for a set of documents."""
+
+    def __init__(self, documents: Optional[Iterable[Tuple[Hashable, str]]] = None):
+        self._texts: Dict[Hashable, str] = {}
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._last_query = ""
+        self._last_result: Set[Hashable] = set()
+        for doc_id, text in documents or ():
+            self.add(doc_id, text)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._texts
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Index a document, replacing any previous text for the same id."""
+        if doc_id in self._texts:
+            self.remove(doc_id)
+        key = normalize_key(text)
+        self._texts[doc_id] = key
+        for gram in _grams(key):
+            self._postings.setdefault(gram, set()).add(doc_id)
+        self._last_query = ""
+
+    def remove(self, doc_id: Hashable) -> bool:
+        """Drop a document from the index. Returns False if it was not indexed."""
+        key = self._texts.pop(doc_id, None)
+        if key is None:
+            return False
+        for gram in _grams(key):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[gram]
+        self._last_query = ""
+        return True
+
+    def all(self) -> Set[Hashable]:
+        """Return the ids of all indexed documents."""
+        return set(self._texts)
+
+    def search(self, query: str) -> Set[Hashable]:
+        """
+        Return the ids of documents whose text contains the query.
+
+        Args:
+            query: Search string, compared case-insensitively
+
+        Returns:
+            Set of matching document ids (all documents for an empty query)
+        """
+        needle = normalize_key(query)
+        if not needle:
+            return self.all()
+
+        if self._last_query and self._last_query in needle:
+            # The new query is stricter, so its matches are a subset of the last ones
+            texts = self._texts
+            result = {doc_id for doc_id in self._last_result if needle in texts[doc_id]}
+        elif len(needle) <= MAX_GRAM:
+            result = set(self._postings.get(needle, ()))
+        else:
+            result = self._search_trigrams(needle)
+
+        self._last_query = needle
+        self._last_result = result
+        return set(result)
+
+    def _search_trigrams(self, needle: str) -> Set[Hashable]:
+        postings = []
+        for i in range(len(needle) - MAX_GRAM + 1):
+            posting = self._postings.get(needle[i:i + MAX_GRAM])
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        texts = self._texts
+        return {doc_id for doc_id in candidates if needle in texts[doc_id]}
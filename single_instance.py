@@ -0,0 +1,131 @@
+"""
+Hand-off of launches to an already running instance.
+
+The running window listens on a local socket (``instance_server``), named
+after the data directory so separate portable copies stay independent. A new
+launch first tries to connect: if something answers, it sends its command-line
+arguments as one JSON line and waits for the reply, which carries the exit
+status and the text the command printed. Only if nobody is listening does the
+launch start on its own; if an instance is listening but does not answer in
+time, the launch gives up instead of starting a second window.
+
+This module does not import Qt, so forwarding costs a connection instead of
+a cold start of the application.
+
+Protocol (UTF-8, one JSON object per line):
+    request     {"argv": ["--open", "github"]}
+    reply       {"status": 0, "output": "...", "error": "..."}
+
+Example:
+    >>> reply = send_command(server_name(get_data_dir()), ["--search", "git"])
+    >>> reply is None  # no running instance
+    True
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+SERVER_PREFIX = "PortableBrowser"
+DEFAULT_TIMEOUT = 5.0
+MAX_MESSAGE_SIZE = 1 << 20
+
+class InstanceNotResponding(Exception):
+    """An instance is listening but did not answer in time, or sent an invalid reply."""
+
+def server_name(data_dir: Path) -> str:
+    """Return the local server name of the instance that owns ``data_dir``."""
+    digest = hashlib.sha1(str(Path(data_dir).resolve()).encode('utf-8')).hexdigest()[:16]
+    return f"{SERVER_PREFIX}-{digest}"
+
+def server_address(name: str) -> str:
+    """Return the path of the socket (Unix) or named pipe (Windows) of a server name."""
+    if sys.platform == 'win32':
+        return '\\\\.\\pipe\\' + name
+    return os.path.join(os.environ.get('TMPDIR') or '/tmp', name)
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode('utf-8') + b"\n"
+
+def decode_message(line: bytes) -> Dict[str, Any]:
+    """
+    Parse one protocol line.
+
+    Raises:
+        ValueError: If the line is not a JSON object
+    """
+    message = json.loads(line.decode('utf-8'))
+    if not isinstance(message, dict):
+        raise ValueError("Expected a JSON object")
+    return message
+
+def send_command(name: str, argv: Sequence[str],
+                 timeout: float = DEFAULT_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """
+    Pass command-line arguments to the running instance.
+
+    Returns:
+        The reply of the instance, or None if no instance is listening
+
+    Raises:
+        InstanceNotResponding: If an instance is listening but does not answer
+            within ``timeout`` or its reply is invalid
+    """
+    request = encode_message({"argv": list(argv)})
+    try:
+        if sys.platform == 'win32':
+            # Named pipes have no connect timeout; a busy or hung server is rare
+            with open(server_address(name), 'r+b', buffering=0) as pipe:
+                pipe.write(request)
+                line = pipe.readline(MAX_MESSAGE_SIZE)
+        else:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(server_address(name))
+                sock.sendall(request)
+                line = _read_line(sock)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except OSError as e:
+        raise InstanceNotResponding(f"Running instance did not respond: {e}") from e
+    try:
+        return decode_message(line)
+    except ValueError as e:
+        raise InstanceNotResponding(f"Invalid reply from the running instance: {e}") from e
+
+def is_stale(name: str) -> bool:
+    """
+    Return True if the socket of a server name is left behind by an instance that is gone.
+
+    Only a refused connection counts: a busy instance that is slow to accept
+    keeps its socket. Named pipes disappear with their process, so on Windows
+    nothing is ever stale.
+    """
+    if sys.platform == 'win32':
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(DEFAULT_TIMEOUT)
+        try:
+            sock.connect(server_address(name))
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+    return False
+
+def _read_line(sock: socket.socket) -> bytes:
+    chunks: List[bytes] = []
+    size = 0
+    while size < MAX_MESSAGE_SIZE:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+        if b"\n" in chunk:
+            break
+    return b"".join(chunks).split(b"\n", 1)[0]
@@ -3,7 +3,8 @@ Module for managing bookmarks organized by categories.
 
 This module provides functionality to store and manage bookmarks with their URLs and icons,
 organized into different categories. It supports operations like adding, removing,
-and retrieving bookmarks.
+and retrieving bookmarks. Bookmarks are kept in an indexed ``BookmarkStore`` so
+lookups and mutations do not scan whole categories.
 
 Example:
     >>> get_all_categories()
@@ -12,7 +13,9 @@ Example:
     [Bookmark(name='ChatGPT', url='https://chat.openai.com', icon='icons/chatgpt.png'), ...]
 """
 
-from typing import List, Dict, NamedTuple, Optional
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Iterator, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 
 class Bookmark(NamedTuple):
@@ -20,7 +23,7 @@ class Bookmark(NamedTuple):
     url: str
     icon: str = ""
 
-bookmarks: Dict[str, List[Bookmark]] = {
+DEFAULT_BOOKMARKS: Dict[str, List[Bookmark]] = {
     "ИИ": [
         Bookmark(name="ChatGPT", url="https://chat.openai.com", icon="icons/chatgpt.png"),
         Bookmark(name="Google Gemini", url="https://gemini.google.com/app", icon="icons/gemini.png"),
@@ -87,13 +90,275 @@ def validate_url(url: str) -> bool:
     except:
         return False
 
+def normalize_key(text: str) -> str:
+    """Return the normalized form of a string used for search comparisons."""
+    return text.casefold()
+
+class ChangeSet(NamedTuple):
+    """
+    Net effect of one or more store mutations.
+
+    A renamed bookmark appears as removed under its old name and added under
+    the new one.
+    """
+    categories: List[str]
+    added: List[Tuple[str, Bookmark]]
+    updated: List[Tuple[str, Bookmark, Bookmark]]
+    removed: List[Tuple[str, Bookmark]]
+
+class BookmarkStore(Mapping):
+    """
+    Indexed in-memory storage for bookmarks.
+
+    The store behaves like a read-only ``Dict[str, List[Bookmark]]`` so it can be
+    passed anywhere the plain bookmark dictionary was used. Every bookmark lives
+    in a numbered slot; slots are kept per category in insertion order and are
+    reachable through a (category, name) hash index and a URL index. Search keys
+    are normalized once when a bookmark is stored.
+
+    If a ``backend`` (e.g. ``bookmark_storage.BookmarkDatabase``) is attached,
+    every mutation is written to it before the in-memory state changes.
+    Subscribers receive a ``ChangeSet`` after each mutation, or a single
+    coalesced one at the end of a ``batch()``.
+    """
+
+    def __init__(self, data: Optional[Mapping[str, List[Bookmark]]] = None):
+        self.backend = None
+        self._listeners: List[Callable[[ChangeSet], None]] = []
+        self._batch_depth = 0
+        self._touched: Dict[Tuple[str, str], Optional[Bookmark]] = {}
+        self._touched_categories: Dict[str, None] = {}
+        self.reset(data)
+
+    def subscribe(self, listener: Callable[[ChangeSet], None]) -> None:
+        """Call ``listener`` with a ChangeSet whenever the store changes."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[ChangeSet], None]) -> None:
+        """Stop notifying a listener registered with ``subscribe``."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @contextmanager
+    def batch(self):
+        """
+        Group several mutations.
+
+        The backend writes them in one transaction and subscribers receive one
+        coalesced ChangeSet when the outermost batch ends.
+
+        Example:
+            >>> with bookmarks.batch():
+            ...     bookmarks.remove('Почта', 'Rambler')
+            ...     bookmarks.add('Почта', Bookmark('Proton', 'https://proton.me'))
+        """
+        self._batch_depth += 1
+        try:
+            if self._batch_depth == 1 and self.backend is not None:
+                with self.backend.batch():
+                    yield self
+            else:
+                yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush()
+
+    def reset(self, data: Optional[Mapping[str, List[Bookmark]]] = None,
+              search_keys: Optional[Mapping[str, List[str]]] = None) -> None:
+        """
+        Replace the whole content of the store without touching the backend.
+
+        Args:
+            data: Bookmarks by category
+            search_keys: Already normalized search keys, parallel to ``data``
+        """
+        self._categories: Dict[str, Dict[int, Bookmark]] = {}
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._url_index: Dict[str, Dict[Tuple[str, str], None]] = {}
+        self._search_keys: Dict[int, str] = {}
+        self._next_slot = 0
+        for category, category_bookmarks in (data or {}).items():
+            self._categories.setdefault(category, {})
+            keys = search_keys[category] if search_keys is not None else None
+            for i, bookmark in enumerate(category_bookmarks):
+                self._put(category, bookmark, keys[i] if keys is not None else None)
+
+    def __getitem__(self, category: str) -> List[Bookmark]:
+        return list(self._categories[category].values())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._categories)
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def __contains__(self, category: object) -> bool:
+        return category in self._categories
+
+    def add_category(self, category: str) -> None:
+        """Create an empty category if it does not exist yet."""
+        if category not in self._categories:
+            if self.backend is not None:
+                self.backend.add_category(category)
+            self._categories[category] = {}
+            self._touched_categories[category] = None
+            self._flush_unless_batched()
+
+    def entries(self, category: str) -> List[Tuple[Bookmark, str]]:
+        """Return (bookmark, normalized search key) pairs of a category in order."""
+        keys = self._search_keys
+        return [(bookmark, keys[slot]) for slot, bookmark in self._categories[category].items()]
+
+    def find(self, category: str, name: str) -> Optional[Bookmark]:
+        """Return the bookmark with the given name in a category, or None."""
+        slot = self._slots.get((category, name))
+        if slot is None:
+            return None
+        return self._categories[category][slot]
+
+    def find_by_url(self, url: str) -> List[tuple[str, Bookmark]]:
+        """Return all (category, bookmark) pairs pointing to the given URL."""
+        return [(category, self.find(category, name))
+                for category, name in self._url_index.get(url, ())]
+
+    def add(self, category: str, bookmark: Bookmark) -> None:
+        """
+        Add a bookmark to a category, creating the category if needed.
+
+        A bookmark with the same name in the same category is replaced in place.
+        """
+        if self.backend is not None:
+            self.backend.add(category, bookmark)
+        self._touch(category, bookmark.name)
+        self._categories.setdefault(category, {})
+        self._put(category, bookmark)
+        self._flush_unless_batched()
+
+    def _put(self, category: str, bookmark: Bookmark, search_key: Optional[str] = None) -> None:
+        key = (category, bookmark.name)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._next_slot
+            self._next_slot += 1
+            self._slots[key] = slot
+        else:
+            self._unindex_url(self._categories[category][slot].url, key)
+        self._categories[category][slot] = bookmark
+        self._url_index.setdefault(bookmark.url, {})[key] = None
+        self._search_keys[slot] = search_key if search_key is not None else normalize_key(bookmark.name)
+
+    def update(self, category: str, old_name: str, bookmark: Bookmark) -> bool:
+        """
+        Replace a bookmark, keeping its position in the category.
+
+        Returns:
+            bool: True if the bookmark was replaced, False if it was not found
+
+        Raises:
+            ValueError: If the new name is already used by another bookmark
+        """
+        old_key = (category, old_name)
+        slot = self._slots.get(old_key)
+        if slot is None:
+            return False
+        new_key = (category, bookmark.name)
+        if new_key != old_key and new_key in self._slots:
+            raise ValueError("Bookmark with this name already exists")
+        if self.backend is not None:
+            self.backend.update(category, old_name, bookmark)
+        self._touch(category, old_name)
+        self._touch(category, bookmark.name)
+        if new_key != old_key:
+            del self._slots[old_key]
+            self._slots[new_key] = slot
+        self._unindex_url(self._categories[category][slot].url, old_key)
+        self._categories[category][slot] = bookmark
+        self._url_index.setdefault(bookmark.url, {})[new_key] = None
+        self._search_keys[slot] = normalize_key(bookmark.name)
+        self._flush_unless_batched()
+        return True
+
+    def remove(self, category: str, name: str) -> bool:
+        """Remove a bookmark. Returns False if it was not found."""
+        key = (category, name)
+        if key not in self._slots:
+            return False
+        if self.backend is not None:
+            self.backend.remove(category, name)
+        self._touch(category, name)
+        slot = self._slots.pop(key)
+        bookmark = self._categories[category].pop(slot)
+        self._unindex_url(bookmark.url, key)
+        del self._search_keys[slot]
+        self._flush_unless_batched()
+        return True
+
+    def search(self, query: str) -> List[tuple[str, Bookmark]]:
+        """Return (category, bookmark) pairs whose names contain the query."""
+        needle = normalize_key(query)
+        keys = self._search_keys
+        return [(category, bookmark)
+                for category, slots in self._categories.items()
+                for slot, bookmark in slots.items()
+                if needle in keys[slot]]
+
+    def _touch(self, category: str, name: str) -> None:
+        """Remember the state of a bookmark before its first change in this batch."""
+        key = (category, name)
+        if key not in self._touched:
+            self._touched[key] = self.find(category, name)
+        self._touched_categories[category] = None
+
+    def _flush_unless_batched(self) -> None:
+        if self._batch_depth == 0:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Turn the recorded changes into a ChangeSet and notify subscribers."""
+        if not self._touched_categories:
+            return
+        changes = ChangeSet(list(self._touched_categories), [], [], [])
+        for (category, name), before in self._touched.items():
+            after = self.find(category, name)
+            if before is None and after is not None:
+                changes.added.append((category, after))
+            elif before is not None and after is None:
+                changes.removed.append((category, before))
+            elif before != after:
+                changes.updated.append((category, before, after))
+        self._touched = {}
+        self._touched_categories = {}
+        for listener in list(self._listeners):
+            listener(changes)
+
+    def _unindex_url(self, url: str, key: Tuple[str, str]) -> None:
+        keys = self._url_index.get(url)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._url_index[url]
+
+def shared_store() -> BookmarkStore:
+    """Return the shared store ``bookmarks``, creating it from the built-in bookmarks on first use."""
+    store = globals().get('bookmarks')
+    if store is None:
+        store = globals()['bookmarks'] = BookmarkStore(DEFAULT_BOOKMARKS)
+    return store
+
+def __getattr__(name: str):
+    # ``sity_list.bookmarks`` is created on first access, so importing the module stays cheap
+    if name == 'bookmarks':
+        return shared_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_all_categories() -> List[str]:
     """Return a list of all bookmark categories."""
-    return list(bookmarks.keys())
+    return list(shared_store().keys())
 
 def get_bookmarks_for_category(category: str) -> List[Bookmark]:
     """Return all bookmarks for a given category."""
-    return bookmarks.get(category, [])
+    return shared_store().get(category, [])
 
 def search_bookmarks(query: str) -> List[tuple[str, Bookmark]]:
     """
@@ -105,12 +370,7 @@ def search_bookmarks(query: str) -> List[tuple[str, Bookmark]]:
     Returns:
         List of tuples containing category and matching bookmarks
     """
-    results = []
-    for category, category_bookmarks in bookmarks.items():
-        for bookmark in category_bookmarks:
-            if query.lower() in bookmark.name.lower():
-                results.append((category, bookmark))
-    return results
+    return shared_store().search(query)
 
 def update_bookmark(category: str, old_name: str, new_name: str = None, 
                    new_url: str = None, new_icon: str = None) -> bool:
@@ -127,21 +387,18 @@ def update_bookmark(category: str, old_name: str, new_name: str = None,
     Returns:
         bool: True if bookmark was updated, False if not found
     """
-    if category not in bookmarks:
+    store = shared_store()
+    bookmark = store.find(category, old_name)
+    if bookmark is None:
         return False
         
-    for i, bookmark in enumerate(bookmarks[category]):
-        if bookmark.name == old_name:
-            name = new_name or bookmark.name
-            url = new_url or bookmark.url
-            icon = new_icon or bookmark.icon
-            
-            if new_url and not validate_url(new_url):
-                raise ValueError("Invalid URL provided")
-                
-            bookmarks[category][i] = Bookmark(name=name, url=url, icon=icon)
-            return True
-    return False
+    if new_url and not validate_url(new_url):
+        raise ValueError("Invalid URL provided")
+        
+    return store.update(category, old_name, Bookmark(
+        name=new_name or bookmark.name,
+        url=new_url or bookmark.url,
+        icon=new_icon or bookmark.icon))
 
 def add_bookmark(category: str, name: str, url: str, icon: str = "") -> None:
     """
@@ -159,17 +416,11 @@ def add_bookmark(category: str, name: str, url: str, icon: str = "") -> None:
     if not validate_url(url):
         raise ValueError("Invalid URL provided")
         
-    if category not in bookmarks:
-        bookmarks[category] = []
-    bookmarks[category].append(Bookmark(name=name, url=url, icon=icon))
+    shared_store().add(category, Bookmark(name=name, url=url, icon=icon))
 
 def remove_bookmark(category: str, name: str) -> bool:
     """Remove a bookmark from a category."""
-    if category in bookmarks:
-        initial_count = len(bookmarks[category])
-        bookmarks[category] = [b for b in bookmarks[category] if b.name != name]
-        return len(bookmarks[category]) < initial_count
-    return False
+    return shared_store().remove(category, name)
 
 if __name__ == "__main__":
     print("Available categories:", get_all_categories())
@@ -0,0 +1,56 @@
+"""
+Dialog for choosing between conflicting versions of bookmarks during a sync.
+"""
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+                             QComboBox, QDialogButtonBox, QHeaderView)
+from typing import Dict, List, Optional
+from sity_list import Bookmark
+from bookmark_sync import LOCAL, REMOTE, BookmarkKey, Conflict
+
+CHOICES = [("Оставить эту", LOCAL), ("Взять из другой копии", REMOTE), ("Решить позже", None)]
+
+def describe(bookmark: Optional[Bookmark]) -> str:
+    return bookmark.url if bookmark is not None else "(удалена)"
+
+class SyncConflictDialog(QDialog):
+    """Lists the conflicts of a sync with a choice of the version to keep for each."""
+
+    def __init__(self, conflicts: List[Conflict], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Конфликты синхронизации")
+        self.conflicts = conflicts
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Закладки, измененные в обеих копиях: {len(conflicts)}"))
+
+        self.table = QTableWidget(len(conflicts), 5, self)
+        self.table.setHorizontalHeaderLabels(["Категория", "Название", "Эта копия", "Другая копия", "Оставить"])
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.combos: List[QComboBox] = []
+        for row, conflict in enumerate(conflicts):
+            for column, text in enumerate((conflict.category, conflict.name,
+                                           describe(conflict.local), describe(conflict.remote))):
+                self.table.setItem(row, column, QTableWidgetItem(text))
+            combo = QComboBox()
+            for label, _ in CHOICES:
+                combo.addItem(label)
+            self.table.setCellWidget(row, 4, combo)
+            self.combos.append(combo)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        layout.addWidget(self.table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.resize(700, 400)
+
+    def choices(self) -> Dict[BookmarkKey, str]:
+        """Return the chosen version by (category, name); undecided conflicts are left out."""
+        result = {}
+        for conflict, combo in zip(self.conflicts, self.combos):
+            choice = CHOICES[combo.currentIndex()][1]
+            if choice is not None:
+                result[(conflict.category, conflict.name)] = choice
+        return result
@@ -0,0 +1,80 @@
+"""
+Local stand-in HTTP server for the network tests.
+
+Routes map a path to the raw bytes of the response, or to a coroutine
+function ``handler(writer)`` that writes the response itself. The server
+counts connections, records every request path and its headers (names in
+lower case) and the largest number of requests in progress at the same time.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Union
+
+Route = Union[bytes, Callable[[asyncio.StreamWriter], Awaitable[None]]]
+
+def response(status: int = 200, body: bytes = b"", headers: Dict[str, str] = None) -> bytes:
+    """Build a response with a ``Content-Length`` body."""
+    lines = [f"HTTP/1.1 {status} X", f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+class StandInServer:
+    def __init__(self, routes: Dict[str, Route], delay: float = 0.0):
+        self.routes = routes
+        self.delay = delay
+        self.connections = 0
+        self.requests: List[str] = []
+        self.headers: List[Dict[str, str]] = []
+        self.active = 0
+        self.max_active = 0
+        self.stopped = asyncio.Event()
+        self._server = None
+        self._writers: List[asyncio.StreamWriter] = []
+
+    async def __aenter__(self) -> "StandInServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.stopped.set()
+        self._server.close()
+        for writer in self._writers:
+            writer.close()
+        await self._server.wait_closed()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                path = line.split()[1].decode("latin-1")
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.requests.append(path)
+                self.headers.append(headers)
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                try:
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    route = self.routes.get(path, response(404))
+                    if isinstance(route, bytes):
+                        writer.write(route)
+                    else:
+                        await route(writer)
+                    await writer.drain()
+                finally:
+                    self.active -= 1
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
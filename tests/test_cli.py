@@ -0,0 +1,23 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from cli import instance_may_be_running
+from single_instance import server_address, server_name
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def test_instance_check_finds_server_sockets(tmp_path, monkeypatch):
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    assert not instance_may_be_running()
+    Path(server_address(server_name(tmp_path))).touch()
+    assert instance_may_be_running()
+
+def test_query_does_not_import_heavy_modules(tmp_path):
+    code = ("import sys, main; sys.argv = ['main.py', '--list', '--data-dir', sys.argv[1]]; main.main(); "
+            "print(sorted({'logging', 'single_instance', 'socket', 'hashlib', 'frecency'} & set(sys.modules)))")
+    # The first run creates the database and the snapshot
+    for _ in range(2):
+        result = subprocess.run([sys.executable, "-c", code, str(tmp_path)], cwd=ROOT, capture_output=True,
+                                text=True, env={"TMPDIR": str(tmp_path)}, check=True)
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,26 @@
+from main import DEFAULT_CONFIG, merge_config, read_changed_config
+
+def test_missing_keys_get_defaults():
+    assert merge_config({"button_width": 200}) == {**DEFAULT_CONFIG, "button_width": 200}
+
+def test_wrong_types_keep_current_values():
+    current = {**DEFAULT_CONFIG, "window_width": 500}
+    merged = merge_config({"window_width": "450", "minimize_to_tray": 1, "button_width": True,
+                           "link_check_timeout": 2.5}, current)
+    assert merged["window_width"] == 500
+    assert merged["minimize_to_tray"] is True
+    assert merged["button_width"] == DEFAULT_CONFIG["button_width"]
+    assert merged["link_check_timeout"] == 2.5
+
+def test_changed_file_never_drops_keys(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"min_width": 350}', encoding="utf-8")
+    current = {**DEFAULT_CONFIG, "custom": 1}
+    config = read_changed_config(path, current)
+    assert set(current) <= set(config)
+    assert config["min_width"] == 350
+
+def test_invalid_file_is_ignored(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("[1, 2]", encoding="utf-8")
+    assert read_changed_config(path, dict(DEFAULT_CONFIG)) is None
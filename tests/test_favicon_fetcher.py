@@ -0,0 +1,127 @@
+import asyncio
+
+from favicon_fetcher import FaviconCache, FaviconFetcher, icon_links
+from stand_in import StandInServer, response
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"png icon"
+ICO = b"\x00\x00\x01\x00" + b"ico icon"
+
+def page(*links: str) -> bytes:
+    head = "".join(links)
+    return response(200, f"<html><head>{head}</head><body>Hi</body></html>".encode(),
+                    {"Content-Type": "text/html; charset=utf-8"})
+
+def fetch(cache, routes, **fetcher_options):
+    async def main():
+        async with StandInServer(routes) as server:
+            fetcher = FaviconFetcher(cache, timeout=2, **fetcher_options)
+            icons = await fetcher.fetch_all([server.url("/")])
+            return icons.get(server.url("/")), server
+    return asyncio.run(main())
+
+def test_icon_links_prefer_the_preferred_size():
+    html = ('<link rel="apple-touch-icon" href="/apple.png">'
+            '<link rel="icon" href="/16.png" sizes="16x16">'
+            '<link rel="shortcut icon" href="/32.png" sizes="32x32">')
+    assert icon_links(html, "https://example.com/a/") == [
+        "https://example.com/32.png", "https://example.com/apple.png", "https://example.com/16.png"]
+
+def test_icon_declared_by_the_page(tmp_path):
+    cache = FaviconCache(tmp_path)
+    routes = {"/": page('<link rel="icon" href="/static/icon.png" sizes="32x32">'),
+              "/static/icon.png": response(200, PNG), "/favicon.ico": response(200, ICO)}
+    path, server = fetch(cache, routes)
+    assert path.endswith(".png")
+    assert (tmp_path / path.rsplit("/", 1)[1]).read_bytes() == PNG
+    assert "/favicon.ico" not in server.requests
+
+def test_favicon_ico_fallback(tmp_path):
+    cache = FaviconCache(tmp_path)
+    routes = {"/": page(), "/favicon.ico": response(200, ICO)}
+    path, _ = fetch(cache, routes)
+    assert path.endswith(".ico")
+
+def test_fallback_after_oversized_page(tmp_path):
+    cache = FaviconCache(tmp_path)
+    routes = {"/": response(200, b"<html>" + b"x\r\n" * 300_000, {"Content-Type": "text/html"}),
+              "/favicon.ico": response(200, ICO)}
+    path, _ = fetch(cache, routes, per_host=1)
+    assert path is not None and path.endswith(".ico")
+
+def fetch_twice(routes, first_cache, second_cache, change_routes=None, **fetcher_options):
+    """Fetch the icon of one stand-in site twice; returns both paths and the requests of the second fetch."""
+    async def main():
+        async with StandInServer(routes) as server:
+            url = server.url("/")
+            first = (await FaviconFetcher(first_cache, timeout=2).fetch_all([url])).get(url)
+            if change_routes is not None:
+                change_routes(routes)
+            start = len(server.requests)
+            fetcher = FaviconFetcher(second_cache, timeout=2, **fetcher_options)
+            second = (await fetcher.fetch_all([url])).get(url)
+            return first, second, server.requests[start:], server.headers[start:]
+    return asyncio.run(main())
+
+def test_site_without_icon_is_remembered(tmp_path):
+    cache = FaviconCache(tmp_path)
+    routes = {"/": page(), "/favicon.ico": response(404)}
+    first, second, requests, _ = fetch_twice(routes, cache, cache)
+    assert first is None and second is None
+    assert requests == []
+
+def test_revalidation_with_etag_and_last_modified(tmp_path):
+    validators = {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    routes = {"/": page(), "/favicon.ico": response(200, ICO, validators)}
+    reloaded = FaviconCache(tmp_path)
+
+    async def not_modified(writer):
+        writer.write(response(304))
+
+    def change_routes(routes):
+        routes["/favicon.ico"] = not_modified
+
+    # The first fetcher saves the index, the second one reads it from disk
+    first, second, requests, headers = fetch_twice(routes, FaviconCache(tmp_path), reloaded,
+                                                   change_routes, refresh_after=0)
+    assert second == first
+    assert requests == ["/favicon.ico"]
+    assert headers[0]["if-none-match"] == '"v1"'
+    assert headers[0]["if-modified-since"] == validators["Last-Modified"]
+    assert next(iter(reloaded.entries.values())).etag == '"v1"'
+
+def test_changed_icon_replaces_the_cached_one(tmp_path):
+    cache = FaviconCache(tmp_path)
+    routes = {"/": page(), "/favicon.ico": response(200, ICO, {"ETag": '"v1"'})}
+
+    def change_routes(routes):
+        routes["/favicon.ico"] = response(200, PNG, {"ETag": '"v2"'})
+
+    first, second, _, _ = fetch_twice(routes, cache, cache, change_routes, refresh_after=0)
+    assert first.endswith(".ico") and second.endswith(".png")
+    assert cache.prune() == 1
+
+def test_identical_icons_are_stored_once(tmp_path):
+    cache = FaviconCache(tmp_path)
+    routes = {"/": page(), "/favicon.ico": response(200, ICO)}
+
+    async def main():
+        async with StandInServer(routes) as first, StandInServer(routes) as second:
+            fetcher = FaviconFetcher(cache, timeout=2)
+            return await fetcher.fetch_all([first.url("/"), second.url("/")])
+
+    icons = asyncio.run(main())
+    assert len(icons) == 2
+    assert len(set(icons.values())) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        ["index.json", icons.popitem()[1].rsplit("/", 1)[1]])
+
+def test_paths_are_relative_to_the_data_dir(tmp_path, monkeypatch):
+    import bookmark_manager
+    import favicon_fetcher
+    monkeypatch.setattr(bookmark_manager, "get_data_dir", lambda: tmp_path)
+    monkeypatch.setattr(favicon_fetcher, "get_data_dir", lambda: tmp_path)
+    cache = FaviconCache(tmp_path / "favicons")
+    path, _ = fetch(cache, {"/": page(), "/favicon.ico": response(200, ICO)})
+    assert path.startswith("favicons/") and path.endswith(".ico")
+    assert cache.owns(path) and cache.owns(str(tmp_path / path))
+    assert not cache.owns("icons/app.png")
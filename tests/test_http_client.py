@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from http_client import HttpClient
+from stand_in import StandInServer, response
+
+def chunked(*chunks: bytes) -> bytes:
+    body = b"".join(b"%x\r\n%s\r\n" % (len(chunk), chunk) for chunk in chunks)
+    return b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + body + b"0\r\n\r\n"
+
+def run(routes, scenario, **server_options):
+    async def main():
+        async with StandInServer(routes, **server_options) as server:
+            return await scenario(server)
+    return asyncio.run(main())
+
+def test_oversized_chunked_body_does_not_poison_the_connection():
+    routes = {"/big": chunked(b"abcde", b"abcde", b"abcde"), "/ok": response(200, b"fine")}
+
+    async def scenario(server):
+        client = HttpClient(per_host=1, timeout=2, max_body=10)
+        try:
+            with pytest.raises(ValueError, match="Слишком большой ответ"):
+                await client.request(server.url("/big"))
+            return await client.request(server.url("/ok"))
+        finally:
+            client.close()
+
+    assert run(routes, scenario).body == b"fine"
+
+def test_oversized_content_length_does_not_poison_the_connection():
+    routes = {"/big": response(200, b"abcde\r\n" * 4), "/ok": response(200, b"fine")}
+
+    async def scenario(server):
+        client = HttpClient(per_host=1, timeout=2, max_body=10)
+        try:
+            with pytest.raises(ValueError):
+                await client.request(server.url("/big"))
+            return await client.request(server.url("/ok"))
+        finally:
+            client.close()
+
+    assert run(routes, scenario).body == b"fine"
+
+def test_timeout_while_reading_body_is_followed_by_working_request():
+    routes = {"/ok": response(200, b"fine")}
+
+    async def scenario(server):
+        async def stall(writer):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nabcde")
+            await writer.drain()
+            await server.stopped.wait()
+
+        routes["/stall"] = stall
+        client = HttpClient(per_host=1, timeout=0.2)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await client.request(server.url("/stall"))
+            result = await client.request(server.url("/ok"))
+            return result, server.connections
+        finally:
+            client.close()
+
+    result, connections = run(routes, scenario)
+    assert result.body == b"fine"
+    assert connections == 2
+
+def test_keep_alive_connection_is_reused():
+    routes = {"/a": response(200, b"a"), "/b": chunked(b"b")}
+
+    async def scenario(server):
+        client = HttpClient(timeout=2)
+        try:
+            bodies = [(await client.request(server.url(path))).body for path in ("/a", "/b", "/a")]
+            return bodies, server.connections
+        finally:
+            client.close()
+
+    assert run(routes, scenario) == ([b"a", b"b", b"a"], 1)
+
+def test_chunked_body_is_joined():
+    routes = {"/chunked": chunked(b"Hello, ", b"world", b"!")}
+
+    async def scenario(server):
+        client = HttpClient(timeout=2)
+        try:
+            return await client.request(server.url("/chunked"))
+        finally:
+            client.close()
+
+    assert run(routes, scenario).body == b"Hello, world!"
+
+def test_requests_per_host_are_limited():
+    routes = {f"/{i}": response(200, str(i).encode()) for i in range(6)}
+
+    async def scenario(server):
+        client = HttpClient(per_host=2, timeout=2)
+        try:
+            responses = await asyncio.gather(*(client.request(server.url(path)) for path in routes))
+            return [r.body for r in responses], server.max_active, server.connections
+        finally:
+            client.close()
+
+    bodies, max_active, connections = run(routes, scenario, delay=0.05)
+    assert bodies == [str(i).encode() for i in range(6)]
+    assert max_active == 2
+    assert connections == 2
+
+def test_get_follows_redirects():
+    routes = {"/old": response(301, headers={"Location": "/middle"}),
+              "/middle": response(302, headers={"Location": "/new"}),
+              "/new": response(200, b"here")}
+
+    async def scenario(server):
+        client = HttpClient(timeout=2)
+        try:
+            return await client.get(server.url("/old")), server.url("/new")
+        finally:
+            client.close()
+
+    result, final_url = run(routes, scenario)
+    assert (result.status, result.body, result.url) == (200, b"here", final_url)
+
+def test_too_many_redirects():
+    routes = {"/loop": response(302, headers={"Location": "/loop"})}
+
+    async def scenario(server):
+        client = HttpClient(timeout=2)
+        try:
+            with pytest.raises(ValueError, match="перенаправлений"):
+                await client.get(server.url("/loop"), max_redirects=3)
+            return server.requests
+        finally:
+            client.close()
+
+    assert run(routes, scenario) == ["/loop"] * 4
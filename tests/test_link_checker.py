@@ -0,0 +1,81 @@
+import asyncio
+
+from link_checker import (LINK_BROKEN, LINK_MOVED, LINK_OK, LINK_UNREACHABLE, LinkCache,
+                          LinkChecker, LinkStatus)
+from stand_in import StandInServer, response
+
+def check(routes, paths, **checker_options):
+    async def main():
+        async with StandInServer(routes) as server:
+            checker = LinkChecker(**checker_options)
+            results = await checker.check_all(server.url(path) for path in paths)
+            return {url.rsplit(str(server.port), 1)[1]: result for url, result in results.items()}, server
+    return asyncio.run(main())
+
+def test_states():
+    routes = {"/ok": response(200),
+              "/gone": response(404),
+              "/moved": response(301, headers={"Location": "/ok"}),
+              "/temporary": response(302, headers={"Location": "/ok"})}
+    results, _ = check(routes, list(routes), timeout=2)
+    assert results["/ok"].state == LINK_OK
+    assert results["/gone"].state == LINK_BROKEN
+    assert results["/gone"].status == 404
+    assert results["/moved"].state == LINK_MOVED
+    assert results["/moved"].location.endswith("/ok")
+    assert results["/temporary"].state == LINK_OK
+
+def test_connections_are_reused_across_checks():
+    routes = {"/a": response(200), "/b": response(200), "/c": response(200)}
+    results, server = check(routes, list(routes), per_host=1, timeout=2)
+    assert all(result.state == LINK_OK for result in results.values())
+    assert server.connections == 1
+
+def test_timeout_is_unreachable():
+    routes = {}
+
+    async def main():
+        async with StandInServer(routes) as server:
+            async def stall(writer):
+                await server.stopped.wait()
+            routes["/stall"] = stall
+            checker = LinkChecker(timeout=0.2)
+            return (await checker.check_all([server.url("/stall")])).popitem()[1]
+
+    result = asyncio.run(main())
+    assert result.state == LINK_UNREACHABLE
+    assert result.is_broken
+
+def test_cache_expires():
+    cache = LinkCache(ttl=10)
+    cache.put(LinkStatus("https://example.com", LINK_OK, 200, checked_at=100.0))
+    assert cache.get("https://example.com", now=105.0).status == 200
+    assert cache.get("https://example.com", now=111.0) is None
+    assert len(cache) == 0
+
+def test_waiting_for_a_busy_host_does_not_count_against_the_timeout():
+    routes = {f"/{i}": response(200) for i in range(10)}
+
+    async def main():
+        async with StandInServer(routes, delay=0.3) as server:
+            checker = LinkChecker(per_host=2, timeout=1)
+            results = await checker.check_all(server.url(path) for path in routes)
+            return results, server.max_active
+
+    results, max_active = asyncio.run(main())
+    assert [result.state for result in results.values()] == [LINK_OK] * 10
+    assert max_active == 2
+
+def test_busy_host_does_not_starve_other_hosts():
+    busy_routes = {f"/{i}": response(200) for i in range(8)}
+
+    async def main():
+        async with StandInServer(busy_routes, delay=0.2) as busy, \
+                StandInServer({"/other": response(200)}, delay=0.2) as other:
+            order = []
+            checker = LinkChecker(concurrency=3, per_host=2, timeout=5)
+            urls = [busy.url(path) for path in busy_routes] + [other.url("/other")]
+            await checker.check_all(urls, lambda result: order.append(result.url))
+            return order.index(other.url("/other"))
+
+    assert asyncio.run(main()) < 3
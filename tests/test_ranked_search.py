@@ -0,0 +1,59 @@
+import ranked_search
+from ranked_search import RankedSearch, match_quality, query_variants
+
+NAMES = ["GitHub", "GitLab", "Google Диск", "YouTube", "Танк онлайн", "Gmail", "Habr",
+         "Gist", "Stack Overflow", "Gitter", "Лента", "Get things done", "Goth beat"]
+
+def build(names=NAMES):
+    index = RankedSearch()
+    for name in names:
+        index.add(name, name)
+    return index
+
+def brute_force(query, names=NAMES):
+    variants = query_variants(query)
+    scores = {}
+    for name in names:
+        keys = ranked_search.document_keys(name)
+        quality = max(match_quality(variant, key) for variant in variants for key in keys)
+        if quality:
+            scores[name] = quality
+    return scores
+
+def test_scores_match_brute_force():
+    index = build()
+    for query in ["git", "gthb", "ютуб", "nfyr", "g", "o", "gihtub", "диск", "lenta", "zzqx", "m", "]"]:
+        assert dict(index.search(query, limit=100)) == brute_force(query), query
+
+def test_variants_are_never_empty():
+    assert query_variants("m") == ["m", "ь"]
+    assert all(query_variants("]"))
+
+def test_scored_candidates_are_capped_per_keystroke(monkeypatch):
+    index = build([f"gxtxhxb {i}" for i in range(8)] + [f"gxtxhx {i}" for i in range(8)])
+    scored = []
+    grade = RankedSearch._grade
+
+    def counting(self, variant, slots, scores, limit):
+        scored.append(len(slots))
+        grade(self, variant, slots, scores, limit)
+
+    monkeypatch.setattr(ranked_search, "MAX_SCORED_CANDIDATES", 10)
+    monkeypatch.setattr(RankedSearch, "_grade", counting)
+    assert len(index.search("gthb")) <= 10
+    assert sum(scored) == 10
+
+def test_fuzzy_matches_are_skipped_once_exact_ones_fill_the_limit(monkeypatch):
+    index = build(["Gitter", "GitHub", "GitLab", "Great idea tracker"])
+    fuzzy = []
+    patterns = ranked_search._fuzzy_patterns
+
+    def recording(needle):
+        fuzzy.append(needle)
+        return patterns(needle)
+
+    monkeypatch.setattr(ranked_search, "_fuzzy_patterns", recording)
+    assert sorted(name for name, _ in index.search("git", limit=3)) == ["GitHub", "GitLab", "Gitter"]
+    assert fuzzy == []
+    assert "Great idea tracker" in dict(index.search("git", limit=4))
+    assert fuzzy
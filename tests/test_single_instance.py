@@ -0,0 +1,57 @@
+import socket
+import sys
+import threading
+
+import pytest
+
+from single_instance import (InstanceNotResponding, encode_message, is_stale, send_command,
+                             server_address, server_name)
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets")
+
+@pytest.fixture
+def name(tmp_path, monkeypatch):
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    return server_name(tmp_path / "data")
+
+def listening_socket(name: str) -> socket.socket:
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(server_address(name))
+    server.listen(1)
+    return server
+
+def test_no_instance(name):
+    assert send_command(name, ["--list"]) is None
+    assert not is_stale(name)
+
+def test_socket_of_a_crashed_instance_is_stale(name):
+    listening_socket(name).close()
+    assert send_command(name, ["--list"]) is None
+    assert is_stale(name)
+
+def test_reply_of_running_instance(name):
+    server = listening_socket(name)
+
+    def answer():
+        connection, _ = server.accept()
+        with connection:
+            connection.recv(1024)
+            connection.sendall(encode_message({"status": 0, "output": "ok\n"}))
+
+    thread = threading.Thread(target=answer)
+    thread.start()
+    try:
+        assert send_command(name, ["--list"]) == {"status": 0, "output": "ok\n"}
+    finally:
+        thread.join()
+        server.close()
+
+def test_busy_instance_is_not_stale(name):
+    # Accepted by the kernel, but the instance never answers
+    server = listening_socket(name)
+    try:
+        with pytest.raises(InstanceNotResponding):
+            send_command(name, ["--list"], timeout=0.1)
+        assert not is_stale(name)
+    finally:
+        server.close()
@@ -0,0 +1,37 @@
+"""
+Persistence of user interface state between launches.
+
+The state is a small JSON document stored in ``ui_state.json`` in the data
+directory (``bookmark_manager.get_data_dir``), whatever the working directory. Missing or unreadable files are treated as an empty state.
+"""
+
+import json
+import logging
+from typing import Any, Dict
+from bookmark_manager import get_data_dir
+
+logger = logging.getLogger(__name__)
+
+UI_STATE_PATH = get_data_dir() / 'ui_state.json'
+
+def load_ui_state() -> Dict[str, Any]:
+    """Load the saved UI state, returning an empty dict if there is none."""
+    try:
+        if UI_STATE_PATH.exists():
+            with open(UI_STATE_PATH, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+                if isinstance(state, dict):
+                    return state
+    except Exception as e:
+        logger.warning(f"Error loading UI state: {e}")
+    return {}
+
+def save_ui_state(state: Dict[str, Any]) -> None:
+    """Write the UI state, replacing the previous file atomically."""
+    tmp_path = UI_STATE_PATH.with_suffix('.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=4)
+        tmp_path.replace(UI_STATE_PATH)
+    except Exception as e:
+        logger.warning(f"Error saving UI state: {e}")
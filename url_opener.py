@@ -0,0 +1,126 @@
+"""
+Opening of URLs in the system browser without blocking the interface.
+
+Starting a cold browser can take seconds, so URLs are handed to the browser
+on a worker thread and the result is reported through signals. URLs are
+opened one after another, in the order they were requested. ``open_many``
+opens long lists in throttled batches: the next batch is started only after
+the previous one has been handed over and a pause has passed, so the browser
+is not flooded with dozens of new tabs at once.
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+import logging
+import webbrowser
+from collections import deque
+from typing import Deque, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5
+DEFAULT_BATCH_INTERVAL_MS = 1000
+
+class _OpenSignals(QObject):
+    finished = pyqtSignal(str, bool, str, bool)
+
+class _OpenTask(QRunnable):
+    """Hands one URL to the browser in a worker thread."""
+
+    def __init__(self, url: str, new_window: bool, batched: bool, signals: _OpenSignals):
+        super().__init__()
+        self.url = url
+        self.new_window = new_window
+        self.batched = batched
+        self.signals = signals
+
+    def run(self):
+        error = ""
+        try:
+            opened = webbrowser.open(self.url, new=1 if self.new_window else 2)
+            if not opened:
+                error = "no browser accepted the URL"
+        except Exception as e:
+            opened = False
+            error = str(e)
+        self.signals.finished.emit(self.url, opened, error, self.batched)
+
+class UrlOpener(QObject):
+    """
+    Opens URLs off the GUI thread.
+
+    Signals:
+        opened(str): The browser accepted a URL
+        failed(str, str): A URL could not be opened, with the reason
+        batch_progress(int, int): URLs of ``open_many`` handled so far and in total
+    """
+
+    opened = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+    batch_progress = pyqtSignal(int, int)
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 batch_interval_ms: int = DEFAULT_BATCH_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.batch_size = batch_size
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _OpenSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        self._queue: Deque[Tuple[str, bool]] = deque()
+        self._in_flight = 0
+        self._done = 0
+        self._total = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(batch_interval_ms)
+        self._timer.timeout.connect(self._start_batch)
+
+    def set_batch_interval(self, interval_ms: int):
+        """Change the pause between batches."""
+        self._timer.setInterval(interval_ms)
+
+    def open(self, url: str, new_window: bool = False):
+        """Open one URL right away."""
+        self._pool.start(_OpenTask(url, new_window, False, self._signals))
+
+    def open_many(self, urls: Iterable[str], new_window: bool = False):
+        """Open URLs in batches of ``batch_size``, appending them to a running batch job."""
+        urls = [(url, new_window) for url in urls]
+        if not urls:
+            return
+        self._queue.extend(urls)
+        self._total += len(urls)
+        if not self._in_flight and not self._timer.isActive():
+            self._start_batch()
+
+    def cancel(self):
+        """Drop the URLs of ``open_many`` that have not been handed to the browser yet."""
+        self._timer.stop()
+        self._queue.clear()
+        if not self._in_flight:
+            self._done = self._total = 0
+
+    def _start_batch(self):
+        for _ in range(min(self.batch_size, len(self._queue))):
+            url, new_window = self._queue.popleft()
+            self._in_flight += 1
+            self._pool.start(_OpenTask(url, new_window, True, self._signals))
+
+    def _on_finished(self, url: str, opened: bool, error: str, batched: bool):
+        if opened:
+            logger.info(f"Successfully opened URL: {url}")
+            self.opened.emit(url)
+        else:
+            logger.error(f"Failed to open URL {url}: {error}")
+            self.failed.emit(url, error)
+        if not batched:
+            return
+        self._in_flight -= 1
+        self._done += 1
+        self.batch_progress.emit(self._done, self._total)
+        if self._in_flight:
+            return
+        if self._queue:
+            self._timer.start()
+        else:
+            self._done = self._total = 0